@@ -0,0 +1,160 @@
+"""
+caption_model.py — Inspect and benchmark the captioning model's CPU modes.
+
+Usage:
+    python caption_model.py info
+    python caption_model.py benchmark --images DIR [--limit 10] [--threads 0] [--reference FILE]
+
+`info` prints the model source (the local models/Qwen2.5-VL-3B-Instruct copy
+when present), the device and the CPU precision / thread settings.
+
+`benchmark` captions the same fixed image set (the first --limit images of DIR
+in name order) on CPU with the fp32 model and with the int8 mode
+("caption_cpu_precision": "int8": the decoder's linear layers dynamically
+quantized at load time) and reports s/image and generated tokens/s for each,
+then the int8 quality against the fp32 outputs per image: whether the JSON
+parsed, caption word-sequence similarity and tag overlap (Jaccard). fp32 on
+CPU is slow; with --reference FILE the fp32 outputs are written to FILE on
+the first run and read back on later runs. Grammar correction is not applied.
+"""
+import argparse
+import difflib
+import json
+import os
+import sys
+import time
+
+# Ensure root is in path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.caption_parsing import get_prompt_parts, parse_combined_response
+from src.services.caption_service import CaptionService
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+
+def cmd_info(_args) -> None:
+    import torch
+
+    device = "cuda" if torch.cuda.is_available() else (
+        "mps" if hasattr(torch.backends, "mps") and torch.backends.mps.is_available() else "cpu"
+    )
+    print(f"model source:   {CaptionService.model_source()}")
+    print(f"device:         {device}")
+    print(f"cpu precision:  {CaptionService.cpu_precision()}" + ("" if device == "cpu" else " (CPU only)"))
+    print(f"cpu threads:    {CaptionService.cpu_threads()}")
+    print(f"quant engine:   {torch.backends.quantized.engine}")
+
+
+def _caption(service: CaptionService, paths: list[str]) -> dict:
+    """Raw output, parsed caption/tags, seconds and generated tokens per file name."""
+    with service._lock:
+        service._load_model()
+    prompt = get_prompt_parts()
+    # Warm-up: first-run allocations and the prompt prefix cache
+    service._run_prompt(service._prepare_image(paths[0], service.MAX_SIDE_PX), prompt)
+    outputs = {}
+    for path in paths:
+        image = service._prepare_image(path, service.MAX_SIDE_PX)
+        t0 = time.perf_counter()
+        raw = service._run_prompt(image, prompt)
+        seconds = time.perf_counter() - t0
+        caption, tags = parse_combined_response(raw)
+        outputs[os.path.basename(path)] = {
+            "raw": raw, "caption_tr": caption, "tags_tr": tags, "seconds": seconds,
+            "tokens": len(service._processor.tokenizer(raw, add_special_tokens=False).input_ids) + 1,  # + EOS
+        }
+        print(f"  {os.path.basename(path):<40} {seconds:>6.1f}s", flush=True)
+    return outputs
+
+
+def _tags(text: str) -> set[str]:
+    return {t.strip().lower() for t in (text or "").split(",") if t.strip()}
+
+
+def _compare(reference: dict, candidate: dict) -> tuple[list[float], list[float], int]:
+    """(caption similarities, tag Jaccard indexes, candidate outputs with parsed JSON) over shared files."""
+    similarities, overlaps, parsed = [], [], 0
+    for name, ref in reference.items():
+        out = candidate.get(name)
+        if out is None:
+            continue
+        parsed += bool(out["caption_tr"])
+        similarities.append(difflib.SequenceMatcher(
+            None, (ref["caption_tr"] or "").lower().split(), (out["caption_tr"] or "").lower().split()
+        ).ratio())
+        ref_tags, tags = _tags(ref["tags_tr"]), _tags(out["tags_tr"])
+        overlaps.append(len(ref_tags & tags) / len(ref_tags | tags) if ref_tags | tags else 1.0)
+    return similarities, overlaps, parsed
+
+
+def _speed(outputs: dict) -> tuple[float, float]:
+    seconds = sum(o["seconds"] for o in outputs.values())
+    tokens = sum(o["tokens"] for o in outputs.values())
+    return seconds / len(outputs), tokens / seconds if seconds else 0.0
+
+
+def cmd_benchmark(args) -> None:
+    import torch
+
+    if torch.cuda.is_available() or (hasattr(torch.backends, "mps") and torch.backends.mps.is_available()):
+        sys.exit("A GPU is available; the CPU modes are only used without one")
+    paths = sorted(
+        os.path.join(args.images, n) for n in os.listdir(args.images) if n.lower().endswith(IMAGE_EXTENSIONS)
+    )[:args.limit]
+    if not paths:
+        sys.exit(f"No images in {args.images}")
+    print(f"{len(paths)} images, model source {CaptionService.model_source()}")
+
+    service = CaptionService()
+    runs = {}
+    if args.reference and os.path.exists(args.reference):
+        with open(args.reference, encoding="utf-8") as f:
+            runs["fp32"] = json.load(f)
+        print(f"fp32 outputs read from {args.reference}")
+    for precision in ("fp32", "int8"):
+        if precision in runs:
+            continue
+        print(f"{precision}:")
+        CaptionService.configure_cpu(precision, args.threads or None)
+        service.unload()
+        runs[precision] = _caption(service, paths)
+        if precision == "fp32" and args.reference:
+            with open(args.reference, "w", encoding="utf-8") as f:
+                json.dump(runs["fp32"], f, ensure_ascii=False, indent=1)
+    CaptionService.configure_cpu()
+    service.unload()
+
+    print(f"{'precision':<10} {'s/image':>8} {'tokens/s':>9}")
+    for precision, outputs in runs.items():
+        per_image, tokens_per_s = _speed(outputs)
+        print(f"{precision:<10} {per_image:>8.1f} {tokens_per_s:>9.2f}")
+
+    similarities, overlaps, parsed = _compare(runs["fp32"], runs["int8"])
+    if not similarities:
+        sys.exit("The reference file shares no images with this image set")
+    print(f"int8 JSON parsed:                 {parsed}/{len(similarities)} "
+          f"(fp32: {sum(bool(o['caption_tr']) for o in runs['fp32'].values())}/{len(runs['fp32'])})")
+    print(f"caption similarity to fp32:       mean {sum(similarities) / len(similarities):.3f}  "
+          f"min {min(similarities):.3f}")
+    print(f"tag overlap with fp32 (Jaccard):  mean {sum(overlaps) / len(overlaps):.3f}  min {min(overlaps):.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Caption model CPU modes: settings and benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("info", help="Show the model source, device and CPU settings")
+
+    p_bench = sub.add_parser("benchmark", help="Speed and int8 quality against fp32 on a fixed image set")
+    p_bench.add_argument("--images", required=True, help="Directory of sample images")
+    p_bench.add_argument("--limit", type=int, default=10)
+    p_bench.add_argument("--threads", type=int, default=0, help="torch threads (default: caption_cpu_threads setting)")
+    p_bench.add_argument("--reference", help="JSON file for the fp32 outputs (written once, then reused)")
+
+    args = parser.parse_args()
+    {"info": cmd_info, "benchmark": cmd_benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+face_index.py — Manage and benchmark the pgvector ANN indexes on face embeddings.
+
+Usage:
+    python face_index.py status
+    python face_index.py rebuild [--kind hnsw|ivfflat] [--no-concurrently]
+    python face_index.py prototypes
+    python face_index.py benchmark [--sizes 100000,1000000] [--queries 50] [--k 10]
+                                   [--ef-search 40,100,200] [--probes 1,10,32]
+
+`rebuild` drops and recreates the managed indexes (FaceRepository.ANN_INDEXES)
+with CREATE INDEX CONCURRENTLY, so the app can keep writing meanwhile; run it
+once after setup (startup only logs missing indexes, it never builds them),
+after a large import or to switch index kind. It also drops the indexes on
+labelled faces and reference embeddings that earlier versions built (no query
+uses them). The chosen kind should also be stored as "face_ann_index" in
+settings.json as the default for later rebuilds.
+
+`prototypes` recomputes person_prototypes from the labelled faces (one
+centroid per person), clearing float drift from incremental updates.
+
+`benchmark` loads synthetic 512-d clustered embeddings into a scratch table
+(face_ann_benchmark, dropped afterwards), measures exact search as ground truth,
+then reports recall@k and per-query latency for HNSW and IVFFlat at several
+ef_search / probes values. Real face data is not touched.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+# Ensure root is in path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+from src.utils.pg_copy_util import COPY_HEADER, COPY_TRAILER
+
+DIM = 512
+BENCH_TABLE = "face_ann_benchmark"
+FACES_PER_IDENTITY = 20
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+# ----------------------------------------------------------------------
+# status / rebuild
+# ----------------------------------------------------------------------
+
+def cmd_status(_args) -> None:
+    from src.repositories.face_repository import FaceRepository
+    for idx in FaceRepository().get_ann_index_status():
+        kind = idx["kind"] or "MISSING"
+        valid = "" if idx["valid"] or not idx["kind"] else " (INVALID)"
+        print(f"{idx['name']:<45} {idx['table']:<16} {kind:<8} {idx['size_bytes'] / 1e6:>9.1f} MB{valid}")
+
+
+def cmd_rebuild(args) -> None:
+    from src.repositories.face_repository import FaceRepository
+    t0 = time.monotonic()
+    names = FaceRepository().rebuild_ann_indexes(kind=args.kind, concurrently=args.concurrently)
+    print(f"✅ Rebuilt {len(names)} indexes in {time.monotonic() - t0:.1f}s: {', '.join(names)}")
+
+
+def cmd_prototypes(_args) -> None:
+    from src.repositories.person_repository import PersonRepository
+    t0 = time.monotonic()
+    PersonRepository().rebuild_prototypes()
+    print(f"✅ Person prototypes rebuilt in {time.monotonic() - t0:.1f}s")
+
+
+# ----------------------------------------------------------------------
+# benchmark
+# ----------------------------------------------------------------------
+
+def _synthetic(n: int, centers: np.ndarray, rng) -> np.ndarray:
+    """Faces of known identities: centre + isotropic noise (cosine to centre ≈ 0.7)."""
+    ids = rng.integers(0, len(centers), size=n)
+    vecs = centers[ids] + rng.standard_normal((n, DIM), dtype=np.float32) / np.sqrt(DIM)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _copy_binary(raw_conn, start_id: int, vecs: np.ndarray) -> None:
+    """Bulk-load (id, embedding) rows with COPY ... FORMAT binary (pgvector wire format)."""
+    rows = np.empty(len(vecs), dtype=[
+        ("nfields", ">i2"), ("id_len", ">i4"), ("id", ">i4"),
+        ("vec_len", ">i4"), ("dim", ">i2"), ("unused", ">i2"), ("vec", ">f4", (DIM,)),
+    ])
+    rows["nfields"] = 2
+    rows["id_len"] = 4
+    rows["id"] = np.arange(start_id, start_id + len(vecs))
+    rows["vec_len"] = 4 + 4 * DIM
+    rows["dim"] = DIM
+    rows["unused"] = 0
+    rows["vec"] = vecs
+    buf = io.BytesIO()
+    buf.write(COPY_HEADER)
+    buf.write(rows.tobytes())
+    buf.write(COPY_TRAILER)
+    buf.seek(0)
+    with raw_conn.cursor() as cur:
+        cur.copy_expert(f"COPY {BENCH_TABLE} (id, embedding) FROM STDIN WITH (FORMAT binary)", buf)
+    raw_conn.commit()
+
+
+def _vec_literal(v: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in v) + "]"
+
+
+def _run_queries(conn, queries: list[str], k: int, setup_sql: list[str]) -> tuple[list[list[int]], list[float]]:
+    results, latencies = [], []
+    for q in queries:
+        with conn.begin():
+            for stmt in setup_sql:
+                conn.execute(text(stmt))
+            t0 = time.perf_counter()
+            rows = conn.execute(text(
+                f"SELECT id FROM {BENCH_TABLE} ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k"
+            ), {"q": q, "k": k}).fetchall()
+            latencies.append((time.perf_counter() - t0) * 1000)
+        results.append([r.id for r in rows])
+    return results, latencies
+
+
+def _report(size, method, param, build_s, approx, exact, latencies, k) -> None:
+    recall = np.mean([len(set(a) & set(e)) / max(1, min(k, len(e))) for a, e in zip(approx, exact)])
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"{size:>9} {method:<8} {param:<16} {build_s:>9.1f} {recall:>9.3f} {p50:>9.2f} {p95:>9.2f}")
+
+
+def cmd_benchmark(args) -> None:
+    from src.database import engine
+    from src.repositories.face_repository import HNSW_M, HNSW_EF_CONSTRUCTION
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'faces':>9} {'method':<8} {'param':<16} {'build_s':>9} {'recall@' + str(args.k):>9} "
+          f"{'p50_ms':>9} {'p95_ms':>9}")
+    for size in _int_list(args.sizes):
+        centers = rng.standard_normal((max(1, size // FACES_PER_IDENTITY), DIM), dtype=np.float32)
+        centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+        queries = [_vec_literal(v) for v in _synthetic(args.queries, centers, rng)]
+
+        with engine.connect() as conn:
+            with conn.begin():
+                conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+                conn.execute(text(f"CREATE TABLE {BENCH_TABLE} (id INT PRIMARY KEY, embedding vector({DIM}))"))
+            raw = engine.raw_connection()
+            try:
+                t0 = time.monotonic()
+                for start in range(0, size, 50_000):
+                    _copy_binary(raw, start, _synthetic(min(50_000, size - start), centers, rng))
+                load_s = time.monotonic() - t0
+            finally:
+                raw.close()
+            with conn.begin():
+                conn.execute(text(f"ANALYZE {BENCH_TABLE}"))
+
+            try:
+                exact, lat = _run_queries(conn, queries, args.k, ["SET LOCAL enable_indexscan = off"])
+                _report(size, "exact", "seqscan", load_s, exact, exact, lat, args.k)
+
+                builds = [
+                    ("hnsw", f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}", "hnsw.ef_search", _int_list(args.ef_search)),
+                    ("ivfflat", f"lists = {max(10, size // 1000 if size <= 1_000_000 else int(size ** 0.5))}",
+                     "ivfflat.probes", _int_list(args.probes)),
+                ]
+                for method, with_params, knob, values in builds:
+                    with conn.begin():
+                        conn.execute(text(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'"))
+                        t0 = time.monotonic()
+                        conn.execute(text(
+                            f"CREATE INDEX {BENCH_TABLE}_{method} ON {BENCH_TABLE} "
+                            f"USING {method} (embedding vector_cosine_ops) WITH ({with_params})"
+                        ))
+                        build_s = time.monotonic() - t0
+                    for value in values:
+                        approx, lat = _run_queries(conn, queries, args.k, [f"SET LOCAL {knob} = {value}"])
+                        _report(size, method, f"{knob.split('.')[1]}={value}", build_s, approx, exact, lat, args.k)
+                    with conn.begin():
+                        conn.execute(text(f"DROP INDEX {BENCH_TABLE}_{method}"))
+            finally:
+                with conn.begin():
+                    conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pgvector ANN index management for face embeddings")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("status", help="Show managed ANN indexes")
+
+    p_rebuild = sub.add_parser("rebuild", help="Drop and recreate managed ANN indexes")
+    p_rebuild.add_argument("--kind", choices=["hnsw", "ivfflat"], default=None,
+                           help="Index kind (default: face_ann_index setting)")
+    p_rebuild.add_argument("--concurrently", action=argparse.BooleanOptionalAction, default=True,
+                           help="Build without blocking writes (default; --no-concurrently is faster)")
+
+    sub.add_parser("prototypes", help="Recompute person prototypes from labelled faces")
+
+    p_bench = sub.add_parser("benchmark", help="Exact vs approximate recall/latency on synthetic data")
+    p_bench.add_argument("--sizes", default="100000,1000000")
+    p_bench.add_argument("--queries", type=int, default=50)
+    p_bench.add_argument("--k", type=int, default=10)
+    p_bench.add_argument("--ef-search", default="40,100,200")
+    p_bench.add_argument("--probes", default="1,10,32")
+    p_bench.add_argument("--maintenance-work-mem", default="1GB")
+    p_bench.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    {
+        "status": cmd_status, "rebuild": cmd_rebuild,
+        "prototypes": cmd_prototypes, "benchmark": cmd_benchmark,
+    }[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+face_model.py — Quantize and benchmark the insightface face models; re-embed and re-match stored faces.
+
+Usage:
+    python face_model.py info
+    python face_model.py quantize [--weight-type uint8|int8] [--force]
+    python face_model.py benchmark --images DIR [--limit 200] [--threads 0]
+    python face_model.py reembed [--restart] [--batch 2048]
+    python face_model.py rematch [--threshold 0.5] [--restart] [--include-legacy]
+
+`info` prints the model pack that would be loaded and the ONNX Runtime session
+options built from the "face_ort_*" settings.
+
+`quantize` writes a dynamically quantized (int8 weights) copy of the detection
+and recognition models of the fp32 pack into <pack>_int8 next to it. Select it
+with "face_model_precision": "int8" in settings.json; the detection cache keys
+include the pack, so cached fp32 results are not reused for it.
+
+`benchmark` runs the same images through the full detection + embedding path
+(FaceAnalysisService.detect_from_arrays) with the fp32 and the int8 pack and
+reports images/s for each, then the int8 drift against fp32: share of fp32
+faces found again (bbox IoU >= 0.5) and cosine distance between the matched
+embeddings. MATCH_THRESHOLD is 0.5, so a p95 drift well below ~0.05 keeps
+recognition decisions stable.
+
+`reembed` recomputes every stored face embedding from its stored aligned chip
+(face_chips) with the current recognition model — run it after switching the
+model or fixing an embedding bug instead of re-detecting every original. It is
+checkpointed per batch; an interrupted run continues where it stopped unless
+--restart is given. Faces detected before chips were stored keep their
+embedding, as do persons' reference embeddings.
+
+`rematch` recomputes automatic face-to-person assignments across the archive
+against the current person prototypes (FaceService.rematch_faces) — run it after
+`reembed` or after changing "face_match_threshold". Faces assigned by hand or
+cleared by the user are never changed. It is checkpointed like `reembed`.
+Assignments made before automatic ones were marked (person_auto) look like
+hand-made ones and are skipped; --include-legacy re-matches every assigned face
+that was not cleared, hand-made ones included, as a one-off for such archives.
+Pass it again when resuming that run.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Ensure root is in path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.face_analysis_service import INT8_SUFFIX, MODEL_NAME, FaceAnalysisService
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+QUANTIZED_TASKS = ("detection", "recognition")
+
+
+def cmd_info(_args) -> None:
+    options = FaceAnalysisService.session_options()
+    print(f"precision:        {FaceAnalysisService.model_precision()}")
+    print(f"model pack:       {FaceAnalysisService.model_dir()}")
+    print(f"graph opt level:  {options.graph_optimization_level}")
+    print(f"intra-op threads: {options.intra_op_num_threads or 'default'}")
+    print(f"inter-op threads: {options.inter_op_num_threads or 'default'}")
+    print(f"execution mode:   {options.execution_mode}")
+    print(f"cpu mem arena:    {options.enable_cpu_mem_arena}")
+
+
+def cmd_quantize(args) -> None:
+    from insightface.model_zoo import model_zoo
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    src_dir = FaceAnalysisService.model_dir("fp32")
+    if not os.path.isdir(src_dir):
+        sys.exit(f"fp32 model pack not found at {src_dir}; run face detection once to download {MODEL_NAME}")
+    dst_dir = src_dir + INT8_SUFFIX
+    os.makedirs(dst_dir, exist_ok=True)
+    weight_type = QuantType.QInt8 if args.weight_type == "int8" else QuantType.QUInt8
+
+    for name in sorted(os.listdir(src_dir)):
+        if not name.endswith(".onnx"):
+            continue
+        src = os.path.join(src_dir, name)
+        model = model_zoo.get_model(src, providers=["CPUExecutionProvider"])
+        task = getattr(model, "taskname", None)
+        del model
+        if task not in QUANTIZED_TASKS:
+            continue
+        dst = os.path.join(dst_dir, name)
+        if os.path.exists(dst) and not args.force:
+            print(f"{name:<24} {task:<12} exists (use --force to redo)")
+            continue
+        t0 = time.monotonic()
+        quantize_dynamic(src, dst, weight_type=weight_type)
+        print(f"{name:<24} {task:<12} {os.path.getsize(src) / 1e6:>7.1f} MB -> "
+              f"{os.path.getsize(dst) / 1e6:>6.1f} MB  ({time.monotonic() - t0:.1f} s)")
+    print(f"int8 pack: {dst_dir}")
+
+
+def _iou(a, b) -> float:
+    ix = max(0.0, min(a.x2, b.x2) - max(a.x1, b.x1))
+    iy = max(0.0, min(a.y2, b.y2) - max(a.y1, b.y1))
+    inter = ix * iy
+    union = (a.x2 - a.x1) * (a.y2 - a.y1) + (b.x2 - b.x1) * (b.y2 - b.y1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _unit(v) -> np.ndarray:
+    v = np.asarray(v, dtype=np.float64).reshape(-1)
+    return v / max(float(np.linalg.norm(v)), 1e-12)
+
+
+def _drift(baseline: list[list], candidate: list[list]) -> tuple[int, int, list[float]]:
+    """(fp32 faces, matched faces, cosine distances) with greedy IoU matching per image."""
+    total, distances = 0, []
+    for ref_faces, faces in zip(baseline, candidate):
+        total += len(ref_faces)
+        pairs = sorted(
+            ((_iou(r, f), i, j) for i, r in enumerate(ref_faces) for j, f in enumerate(faces)), reverse=True
+        )
+        used_ref, used = set(), set()
+        for iou, i, j in pairs:
+            if iou < 0.5:
+                break
+            if i in used_ref or j in used:
+                continue
+            used_ref.add(i)
+            used.add(j)
+            distances.append(1.0 - float(_unit(ref_faces[i].embedding) @ _unit(faces[j].embedding)))
+    return total, len(distances), distances
+
+
+def _run(service: FaceAnalysisService, imgs: list[np.ndarray], chunk: int) -> tuple[list[list], float]:
+    service.detect_from_arrays(imgs[:1])  # warm-up: model load and first-run allocations
+    t0 = time.perf_counter()
+    results = []
+    for start in range(0, len(imgs), chunk):
+        results.extend(service.detect_from_arrays(imgs[start:start + chunk]))
+    return results, time.perf_counter() - t0
+
+
+def cmd_benchmark(args) -> None:
+    paths = sorted(
+        os.path.join(args.images, n) for n in os.listdir(args.images) if n.lower().endswith(IMAGE_EXTENSIONS)
+    )[:args.limit]
+    max_side = FaceAnalysisService.decode_max_side()
+    imgs = [img for img in (FaceAnalysisService.decode_image(p, max_side, tile=True) for p in paths) if img is not None]
+    if not imgs:
+        sys.exit(f"No readable images in {args.images}")
+    if not os.path.isdir(FaceAnalysisService.model_dir("fp32") + INT8_SUFFIX):
+        sys.exit("int8 model pack missing; run: python face_model.py quantize")
+
+    service = FaceAnalysisService()
+    runs = {}
+    print(f"{len(imgs)} images decoded (max side {max_side or 'full'})")
+    print(f"{'precision':<10} {'images/s':>9} {'faces':>7} {'seconds':>8}")
+    for precision in ("fp32", "int8"):
+        FaceAnalysisService.configure_session(args.threads or None, precision=precision)
+        service.unload()
+        results, seconds = _run(service, imgs, args.chunk)
+        runs[precision] = results
+        print(f"{precision:<10} {len(imgs) / seconds:>9.2f} {sum(map(len, results)):>7} {seconds:>8.1f}")
+    FaceAnalysisService.configure_session()
+    service.unload()
+
+    total, matched, distances = _drift(runs["fp32"], runs["int8"])
+    print(f"int8 faces matching fp32 faces: {matched}/{total}")
+    if distances:
+        p50, p95 = np.percentile(distances, [50, 95])
+        print(f"embedding drift (cosine distance): mean {np.mean(distances):.4f}  "
+              f"p50 {p50:.4f}  p95 {p95:.4f}  max {max(distances):.4f}")
+
+
+def cmd_reembed(args) -> None:
+    from src.repositories.face_repository import FaceRepository
+    from src.repositories.person_repository import PersonRepository
+    from src.services.face_service import FaceService
+
+    def progress(done, total):
+        print(f"\r{done}/{total} faces", end="", flush=True)
+
+    service = FaceService(FaceRepository(), PersonRepository())
+    try:
+        stats = service.reembed_faces(restart=args.restart, batch_size=args.batch, on_progress=progress)
+    except KeyboardInterrupt:
+        print("\nInterrupted; run again to resume from the last checkpoint")
+        return
+    print()
+    state = "finished" if stats["finished"] else "stopped"
+    resumed = " (resumed)" if stats["resumed"] else ""
+    print(f"✅ {stats['faces']} faces re-embedded{resumed} in {stats['duration_ms'] / 1000:.1f}s, {state}")
+
+
+def cmd_rematch(args) -> None:
+    from src.repositories.face_repository import FaceRepository
+    from src.repositories.person_repository import PersonRepository
+    from src.services.face_service import FaceService
+
+    def progress(done, total):
+        print(f"\r{done}/{total} faces", end="", flush=True)
+
+    service = FaceService(FaceRepository(), PersonRepository())
+    try:
+        stats = service.rematch_faces(
+            threshold=args.threshold, restart=args.restart, include_legacy=args.include_legacy, on_progress=progress
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted; run again to resume from the last checkpoint")
+        return
+    print()
+    state = "finished" if stats["finished"] else "stopped"
+    resumed = " (resumed)" if stats["resumed"] else ""
+    print(f"✅ {stats['faces']} faces re-matched{resumed} in {stats['duration_ms'] / 1000:.1f}s, {state}: "
+          f"{stats['assigned']} assigned, {stats['moved']} moved, {stats['unassigned']} unassigned")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Face model quantization and benchmarking")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("info", help="Show the model pack and ONNX Runtime session options in use")
+
+    p_quant = sub.add_parser("quantize", help="Write the int8 copy of the detection/recognition models")
+    p_quant.add_argument("--weight-type", choices=["uint8", "int8"], default="uint8",
+                         help="Quantized weight type (uint8 also runs on older ONNX Runtime ConvInteger kernels)")
+    p_quant.add_argument("--force", action="store_true", help="Overwrite existing quantized files")
+
+    p_bench = sub.add_parser("benchmark", help="images/s and embedding drift of int8 against fp32")
+    p_bench.add_argument("--images", required=True, help="Directory of sample images")
+    p_bench.add_argument("--limit", type=int, default=200)
+    p_bench.add_argument("--chunk", type=int, default=32, help="Images per detect_from_arrays call")
+    p_bench.add_argument("--threads", type=int, default=0,
+                         help="Intra-op threads (default: face_ort_intra_op_threads setting)")
+
+    p_reembed = sub.add_parser("reembed", help="Recompute stored face embeddings from stored chips")
+    p_reembed.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    p_reembed.add_argument("--batch", type=int, default=2048, help="Chips per read / transaction")
+
+    p_rematch = sub.add_parser("rematch", help="Recompute automatic face-to-person assignments")
+    p_rematch.add_argument("--threshold", type=float, default=None,
+                           help="Cosine distance limit (default: face_match_threshold setting)")
+    p_rematch.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    p_rematch.add_argument("--include-legacy", action="store_true",
+                           help="Also re-match assignments without the automatic mark (made before it existed, "
+                                "or by hand)")
+
+    args = parser.parse_args()
+    {
+        "info": cmd_info, "quantize": cmd_quantize,
+        "benchmark": cmd_benchmark, "reembed": cmd_reembed, "rematch": cmd_rematch,
+    }[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ class CaptionResult:
     duration: float = 0.0
     error: str = ""
     event_name: str = ""  # name of the event this file belongs to
+    partial: bool = False  # caption still streaming: shown in the UI, never saved
 
     @property
     def has_data(self) -> bool:
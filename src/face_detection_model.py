@@ -2,7 +2,7 @@
 FaceDetection model — stores per-face bounding box and embedding for a media item.
 """
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Float
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Float, SmallInteger, Integer, LargeBinary, Boolean
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -16,6 +16,8 @@ class FaceDetection(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     media_id = Column(UUID(as_uuid=True), ForeignKey("medias.id", ondelete="CASCADE"), nullable=False, index=True)
     person_id = Column(UUID(as_uuid=True), ForeignKey("persons.id", ondelete="SET NULL"), nullable=True)
+    # True when person_id was set by automatic matching (face_service.rematch_faces may revise it)
+    person_auto = Column(Boolean, nullable=False, default=False, server_default="false")
 
     # Bounding box stored as normalised floats (0.0–1.0 of original image dimensions)
     # {x1, y1, x2, y2}
@@ -27,6 +29,26 @@ class FaceDetection(Base):
     # For videos: millisecond timestamp where the face was detected
     timestamp_ms = Column(Float, nullable=True)
 
+    # For video face tracks: span of key frames this representative face stands for
+    track_start_ms = Column(Float, nullable=True)
+    track_end_ms = Column(Float, nullable=True)
+
+    # Quality attributes for the query-time gate (face_quality_util.QualityGate)
+    det_score = Column(Float, nullable=True)
+    blur_score = Column(Float, nullable=True)
+    face_px = Column(Float, nullable=True)
+    yaw = Column(Float, nullable=True)
+    pitch = Column(Float, nullable=True)
+    roll = Column(Float, nullable=True)
+
+    # person_prototypes.idx this face contributes to (maintained by trigger)
+    prototype_idx = Column(SmallInteger, nullable=True)
+
+    # Unsupervised cluster of unassigned faces (see face_clustering); clustered_at
+    # marks faces a clustering run has already looked at
+    cluster_id = Column(UUID(as_uuid=True), nullable=True)
+    clustered_at = Column(DateTime(timezone=True), nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -35,3 +57,39 @@ class FaceDetection(Base):
 
     def __repr__(self):
         return f"<FaceDetection(media_id={self.media_id}, person_id={self.person_id})>"
+
+
+class FaceDetectionCache(Base):
+    """Detection results keyed by file content, shared by every media with the same bytes."""
+    __tablename__ = "face_detection_cache"
+
+    # face_result_cache.content_hash() / detection_signature()
+    content_hash = Column(String(64), primary_key=True)
+    signature = Column(String(500), primary_key=True)
+
+    # Packed FaceResult records (face_result_cache.pack_results)
+    faces = Column(LargeBinary, nullable=False)
+    face_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class FaceChip(Base):
+    """Aligned 112×112 face chip of a face_detections row, for re-embedding without re-detection."""
+    __tablename__ = "face_chips"
+
+    face_id = Column(UUID(as_uuid=True), ForeignKey("face_detections.id", ondelete="CASCADE"), primary_key=True)
+
+    # JPEG bytes (FaceAnalysisService.encode_chip)
+    chip = Column(LargeBinary, nullable=False)
+
+
+class JobCheckpoint(Base):
+    """Resume position of a long-running background job (e.g. face re-embedding)."""
+    __tablename__ = "job_checkpoints"
+
+    job = Column(String(100), primary_key=True)
+    position = Column(String(100), nullable=False)
+    processed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
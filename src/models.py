@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Enum, Boolean, Table, UniqueConstraint, SmallInteger
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Enum, Boolean, Table, UniqueConstraint, SmallInteger, Integer, Float
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -8,7 +8,7 @@ from .database import Base
 import enum
 
 # Import FaceDetection so create_all picks it up
-from .face_detection_model import FaceDetection  # noqa: F401
+from .face_detection_model import FaceChip, FaceDetection, FaceDetectionCache, JobCheckpoint  # noqa: F401
 
 class MediaType(str, enum.Enum):
     PHOTO = "photo"
@@ -126,6 +126,8 @@ class Person(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(250), nullable=False, unique=True, index=True)
     reference_embedding = Column(Vector(512), nullable=True)
+    # person_prototypes.idx the reference embedding was folded into (maintained by trigger)
+    reference_prototype_idx = Column(SmallInteger, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     medias = relationship("Media", secondary=media_persons, back_populates="persons")
@@ -134,6 +136,37 @@ class Person(Base):
         return f"<Person(name='{self.name}')>"
 
 
+class PersonPrototype(Base):
+    """
+    Running centroid of one mode of a person's labelled faces.
+    embedding_sum is the sum of unit-normalised member embeddings (cosine distance
+    to it equals distance to the centroid); radius = 1 - |sum| / face_count is the
+    mean cosine distance of members to the centroid. Maintained by DB triggers.
+    """
+    __tablename__ = "person_prototypes"
+
+    person_id     = Column(UUID(as_uuid=True), ForeignKey("persons.id", ondelete="CASCADE"), primary_key=True)
+    idx           = Column(SmallInteger, primary_key=True)
+    embedding_sum = Column(Vector(512), nullable=False)
+    face_count    = Column(Integer, nullable=False, default=0)
+    radius        = Column(Float, nullable=False, default=0.0)
+    updated_at    = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class FaceCluster(Base):
+    """
+    Stored centroid of one cluster of unassigned faces: embedding_sum is the sum
+    of the members' unit-normalised embeddings. Maintained by DB triggers on
+    face_detections and rewritten by full re-clustering runs.
+    """
+    __tablename__ = "face_clusters"
+
+    cluster_id    = Column(UUID(as_uuid=True), primary_key=True)
+    embedding_sum = Column(Vector(512), nullable=False)
+    face_count    = Column(Integer, nullable=False, default=0)
+    updated_at    = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class PersonNote(Base):
     __tablename__ = "person_notes"
 
@@ -1,13 +1,151 @@
 """
 FaceRepository — CRUD for face_detections table.
-Also supports pgvector cosine similarity search for automatic person matching.
+Also supports pgvector cosine search over unassigned faces (the person scan),
+backed by a managed HNSW / IVFFlat index (see ANN_INDEXES).
 """
 from __future__ import annotations
+import struct
 import uuid as uuid_module
 from uuid import UUID
 import numpy as np
 from sqlalchemy import text
 from src.database import get_db
+from src.utils.face_quality_util import QualityGate
+from src.utils.pg_copy_util import (
+    copy_out, copy_rows, encode_bool, encode_float8, encode_json, encode_row, encode_uuid, encode_vector,
+    read_rows,
+)
+
+# Managed approximate-nearest-neighbour indexes: (name, table, column, partial predicate).
+# Only unassigned faces are searched in SQL (find_unassigned_faces_matching); person
+# matching runs on the in-memory prototype index (PersonMatchIndex), so labelled faces
+# and reference embeddings get no index that every insert and assignment would pay for.
+ANN_INDEXES = [
+    ("ix_face_detections_embedding_unassigned", "face_detections", "embedding", "person_id IS NULL"),
+]
+# Indexes earlier versions managed; rebuild_ann_indexes drops them
+RETIRED_ANN_INDEXES = ["ix_face_detections_embedding_labelled", "ix_persons_reference_embedding"]
+ANN_KINDS = ("hnsw", "ivfflat")
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+UNASSIGNED_MATCH_LIMIT = 1000
+
+EMBEDDING_DIM = 512
+# Fixed-width binary COPY tuples used by the clustering job (see pg_copy_util)
+_FACE_EMBEDDING_ROW = np.dtype([
+    ("nfields", ">i2"), ("id_len", ">i4"), ("id", "V16"),
+    ("vec_len", ">i4"), ("dim", ">i2"), ("unused", ">i2"), ("vec", ">f4", (EMBEDDING_DIM,)),
+])
+_CLUSTER_CENTROID_ROW = np.dtype([
+    ("nfields", ">i2"), ("id_len", ">i4"), ("id", "V16"), ("count_len", ">i4"), ("count", ">i8"),
+    ("vec_len", ">i4"), ("dim", ">i2"), ("unused", ">i2"), ("vec", ">f4", (EMBEDDING_DIM,)),
+])
+_CLUSTER_UPDATE_ROW = np.dtype([
+    ("nfields", ">i2"), ("id_len", ">i4"), ("id", "V16"), ("cid_len", ">i4"), ("cid", "V16"),
+])
+# Re-matching job: person id and prototype idx are COALESCEd to all-zero / -1
+_REMATCH_FACE_ROW = np.dtype([
+    ("nfields", ">i2"), ("id_len", ">i4"), ("id", "V16"), ("pid_len", ">i4"), ("pid", "V16"),
+    ("idx_len", ">i4"), ("idx", ">i2"),
+    ("vec_len", ">i4"), ("dim", ">i2"), ("unused", ">i2"), ("vec", ">f4", (EMBEDDING_DIM,)),
+])
+_NIL_UUID = "00000000-0000-0000-0000-000000000000"
+
+# Stored cluster centroids: per cluster, the sum of the unit embeddings of its
+# unassigned members, kept current by statement-level triggers on face_detections
+# (naming, assigning, deleting or re-embedding a clustered face). A face is a member
+# while cluster_id IS NOT NULL AND person_id IS NULL AND embedding IS NOT NULL.
+# New faces are inserted without a cluster, so INSERT needs no trigger. Full
+# re-clustering sets acknowledge.skip_cluster_trigger and rewrites the table itself.
+_CLUSTER_MEMBER_CHANGED = """
+    (o.cluster_id IS DISTINCT FROM n.cluster_id
+     OR (o.person_id IS NULL) <> (n.person_id IS NULL)
+     OR o.embedding IS DISTINCT FROM n.embedding)
+"""
+CLUSTER_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS face_clusters (
+        cluster_id UUID PRIMARY KEY,
+        embedding_sum vector(512) NOT NULL,
+        face_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ DEFAULT now()
+    )
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION face_clusters_update_trg() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('acknowledge.skip_cluster_trigger', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        UPDATE face_clusters fc SET
+            embedding_sum = fc.embedding_sum - d.s, face_count = fc.face_count - d.n, updated_at = now()
+        FROM (
+            SELECT o.cluster_id, count(*) AS n, sum(person_prototype_unit(o.embedding)) AS s
+            FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE o.cluster_id IS NOT NULL AND o.person_id IS NULL AND o.embedding IS NOT NULL
+              AND {_CLUSTER_MEMBER_CHANGED}
+            GROUP BY o.cluster_id
+        ) d
+        WHERE fc.cluster_id = d.cluster_id;
+        INSERT INTO face_clusters AS fc (cluster_id, embedding_sum, face_count)
+        SELECT n.cluster_id, sum(person_prototype_unit(n.embedding)), count(*)
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.cluster_id IS NOT NULL AND n.person_id IS NULL AND n.embedding IS NOT NULL
+          AND {_CLUSTER_MEMBER_CHANGED}
+        GROUP BY n.cluster_id
+        ON CONFLICT (cluster_id) DO UPDATE SET
+            embedding_sum = fc.embedding_sum + EXCLUDED.embedding_sum,
+            face_count = fc.face_count + EXCLUDED.face_count,
+            updated_at = now();
+        DELETE FROM face_clusters WHERE face_count <= 0;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION face_clusters_delete_trg() RETURNS trigger AS $$
+    BEGIN
+        UPDATE face_clusters fc SET
+            embedding_sum = fc.embedding_sum - d.s, face_count = fc.face_count - d.n, updated_at = now()
+        FROM (
+            SELECT o.cluster_id, count(*) AS n, sum(person_prototype_unit(o.embedding)) AS s
+            FROM old_rows o
+            WHERE o.cluster_id IS NOT NULL AND o.person_id IS NULL AND o.embedding IS NOT NULL
+            GROUP BY o.cluster_id
+        ) d
+        WHERE fc.cluster_id = d.cluster_id;
+        DELETE FROM face_clusters WHERE face_count <= 0;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_face_detections_clusters_update ON face_detections",
+    """
+    CREATE TRIGGER trg_face_detections_clusters_update
+    AFTER UPDATE ON face_detections
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION face_clusters_update_trg()
+    """,
+    "DROP TRIGGER IF EXISTS trg_face_detections_clusters_delete ON face_detections",
+    """
+    CREATE TRIGGER trg_face_detections_clusters_delete
+    AFTER DELETE ON face_detections
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION face_clusters_delete_trg()
+    """,
+    # Keeps count_unseen_unassigned_faces (run after every detection job) cheap
+    """
+    CREATE INDEX IF NOT EXISTS ix_face_detections_unclustered
+    ON face_detections (id) WHERE clustered_at IS NULL AND person_id IS NULL
+    """,
+]
+
+
+def _parse_vector(value) -> np.ndarray | None:
+    """Parse pgvector's text form '[0.1,0.2,...]' into a float32 array."""
+    if value is None:
+        return None
+    return np.array(str(value).strip("[]").split(","), dtype=np.float32)
 
 
 class FaceRepository:
@@ -33,38 +171,203 @@ class FaceRepository:
             raise ValueError(f"Expected media_id to be a UUID, got {type(media_id)}")
         
         media_id_str = str(media_id)
-        ids = []
         with get_db() as db:
             # Remove old detections
             db.execute(text("DELETE FROM face_detections WHERE media_id = :mid"), {"mid": media_id_str})
+            ids = self._insert_faces(db, media_id_str, face_results)
+            db.commit()
+        return ids
+
+    def save_faces_batch(
+        self,
+        items: list[tuple[UUID, list]],
+        assignments: list[list] | None = None,
+    ) -> list[list[UUID]]:
+        """
+        Persist detected faces for several media items in one transaction.
+        Same full-replace semantics as save_faces, per media item.
 
-            for face in face_results:
-                new_id = uuid_module.uuid4()
-                embedding_list = face.embedding.tolist() if face.embedding is not None else None
+        Args:
+            items: List of (media_id, face_results) pairs.
+            assignments: Optional person_id (or None) per face, parallel to items.
+                         Assigned faces are inserted with person_id set and
+                         person_auto marked (the prototype trigger folds them
+                         in) and media_persons links are added in the same
+                         transaction.
+
+        Returns:
+            One list of new face_detection UUIDs per item, in input order.
+        """
+        for media_id, _ in items:
+            if not isinstance(media_id, UUID):
+                raise ValueError(f"Expected media_id to be a UUID, got {type(media_id)}")
+        if not items:
+            return []
+
+        all_ids = []
+        with get_db() as db:
+            db.execute(
+                text("DELETE FROM face_detections WHERE media_id = ANY(CAST(:mids AS uuid[]))"),
+                {"mids": [str(media_id) for media_id, _ in items]},
+            )
+            rows, chip_rows = [], []
+            for i, (media_id, face_results) in enumerate(items):
+                person_ids = assignments[i] if assignments is not None else None
+                all_ids.append(self._face_rows(media_id, face_results, person_ids, rows, chip_rows))
+            self._copy_faces(db, rows, chip_rows)
+            if assignments is not None and any(pid is not None for pids in assignments for pid in pids):
                 db.execute(text("""
-                    INSERT INTO face_detections (id, media_id, bbox, embedding, timestamp_ms)
-                    VALUES (:id, :media_id,
-                            CAST(:bbox AS jsonb),
-                            CAST(:emb AS vector),
-                            :tms)
-                """), {
-                    "id": str(new_id),
-                    "media_id": media_id_str,
-                    "bbox": f'{{"x1":{face.x1},"y1":{face.y1},"x2":{face.x2},"y2":{face.y2}}}',
-                    "emb": "[" + ",".join(str(v) for v in embedding_list) + "]" if embedding_list else None,
-                    "tms": getattr(face, 'timestamp_ms', None),
-                })
-                ids.append(new_id)
+                    INSERT INTO media_persons (media_id, person_id)
+                    SELECT DISTINCT media_id, person_id FROM face_detections
+                    WHERE media_id = ANY(CAST(:mids AS uuid[])) AND person_id IS NOT NULL
+                    ON CONFLICT DO NOTHING
+                """), {"mids": [str(media_id) for media_id, _ in items]})
             db.commit()
+        return all_ids
+
+    def get_prototype_indexes(self, face_ids: list[UUID]) -> dict[UUID, int]:
+        """prototype_idx of each given face (as set by the prototype trigger); unassigned faces are omitted."""
+        if not face_ids:
+            return {}
+        with get_db() as db:
+            rows = db.execute(text("""
+                SELECT id, prototype_idx FROM face_detections
+                WHERE id = ANY(CAST(:ids AS uuid[])) AND prototype_idx IS NOT NULL
+            """), {"ids": [str(fid) for fid in face_ids]}).fetchall()
+        return {UUID(str(r.id)): r.prototype_idx for r in rows}
+
+    # Optional float8 columns, filled from the FaceResult attribute of the same name
+    # (det_score from FaceResult.score)
+    _FACE_FLOAT_COLUMNS = ["timestamp_ms", "track_start_ms", "track_end_ms",
+                           "det_score", "blur_score", "face_px", "yaw", "pitch", "roll"]
+    _FACE_COLUMNS = ["id", "media_id", "bbox", "embedding", "person_id", "person_auto"] + _FACE_FLOAT_COLUMNS
+
+    @classmethod
+    def _face_rows(cls, media_id, face_results: list, person_ids: list | None, rows: list,
+                   chip_rows: list) -> list[UUID]:
+        """Append one binary COPY row per FaceResult to rows (and its chip to chip_rows); return the new ids."""
+        ids = []
+        media_bytes = encode_uuid(media_id)
+        for i, face in enumerate(face_results):
+            new_id = uuid_module.uuid4()
+            pid = person_ids[i] if person_ids is not None else None
+            floats = [
+                getattr(face, "score" if column == "det_score" else column, None)
+                for column in cls._FACE_FLOAT_COLUMNS
+            ]
+            rows.append(encode_row([
+                new_id.bytes,
+                media_bytes,
+                encode_json({"x1": float(face.x1), "y1": float(face.y1),
+                              "x2": float(face.x2), "y2": float(face.y2)}),
+                encode_vector(face.embedding) if face.embedding is not None else None,
+                encode_uuid(pid) if pid is not None else None,
+                encode_bool(pid is not None),  # only automatic matching assigns at insert
+            ] + [encode_float8(v) if v is not None else None for v in floats]))
+            if getattr(face, "chip", None):
+                chip_rows.append(encode_row([new_id.bytes, face.chip]))
+            ids.append(new_id)
+        return ids
+
+    @classmethod
+    def _copy_faces(cls, db, rows: list, chip_rows: list) -> None:
+        if rows:
+            copy_rows(db, "face_detections", cls._FACE_COLUMNS, rows)
+        if chip_rows:
+            copy_rows(db, "face_chips", ["face_id", "chip"], chip_rows)
+
+    @classmethod
+    def _insert_faces(cls, db, media_id_str: str, face_results: list) -> list[UUID]:
+        """COPY one row per FaceResult inside the caller's session (no commit)."""
+        rows, chip_rows = [], []
+        ids = cls._face_rows(media_id_str, face_results, None, rows, chip_rows)
+        cls._copy_faces(db, rows, chip_rows)
         return ids
 
-    def assign_person(self, face_id: UUID, person_id: UUID) -> None:
-        """Link a face detection to a known person and clear the cleared flag."""
+    def assign_person(self, face_id: UUID, person_id: UUID, auto: bool = False) -> dict | None:
+        """
+        Link a face detection to a known person and clear the cleared flag.
+
+        Args:
+            auto: The assignment comes from automatic matching (person_auto), so
+                  the re-matching job may revise it; user assignments are final.
+
+        Returns:
+            Dict with media_id, embedding, prototype_idx (set by the prototype
+            trigger) and old_person_id / old_prototype_idx, so callers can keep the
+            in-memory match index in sync; None if the face does not exist.
+        """
         with get_db() as db:
-            db.execute(text("""
-                UPDATE face_detections SET person_id = :person_id, person_cleared = FALSE WHERE id = :face_id
-            """), {"person_id": str(person_id), "face_id": str(face_id)})
+            result = db.execute(text("""
+                WITH old AS (
+                    SELECT id, person_id, prototype_idx FROM face_detections WHERE id = :face_id FOR UPDATE
+                )
+                UPDATE face_detections fd SET person_id = :person_id, person_cleared = FALSE, person_auto = :auto
+                FROM old WHERE fd.id = old.id
+                RETURNING fd.media_id, fd.embedding::text AS embedding, fd.prototype_idx,
+                          old.person_id AS old_person_id, old.prototype_idx AS old_prototype_idx
+            """), {"person_id": str(person_id), "face_id": str(face_id), "auto": auto})
+            row = result.fetchone()
+            db.commit()
+        if row is None:
+            return None
+        return {
+            "media_id": UUID(str(row.media_id)),
+            "embedding": _parse_vector(row.embedding),
+            "prototype_idx": row.prototype_idx,
+            "old_person_id": UUID(str(row.old_person_id)) if row.old_person_id else None,
+            "old_prototype_idx": row.old_prototype_idx,
+        }
+
+    def assign_person_bulk(self, face_ids: list[UUID], person_id: UUID, with_embeddings: bool = True,
+                           auto: bool = False) -> list[dict]:
+        """
+        Set-based assign_person: one UPDATE for all faces plus one media_persons
+        INSERT ... ON CONFLICT DO NOTHING for their media, in a single transaction.
+
+        Args:
+            with_embeddings: Return each face's embedding (only needed to keep
+                             the in-memory match index in sync).
+            auto: As in assign_person.
+
+        Returns:
+            One dict per updated face with face_id plus the assign_person keys
+            (embedding is None unless requested).
+        """
+        if not face_ids:
+            return []
+        emb_sql = "fd.embedding::text" if with_embeddings else "NULL"
+        with get_db() as db:
+            rows = db.execute(text(f"""
+                WITH old AS (
+                    SELECT id, person_id, prototype_idx FROM face_detections
+                    WHERE id = ANY(CAST(:ids AS uuid[]))
+                    ORDER BY id
+                    FOR UPDATE
+                )
+                UPDATE face_detections fd SET person_id = :person_id, person_cleared = FALSE, person_auto = :auto
+                FROM old WHERE fd.id = old.id
+                RETURNING fd.id, fd.media_id, {emb_sql} AS embedding, fd.prototype_idx,
+                          old.person_id AS old_person_id, old.prototype_idx AS old_prototype_idx
+            """), {"person_id": str(person_id), "ids": [str(fid) for fid in face_ids], "auto": auto}).fetchall()
+            if rows:
+                db.execute(text("""
+                    INSERT INTO media_persons (media_id, person_id)
+                    SELECT DISTINCT m, CAST(:person_id AS uuid) FROM unnest(CAST(:mids AS uuid[])) AS m
+                    ON CONFLICT DO NOTHING
+                """), {"person_id": str(person_id), "mids": list({str(r.media_id) for r in rows})})
             db.commit()
+        return [
+            {
+                "face_id": UUID(str(r.id)),
+                "media_id": UUID(str(r.media_id)),
+                "embedding": _parse_vector(r.embedding),
+                "prototype_idx": r.prototype_idx,
+                "old_person_id": UUID(str(r.old_person_id)) if r.old_person_id else None,
+                "old_prototype_idx": r.old_prototype_idx,
+            }
+            for r in rows
+        ]
 
     def delete_faces_for_media(self, media_id: UUID) -> None:
         """Remove all face detection rows for a media item."""
@@ -75,14 +378,33 @@ class FaceRepository:
             )
             db.commit()
 
-    def clear_person_for_face(self, face_id: UUID) -> None:
-        """Set person_id = NULL and person_cleared = TRUE for a single face detection row."""
+    def clear_person_for_face(self, face_id: UUID) -> dict | None:
+        """
+        Set person_id = NULL and person_cleared = TRUE for a single face detection row.
+
+        Returns:
+            Dict with old_person_id, old_prototype_idx and embedding of the face
+            before clearing (for match index sync); None if the face does not exist.
+        """
         with get_db() as db:
-            db.execute(
-                text("UPDATE face_detections SET person_id = NULL, person_cleared = TRUE WHERE id = :fid"),
-                {"fid": str(face_id)}
-            )
+            result = db.execute(text("""
+                WITH old AS (
+                    SELECT id, person_id, prototype_idx FROM face_detections WHERE id = :fid FOR UPDATE
+                )
+                UPDATE face_detections fd SET person_id = NULL, person_cleared = TRUE, person_auto = FALSE
+                FROM old WHERE fd.id = old.id
+                RETURNING fd.embedding::text AS embedding,
+                          old.person_id AS old_person_id, old.prototype_idx AS old_prototype_idx
+            """), {"fid": str(face_id)})
+            row = result.fetchone()
             db.commit()
+        if row is None:
+            return None
+        return {
+            "embedding": _parse_vector(row.embedding),
+            "old_person_id": UUID(str(row.old_person_id)) if row.old_person_id else None,
+            "old_prototype_idx": row.old_prototype_idx,
+        }
 
     # ------------------------------------------------------------------
     # Read
@@ -93,17 +415,21 @@ class FaceRepository:
         Return all face detections for a media item with optional person name.
 
         Returns list of dicts with keys:
-            id, bbox (dict), embedding (list|None), person_id, person_name
+            id, bbox (dict), embedding (list|None), person_id, person_name,
+            timestamp_ms and track_start_ms / track_end_ms for video face tracks.
+        Unassigned faces below the quality gate are left out.
         """
+        gate_sql, gate_params = QualityGate.from_settings().sql("fd")
         with get_db() as db:
             result = db.execute(text("""
                 SELECT fd.id, fd.bbox, fd.embedding::text, fd.person_id, fd.person_cleared, fd.timestamp_ms,
-                       p.name as person_name
+                       fd.track_start_ms, fd.track_end_ms, p.name as person_name
                 FROM face_detections fd
                 LEFT JOIN persons p ON fd.person_id = p.id
                 WHERE fd.media_id = :mid
+                  AND (fd.person_id IS NOT NULL OR ({gate_sql}))
                 ORDER BY fd.timestamp_ms ASC, fd.created_at ASC
-            """), {"mid": str(media_id)})
+            """.format(gate_sql=gate_sql)), {"mid": str(media_id), **gate_params})
             rows = []
             for row in result.fetchall():
                 d = dict(row._mapping)
@@ -114,66 +440,639 @@ class FaceRepository:
                 rows.append(d)
             return rows
 
-    def find_similar_person(
-        self,
-        embedding: np.ndarray,
-        threshold: float = 0.5,
-    ) -> tuple[UUID | None, str | None]:
-        """
-        Search ALL labelled face embeddings for the closest match (global).
-        Checks both face_detections (assigned faces) and persons.reference_embedding
-        (persons registered without any matched media yet).
-        Uses pgvector cosine distance (lower = more similar).
-        """
-        emb_list = embedding.tolist()
-        emb_str = "[" + ",".join(str(v) for v in emb_list) + "]"
+    def get_cached_detections(self, content_hash: str, signature: str) -> bytes | None:
+        """Packed detection results for this file content and signature, or None."""
         with get_db() as db:
-            result = db.execute(text("""
-                SELECT person_id, name, dist FROM (
-                    SELECT fd.person_id::text AS person_id, p.name,
-                           (fd.embedding <=> CAST(:emb AS vector)) AS dist
-                    FROM face_detections fd
-                    JOIN persons p ON fd.person_id = p.id
-                    WHERE fd.embedding IS NOT NULL AND fd.person_id IS NOT NULL
-                    UNION ALL
-                    SELECT p.id::text AS person_id, p.name,
-                           (p.reference_embedding <=> CAST(:emb AS vector)) AS dist
-                    FROM persons p
-                    WHERE p.reference_embedding IS NOT NULL
-                ) sub
-                ORDER BY dist ASC
-                LIMIT 1
-            """), {"emb": emb_str})
-            row = result.fetchone()
-            if row and row.dist is not None and float(row.dist) < threshold:
-                return UUID(str(row.person_id)), row.name
-        return None, None
+            row = db.execute(text("""
+                SELECT faces FROM face_detection_cache
+                WHERE content_hash = :content_hash AND signature = :signature
+            """), {"content_hash": content_hash, "signature": signature}).fetchone()
+            return bytes(row.faces) if row else None
+
+    def save_cached_detections(self, entries: list[tuple[str, str, bytes, int]]) -> None:
+        """Store (content_hash, signature, packed faces, face_count) entries; existing keys are kept."""
+        if not entries:
+            return
+        with get_db() as db:
+            db.execute(text("""
+                INSERT INTO face_detection_cache (content_hash, signature, faces, face_count)
+                VALUES (:content_hash, :signature, :faces, :face_count)
+                ON CONFLICT (content_hash, signature) DO NOTHING
+            """), [
+                {"content_hash": h, "signature": sig, "faces": faces, "face_count": count}
+                for h, sig, faces, count in entries
+            ])
+            db.commit()
+
+    def get_labelled_media_ids(self) -> list[UUID]:
+        """Return ids of media that have at least one labelled face (for PersonMatchIndex)."""
+        with get_db() as db:
+            result = db.execute(text(
+                "SELECT DISTINCT media_id FROM face_detections WHERE person_id IS NOT NULL"
+            ))
+            return [UUID(str(r.media_id)) for r in result.fetchall()]
 
     def find_unassigned_faces_matching(
         self,
         embedding: np.ndarray,
         threshold: float = 0.5,
+        limit: int | None = None,
+        ef_search: int | None = None,
     ) -> list[dict]:
         """
-        Return all unassigned face_detections whose embedding is within threshold
-        of the given embedding. Used for the one-time person scan background job.
+        Return the unassigned face_detections whose embedding is within threshold
+        of the given embedding, closest first.
 
-        Returns list of dicts with keys: face_id, media_id, dist.
+        The nearest UNASSIGNED_MATCH_LIMIT (or limit) unassigned faces are read
+        through the ANN index (ix_face_detections_embedding_unassigned, ORDER BY
+        ... LIMIT) and only then filtered by threshold, cleared flag and quality
+        gate, so the filters cannot starve the index scan. Without a limit, a
+        candidate list that is within threshold all the way to its end may not
+        hold every match; the query is then repeated as an exact scan.
+
+        Args:
+            limit: Maximum number of faces, up to 1000 (the ef_search ceiling);
+                   None returns every match.
+            ef_search: HNSW candidate list size for this query; defaults to the
+                       face_ann_ef_search setting, raised to cover the candidates.
+
+        Returns list of dicts with keys: face_id, media_id, dist, embedding.
         """
         emb_list = embedding.tolist()
         emb_str = "[" + ",".join(str(v) for v in emb_list) + "]"
+        gate_sql, gate_params = QualityGate.from_settings().sql("fd")
+        candidates = limit or UNASSIGNED_MATCH_LIMIT
+        params = {"emb": emb_str, "threshold": threshold, "candidates": candidates, **gate_params}
         with get_db() as db:
-            result = db.execute(text("""
-                SELECT fd.id AS face_id, fd.media_id,
-                       (fd.embedding <=> CAST(:emb AS vector)) AS dist
-                FROM face_detections fd
-                WHERE fd.person_id IS NULL
-                  AND (fd.person_cleared IS NULL OR NOT fd.person_cleared)
-                  AND fd.embedding IS NOT NULL
-                  AND (fd.embedding <=> CAST(:emb AS vector)) < :threshold
-                ORDER BY dist ASC
-            """), {"emb": emb_str, "threshold": threshold})
+            if ef_search is None:
+                from src.utils.config_util import get_setting
+                ef_search = max(int(get_setting("face_ann_ef_search", 100)), min(candidates, 1000))
+            self._set_ann_params(db, ef_search=ef_search)
+            rows = db.execute(text("""
+                WITH fd AS (
+                    SELECT *, (embedding <=> CAST(:emb AS vector)) AS dist
+                    FROM face_detections
+                    WHERE person_id IS NULL AND embedding IS NOT NULL
+                    ORDER BY embedding <=> CAST(:emb AS vector)
+                    LIMIT :candidates
+                )
+                SELECT fd.id AS face_id, fd.media_id, fd.dist,
+                       CASE WHEN m.ok THEN fd.embedding::text END AS embedding, m.ok
+                FROM fd, LATERAL (
+                    SELECT fd.dist < :threshold AND NOT fd.person_cleared AND {gate_sql} AS ok
+                ) m
+                ORDER BY fd.dist
+            """.format(gate_sql=gate_sql)), params).fetchall()
+            if limit is None and len(rows) == candidates and rows[-1].dist < threshold:
+                # More matches than candidates: exact scan (an HNSW scan stops after ef_search rows)
+                db.execute(text("SET LOCAL enable_indexscan = off"))
+                rows = db.execute(text("""
+                    SELECT fd.id AS face_id, fd.media_id, fd.embedding::text AS embedding,
+                           (fd.embedding <=> CAST(:emb AS vector)) AS dist, TRUE AS ok
+                    FROM face_detections fd
+                    WHERE fd.person_id IS NULL
+                      AND NOT fd.person_cleared
+                      AND fd.embedding IS NOT NULL
+                      AND (fd.embedding <=> CAST(:emb AS vector)) < :threshold
+                      AND {gate_sql}
+                    ORDER BY fd.embedding <=> CAST(:emb AS vector)
+                """.format(gate_sql=gate_sql)), params).fetchall()
             return [
-                {"face_id": UUID(str(r.face_id)), "media_id": UUID(str(r.media_id)), "dist": float(r.dist)}
-                for r in result.fetchall()
+                {
+                    "face_id": UUID(str(r.face_id)), "media_id": UUID(str(r.media_id)),
+                    "dist": float(r.dist), "embedding": _parse_vector(r.embedding),
+                }
+                for r in rows if r.ok
             ]
+
+    # ------------------------------------------------------------------
+    # Re-embedding from stored chips
+    # ------------------------------------------------------------------
+
+    def count_face_chips(self, after: UUID | None = None) -> int:
+        """Number of stored face chips (with face_id > after, if given)."""
+        with get_db() as db:
+            return db.execute(text("""
+                SELECT count(*) FROM face_chips WHERE CAST(:after AS uuid) IS NULL OR face_id > CAST(:after AS uuid)
+            """), {"after": str(after) if after else None}).scalar() or 0
+
+    def load_face_chips(self, after: UUID | None, limit: int) -> list[tuple[UUID, bytes]]:
+        """Next chips in face_id order after the given id (keyset pagination)."""
+        with get_db() as db:
+            rows = db.execute(text("""
+                SELECT face_id, chip FROM face_chips
+                WHERE CAST(:after AS uuid) IS NULL OR face_id > CAST(:after AS uuid)
+                ORDER BY face_id
+                LIMIT :limit
+            """), {"after": str(after) if after else None, "limit": limit}).fetchall()
+        return [(UUID(str(r.face_id)), bytes(r.chip)) for r in rows]
+
+    def save_reembedded(self, job: str, face_ids: list[UUID], embeddings: list,
+                        position: UUID, processed: int) -> None:
+        """
+        Replace the embeddings of the given faces and move the job checkpoint to
+        position (last face id read), in one transaction. The prototype trigger
+        keeps person_prototypes in step for labelled faces.
+        """
+        with get_db() as db:
+            if face_ids:
+                db.execute(text(
+                    "CREATE TEMP TABLE face_embedding_updates (id uuid, embedding vector(512)) ON COMMIT DROP"
+                ))
+                copy_rows(db, "face_embedding_updates", ["id", "embedding"], [
+                    encode_row([encode_uuid(fid), encode_vector(emb)]) for fid, emb in zip(face_ids, embeddings)
+                ])
+                db.execute(text("""
+                    UPDATE face_detections fd SET embedding = u.embedding
+                    FROM face_embedding_updates u
+                    WHERE fd.id = u.id
+                """))
+            self._save_checkpoint(db, job, position, processed)
+            db.commit()
+
+    @staticmethod
+    def _save_checkpoint(db, job: str, position, processed: int) -> None:
+        db.execute(text("""
+            INSERT INTO job_checkpoints (job, position, processed)
+            VALUES (:job, :position, :processed)
+            ON CONFLICT (job) DO UPDATE SET
+                position = EXCLUDED.position, processed = EXCLUDED.processed, updated_at = now()
+        """), {"job": job, "position": str(position), "processed": processed})
+
+    def get_job_checkpoint(self, job: str) -> dict | None:
+        with get_db() as db:
+            row = db.execute(text(
+                "SELECT position, processed, started_at FROM job_checkpoints WHERE job = :job"
+            ), {"job": job}).fetchone()
+            return dict(row._mapping) if row else None
+
+    def delete_job_checkpoint(self, job: str) -> None:
+        with get_db() as db:
+            db.execute(text("DELETE FROM job_checkpoints WHERE job = :job"), {"job": job})
+            db.commit()
+
+    # ------------------------------------------------------------------
+    # Global re-matching
+    # ------------------------------------------------------------------
+
+    def load_rematch_candidates(self, after: UUID | None, limit: int, include_legacy: bool = False) -> np.ndarray:
+        """
+        Next faces (in id order after the given id) the re-matching job may
+        change, through binary COPY: automatically assigned faces and unassigned
+        faces passing the quality gate. Faces the user assigned or cleared
+        (person_cleared) are never candidates, except that include_legacy adds
+        every assigned face with person_auto unset: assignments made before
+        person_auto existed cannot be told apart from the user's own.
+
+        Returns:
+            Structured array with id / pid ('V16', all-zero pid = unassigned),
+            idx (prototype_idx, -1 = none) and vec (512 float32, big-endian).
+        """
+        where, params = self._rematch_filter(pyformat=True, include_legacy=include_legacy)
+        with get_db() as db:
+            data = copy_out(db, f"""
+                SELECT id, COALESCE(person_id, '{_NIL_UUID}'::uuid), COALESCE(prototype_idx, -1)::int2, embedding
+                FROM face_detections
+                WHERE {where}
+                ORDER BY id
+                LIMIT %(limit)s
+            """, {"after": str(after) if after else None, "limit": limit, **params})
+        return read_rows(data, _REMATCH_FACE_ROW)
+
+    def count_rematch_candidates(self, after: UUID | None = None, include_legacy: bool = False) -> int:
+        where, params = self._rematch_filter(pyformat=False, include_legacy=include_legacy)
+        with get_db() as db:
+            return db.execute(
+                text(f"SELECT count(*) FROM face_detections WHERE {where}"),
+                {"after": str(after) if after else None, **params},
+            ).scalar() or 0
+
+    @staticmethod
+    def _rematch_filter(pyformat: bool, include_legacy: bool = False) -> tuple[str, dict]:
+        """WHERE clause (and gate parameters) selecting re-matching candidates with id > after."""
+        gate_sql, params = QualityGate.from_settings().sql("", pyformat=pyformat)
+        after = "%(after)s" if pyformat else ":after"
+        assigned = "person_id IS NOT NULL" if include_legacy else "person_auto"
+        return f"""
+            embedding IS NOT NULL AND NOT person_cleared
+            AND ({assigned} OR (person_id IS NULL AND {gate_sql}))
+            AND (CAST({after} AS uuid) IS NULL OR id > CAST({after} AS uuid))
+        """, params
+
+    def apply_rematch(self, job: str, face_ids: np.ndarray, person_ids: np.ndarray,
+                      position: UUID, processed: int, include_legacy: bool = False) -> int:
+        """
+        Store re-matched person ids ('V16', all-zero = unassign) for the given
+        faces, fix their media_persons links and move the job checkpoint, in one
+        transaction. Rows the user assigned or cleared since they were read are
+        left alone (with include_legacy only cleared ones, see
+        load_rematch_candidates); the prototype trigger updates person_prototypes.
+
+        Returns:
+            Number of faces changed.
+        """
+        changed = 0
+        with get_db() as db:
+            if len(face_ids):
+                rows = np.empty(len(face_ids), dtype=_CLUSTER_UPDATE_ROW)
+                rows["nfields"] = 2
+                rows["id_len"] = 16
+                rows["id"] = face_ids
+                rows["cid_len"] = 16
+                rows["cid"] = person_ids
+                db.execute(text(
+                    "CREATE TEMP TABLE face_rematch_updates (id uuid, person_id uuid) ON COMMIT DROP"
+                ))
+                copy_rows(db, "face_rematch_updates", ["id", "person_id"], [rows.tobytes()])
+                updated = db.execute(text(f"""
+                    WITH old AS (
+                        SELECT fd.id, fd.media_id, fd.person_id FROM face_detections fd
+                        JOIN face_rematch_updates u ON u.id = fd.id
+                        WHERE NOT fd.person_cleared AND (fd.person_id IS NULL OR fd.person_auto OR :legacy)
+                        ORDER BY fd.id
+                        FOR UPDATE OF fd
+                    )
+                    UPDATE face_detections fd
+                    SET person_id = NULLIF(u.person_id, '{_NIL_UUID}'::uuid),
+                        person_auto = u.person_id <> '{_NIL_UUID}'::uuid,
+                        cluster_id = CASE WHEN u.person_id <> '{_NIL_UUID}'::uuid THEN NULL ELSE fd.cluster_id END
+                    FROM face_rematch_updates u, old
+                    WHERE fd.id = u.id AND old.id = u.id
+                    RETURNING fd.media_id, fd.person_id, old.person_id AS old_person_id
+                """), {"legacy": include_legacy}).fetchall()
+                changed = len(updated)
+                added = {(str(r.media_id), str(r.person_id)) for r in updated if r.person_id}
+                removed = {(str(r.media_id), str(r.old_person_id)) for r in updated if r.old_person_id}
+                if added:
+                    db.execute(text("""
+                        INSERT INTO media_persons (media_id, person_id)
+                        SELECT m, p FROM unnest(CAST(:mids AS uuid[]), CAST(:pids AS uuid[])) AS t(m, p)
+                        ON CONFLICT DO NOTHING
+                    """), {"mids": [m for m, _ in added], "pids": [p for _, p in added]})
+                if removed:
+                    # Drop links whose person has no face left in that media
+                    db.execute(text("""
+                        DELETE FROM media_persons mp
+                        USING unnest(CAST(:mids AS uuid[]), CAST(:pids AS uuid[])) AS t(m, p)
+                        WHERE mp.media_id = t.m AND mp.person_id = t.p
+                          AND NOT EXISTS (
+                              SELECT 1 FROM face_detections fd
+                              WHERE fd.media_id = t.m AND fd.person_id = t.p
+                          )
+                    """), {"mids": [m for m, _ in removed], "pids": [p for _, p in removed]})
+            self._save_checkpoint(db, job, position, processed)
+            db.commit()
+        return changed
+
+    # ------------------------------------------------------------------
+    # Clustering of unassigned faces
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def ensure_cluster_schema(db) -> None:
+        """
+        Create face_clusters, its triggers and the unclustered-faces index inside the
+        caller's session (no commit), and backfill once from existing cluster ids.
+        Called from MediaRepository.apply_schema_migrations after the person
+        prototypes, whose person_prototype_unit() the triggers use.
+        """
+        for stmt in CLUSTER_SCHEMA_SQL:
+            db.execute(text(stmt))
+        needs_backfill = db.execute(text("""
+            SELECT NOT EXISTS (SELECT 1 FROM face_clusters)
+               AND EXISTS (SELECT 1 FROM face_detections
+                           WHERE cluster_id IS NOT NULL AND person_id IS NULL AND embedding IS NOT NULL)
+        """)).scalar()
+        if needs_backfill:
+            db.execute(text("""
+                INSERT INTO face_clusters (cluster_id, embedding_sum, face_count)
+                SELECT cluster_id, sum(person_prototype_unit(embedding)), count(*)
+                FROM face_detections
+                WHERE cluster_id IS NOT NULL AND person_id IS NULL AND embedding IS NOT NULL
+                GROUP BY cluster_id
+            """))
+
+    def load_unassigned_embeddings(self, scope: str = "all") -> tuple[np.ndarray, np.ndarray]:
+        """
+        Bulk-read unassigned face embeddings through binary COPY.
+
+        Args:
+            scope: "all" for every unassigned face (full runs), "unseen" for the
+                   faces no clustering run has looked at yet (clustered_at IS NULL),
+                   "leftovers" for faces a run has seen but left outside every
+                   cluster.
+
+        Returns:
+            (face ids as a 16-byte 'V16' array, (n, 512) float32 embeddings) of
+            faces passing the quality gate.
+        """
+        where = {
+            "all": "",
+            "unseen": "AND clustered_at IS NULL",
+            "leftovers": "AND cluster_id IS NULL AND clustered_at IS NOT NULL",
+        }[scope]
+        gate_sql, gate_params = QualityGate.from_settings().sql("", pyformat=True)
+        with get_db() as db:
+            data = copy_out(db, f"""
+                SELECT id, embedding FROM face_detections
+                WHERE person_id IS NULL AND NOT person_cleared AND embedding IS NOT NULL {where}
+                  AND {gate_sql}
+            """, gate_params)
+        rows = read_rows(data, _FACE_EMBEDDING_ROW)
+        return rows["id"].copy(), rows["vec"].astype(np.float32)
+
+    def find_leftover_neighbours(self, face_ids: np.ndarray, k: int,
+                                 max_distance: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Leftovers of earlier clustering runs (seen, in no cluster) among the k
+        nearest unassigned faces of any of the given faces, within max_distance.
+
+        Each face is one ORDER BY ... LIMIT k probe of the unassigned ANN index
+        (ix_face_detections_embedding_unassigned), so leftovers no new face has come
+        near are not read. Check unassigned_ann_index_ready() first: without the
+        index every probe is a sequential scan.
+
+        Returns:
+            (face ids 'V16', (n, 512) float32 embeddings), as load_unassigned_embeddings.
+        """
+        if len(face_ids) == 0:
+            return np.empty(0, dtype="V16"), np.empty((0, EMBEDDING_DIM), np.float32)
+        gate_sql, gate_params = QualityGate.from_settings().sql("l", pyformat=True)
+        params = {
+            "ids": [str(UUID(bytes=bytes(f))) for f in face_ids], "k": int(k),
+            "max_distance": float(max_distance), **gate_params,
+        }
+        with get_db() as db:
+            self._set_ann_params(db, ef_search=max(int(k), 40))
+            data = copy_out(db, f"""
+                SELECT DISTINCT ON (l.id) l.id, l.embedding
+                FROM face_detections q
+                CROSS JOIN LATERAL (
+                    SELECT * FROM face_detections fd
+                    WHERE fd.person_id IS NULL AND fd.embedding IS NOT NULL
+                    ORDER BY fd.embedding <=> q.embedding
+                    LIMIT %(k)s
+                ) l
+                WHERE q.id = ANY(CAST(%(ids)s AS uuid[]))
+                  AND l.cluster_id IS NULL AND l.clustered_at IS NOT NULL AND NOT l.person_cleared
+                  AND (l.embedding <=> q.embedding) < %(max_distance)s
+                  AND {gate_sql}
+                ORDER BY l.id
+            """, params)
+        rows = read_rows(data, _FACE_EMBEDDING_ROW)
+        return rows["id"].copy(), rows["vec"].astype(np.float32)
+
+    def unassigned_ann_index_ready(self) -> bool:
+        """Whether the unassigned-faces ANN index exists and is valid."""
+        with get_db() as db:
+            return "ix_face_detections_embedding_unassigned" not in self.missing_ann_indexes(db)
+
+    def count_unseen_unassigned_faces(self) -> int:
+        """Unassigned faces passing the quality gate that no clustering run has looked at yet."""
+        gate_sql, gate_params = QualityGate.from_settings().sql("")
+        with get_db() as db:
+            return db.execute(text(f"""
+                SELECT count(*) FROM face_detections
+                WHERE person_id IS NULL AND NOT person_cleared AND embedding IS NOT NULL
+                  AND clustered_at IS NULL AND {gate_sql}
+            """), gate_params).scalar() or 0
+
+    def get_cluster_centroids(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Per current cluster: id, unassigned face count and the sum of unit
+        embeddings, read from the stored face_clusters table.
+
+        Returns:
+            (cluster ids 'V16', int64 counts, (c, 512) float32 sums).
+        """
+        with get_db() as db:
+            data = copy_out(db, """
+                SELECT cluster_id, face_count::int8, embedding_sum
+                FROM face_clusters WHERE face_count > 0
+            """)
+        rows = read_rows(data, _CLUSTER_CENTROID_ROW)
+        return rows["id"].copy(), rows["count"].astype(np.int64), rows["vec"].astype(np.float32)
+
+    def save_face_clusters(self, face_ids: np.ndarray, cluster_ids: np.ndarray, reset: bool = False,
+                           centroids: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None) -> None:
+        """
+        Store cluster ids for the given faces and mark them as clustered.
+
+        Args:
+            face_ids: 'V16' face ids (as returned by load_unassigned_embeddings).
+            cluster_ids: 'V16' cluster id per face; all-zero bytes means no cluster.
+            reset: Clear every existing cluster id first (full re-clustering).
+            centroids: With reset, the new clusters as (ids, counts, sums of unit
+                       embeddings); they replace face_clusters wholesale instead of
+                       the triggers subtracting and re-adding every face.
+        """
+        rows = np.empty(len(face_ids), dtype=_CLUSTER_UPDATE_ROW)
+        rows["nfields"] = 2
+        rows["id_len"] = 16
+        rows["id"] = face_ids
+        rows["cid_len"] = 16
+        rows["cid"] = cluster_ids
+        if reset and centroids is None:
+            raise ValueError("save_face_clusters(reset=True) needs the new centroids")
+        with get_db() as db:
+            if reset:
+                db.execute(text("SET LOCAL acknowledge.skip_cluster_trigger = 'on'"))
+                db.execute(text("UPDATE face_detections SET cluster_id = NULL WHERE cluster_id IS NOT NULL"))
+            db.execute(text(
+                "CREATE TEMP TABLE face_cluster_updates (id uuid, cluster_id uuid) ON COMMIT DROP"
+            ))
+            if len(rows):
+                copy_rows(db, "face_cluster_updates", ["id", "cluster_id"], [rows.tobytes()])
+            db.execute(text("""
+                UPDATE face_detections fd
+                SET cluster_id = NULLIF(u.cluster_id, '00000000-0000-0000-0000-000000000000'::uuid),
+                    clustered_at = now()
+                FROM face_cluster_updates u
+                WHERE fd.id = u.id
+            """))
+            if reset:
+                ids, counts, sums = centroids
+                db.execute(text("DELETE FROM face_clusters"))
+                if len(ids):
+                    copy_rows(db, "face_clusters", ["cluster_id", "face_count", "embedding_sum"], [
+                        encode_row([encode_uuid(UUID(bytes=bytes(c))), struct.pack(">i", int(n)), encode_vector(v)])
+                        for c, n, v in zip(ids, counts, sums)
+                    ])
+            db.commit()
+
+    def get_face_clusters(self, min_size: int = 1, limit: int = 500) -> list[dict]:
+        """
+        Current clusters of unassigned faces, largest first.
+
+        Returns list of dicts with keys: cluster_id, face_count, media_count and
+        a sample face (sample_file_path, sample_bbox, sample_timestamp_ms).
+        """
+        gate_sql, gate_params = QualityGate.from_settings().sql("")
+        with get_db() as db:
+            rows = db.execute(text("""
+                SELECT c.cluster_id, c.face_count, c.media_count,
+                       m.file_path AS sample_file_path, s.bbox AS sample_bbox,
+                       s.timestamp_ms AS sample_timestamp_ms
+                FROM (
+                    SELECT cluster_id, count(*) AS face_count, count(DISTINCT media_id) AS media_count
+                    FROM face_detections
+                    WHERE cluster_id IS NOT NULL AND person_id IS NULL AND {gate_sql}
+                    GROUP BY cluster_id
+                    HAVING count(*) >= :min_size
+                    ORDER BY count(*) DESC
+                    LIMIT :limit
+                ) c
+                CROSS JOIN LATERAL (
+                    SELECT media_id, bbox, timestamp_ms FROM face_detections
+                    WHERE cluster_id = c.cluster_id AND person_id IS NULL AND {gate_sql}
+                    LIMIT 1
+                ) s
+                JOIN medias m ON m.id = s.media_id
+                ORDER BY c.face_count DESC
+            """.format(gate_sql=gate_sql)), {"min_size": min_size, "limit": limit, **gate_params}).fetchall()
+        return [
+            {
+                "cluster_id": UUID(str(r.cluster_id)), "face_count": r.face_count,
+                "media_count": r.media_count, "sample_file_path": r.sample_file_path,
+                "sample_bbox": r.sample_bbox, "sample_timestamp_ms": r.sample_timestamp_ms,
+            }
+            for r in rows
+        ]
+
+    def name_cluster(self, cluster_id: UUID, person_id: UUID) -> list[dict]:
+        """
+        Assign every unassigned face of a cluster that passes the quality gate to a
+        person and link the media, in one transaction.
+
+        Returns:
+            One dict per assigned face with face_id, media_id, embedding and
+            prototype_idx (set by the prototype trigger), for the match index.
+        """
+        gate_sql, gate_params = QualityGate.from_settings().sql("")
+        with get_db() as db:
+            rows = db.execute(text("""
+                UPDATE face_detections
+                SET person_id = :pid, person_cleared = FALSE, person_auto = FALSE, cluster_id = NULL
+                WHERE cluster_id = :cid AND person_id IS NULL AND {gate_sql}
+                RETURNING id, media_id, embedding::text AS embedding, prototype_idx
+            """.format(gate_sql=gate_sql)), {"pid": str(person_id), "cid": str(cluster_id), **gate_params}).fetchall()
+            if rows:
+                db.execute(text("""
+                    INSERT INTO media_persons (media_id, person_id)
+                    SELECT DISTINCT m, CAST(:pid AS uuid) FROM unnest(CAST(:mids AS uuid[])) AS m
+                    ON CONFLICT DO NOTHING
+                """), {"pid": str(person_id), "mids": list({str(r.media_id) for r in rows})})
+            db.commit()
+        return [
+            {
+                "face_id": UUID(str(r.id)), "media_id": UUID(str(r.media_id)),
+                "embedding": _parse_vector(r.embedding), "prototype_idx": r.prototype_idx,
+            }
+            for r in rows
+        ]
+
+    # ------------------------------------------------------------------
+    # ANN index management
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _set_ann_params(db, ef_search: int | None = None, probes: int | None = None) -> None:
+        """
+        Apply per-query ANN search parameters for the current transaction (SET LOCAL).
+        Unset arguments fall back to the face_ann_ef_search / face_ann_probes settings.
+        """
+        from src.utils.config_util import get_setting
+        ef_search = int(ef_search if ef_search is not None else get_setting("face_ann_ef_search", 100))
+        probes = int(probes if probes is not None else get_setting("face_ann_probes", 10))
+        # SET does not take bind parameters; values are validated ints
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {max(1, min(ef_search, 1000))}"))
+        db.execute(text(f"SET LOCAL ivfflat.probes = {max(1, probes)}"))
+
+    @staticmethod
+    def _ann_index_sql(kind: str, name: str, table: str, column: str, where: str | None,
+                       lists: int = 100, concurrently: bool = False) -> str:
+        if kind not in ANN_KINDS:
+            raise ValueError(f"Unknown ANN index kind: {kind}")
+        if kind == "hnsw":
+            params = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+        else:
+            params = f"lists = {lists}"
+        return (
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+            f"ON {table} USING {kind} ({column} vector_cosine_ops) WITH ({params})"
+            + (f" WHERE {where}" if where else "")
+        )
+
+    @staticmethod
+    def _ivfflat_lists(db, table: str, column: str, where: str | None) -> int:
+        """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+        cond = f"{column} IS NOT NULL" + (f" AND {where}" if where else "")
+        rows = db.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {cond}")).scalar() or 0
+        lists = rows // 1000 if rows <= 1_000_000 else int(rows ** 0.5)
+        return max(10, lists)
+
+    @staticmethod
+    def missing_ann_indexes(db) -> list[str]:
+        """
+        Names of managed ANN indexes that are missing or invalid (e.g. an interrupted
+        concurrent build). Only checks; called from MediaRepository.apply_schema_migrations,
+        the indexes themselves are built by `python face_index.py rebuild`.
+        """
+        valid = set(db.execute(text("""
+            SELECT c.relname FROM pg_class c
+            JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relname = ANY(:names) AND i.indisvalid
+        """), {"names": [name for name, *_ in ANN_INDEXES]}).scalars())
+        return [name for name, *_ in ANN_INDEXES if name not in valid]
+
+    def rebuild_ann_indexes(self, kind: str | None = None, concurrently: bool = True) -> list[str]:
+        """
+        Drop and recreate every managed ANN index (e.g. after a bulk import, or to
+        switch between HNSW and IVFFlat), and drop RETIRED_ANN_INDEXES. With
+        concurrently=True the tables stay writable during the build.
+
+        Returns:
+            Names of the rebuilt indexes.
+        """
+        from src.database import engine
+        if kind is None:
+            from src.utils.config_util import get_setting
+            kind = get_setting("face_ann_index", "hnsw")
+        if kind not in ANN_KINDS:
+            raise ValueError(f"Unknown ANN index kind: {kind}")
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for name in RETIRED_ANN_INDEXES:
+                conn.execute(text(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {name}"))
+            rebuilt = []
+            for name, table, column, where in ANN_INDEXES:
+                lists = self._ivfflat_lists(conn, table, column, where) if kind == "ivfflat" else 100
+                conn.execute(text(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {name}"))
+                conn.execute(text(self._ann_index_sql(kind, name, table, column, where, lists, concurrently)))
+                rebuilt.append(name)
+            return rebuilt
+
+    def get_ann_index_status(self) -> list[dict]:
+        """
+        Return one dict per managed index with keys: name, table, kind
+        ('hnsw'|'ivfflat'|None when missing), size_bytes, valid.
+        """
+        with get_db() as db:
+            result = db.execute(text("""
+                SELECT c.relname AS name, am.amname AS kind,
+                       pg_relation_size(c.oid) AS size_bytes, i.indisvalid AS valid
+                FROM pg_class c
+                JOIN pg_index i ON i.indexrelid = c.oid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE c.relname = ANY(:names)
+            """), {"names": [name for name, *_ in ANN_INDEXES]})
+            found = {row.name: dict(row._mapping) for row in result.fetchall()}
+        return [
+            {
+                "name": name, "table": table,
+                "kind": found.get(name, {}).get("kind"),
+                "size_bytes": found.get(name, {}).get("size_bytes", 0),
+                "valid": found.get(name, {}).get("valid", False),
+            }
+            for name, table, *_ in ANN_INDEXES
+        ]
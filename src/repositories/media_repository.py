@@ -267,6 +267,17 @@ class MediaRepository:
             )
             db.commit()
 
+    def mark_face_detected_many(self, media_ids: list[UUID]) -> None:
+        """Set face_detected_at = now for several media records in one statement."""
+        if not media_ids:
+            return
+        with get_db() as db:
+            db.execute(
+                text("UPDATE medias SET face_detected_at = now() WHERE id = ANY(CAST(:mids AS uuid[]))"),
+                {"mids": [str(mid) for mid in media_ids]}
+            )
+            db.commit()
+
     def mark_captioned(self, media_id: UUID) -> None:
         """Set captioned_at = now for a media record."""
         with get_db() as db:
@@ -647,8 +658,22 @@ class MediaRepository:
             except Exception:
                 pass
 
+            try:
+                db.execute(text("ALTER TABLE face_detections ADD COLUMN IF NOT EXISTS track_start_ms FLOAT"))
+                db.execute(text("ALTER TABLE face_detections ADD COLUMN IF NOT EXISTS track_end_ms FLOAT"))
+            except Exception:
+                pass
+
+            try:
+                for col_name in ("det_score", "blur_score", "face_px", "yaw", "pitch", "roll"):
+                    db.execute(text(f"ALTER TABLE face_detections ADD COLUMN IF NOT EXISTS {col_name} FLOAT"))
+            except Exception:
+                pass
+
             try:
                 db.execute(text("ALTER TABLE face_detections ADD COLUMN IF NOT EXISTS person_cleared BOOLEAN NOT NULL DEFAULT FALSE"))
+                # Assigned by automatic matching (revisable by the re-matching job) vs by the user
+                db.execute(text("ALTER TABLE face_detections ADD COLUMN IF NOT EXISTS person_auto BOOLEAN NOT NULL DEFAULT FALSE"))
             except Exception:
                 pass
 
@@ -656,6 +681,16 @@ class MediaRepository:
                 db.execute(text("ALTER TABLE persons ADD COLUMN IF NOT EXISTS reference_embedding vector(512)"))
             except Exception:
                 pass
+
+            try:
+                db.execute(text("ALTER TABLE face_detections ADD COLUMN IF NOT EXISTS cluster_id UUID"))
+                db.execute(text("ALTER TABLE face_detections ADD COLUMN IF NOT EXISTS clustered_at TIMESTAMPTZ"))
+                db.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_face_detections_cluster_id "
+                    "ON face_detections (cluster_id) WHERE cluster_id IS NOT NULL"
+                ))
+            except Exception:
+                pass
                 
             # 3. Enforce ON DELETE CASCADE for all tables that reference medias.id
             constraints = [
@@ -697,5 +732,42 @@ class MediaRepository:
             except Exception:
                 pass
 
+            # 5. Person prototypes (incremental per-person centroids)
+            try:
+                from src.repositories.person_repository import PersonRepository
+                with db.begin_nested():
+                    PersonRepository.ensure_prototype_schema(db)
+            except Exception as e:
+                import logging
+                logging.getLogger(__name__).warning(f"Person prototype migration failed: {e}")
+
+            # 5b. Stored face cluster centroids (uses person_prototype_unit from step 5)
+            try:
+                from src.repositories.face_repository import FaceRepository
+                with db.begin_nested():
+                    FaceRepository.ensure_cluster_schema(db)
+            except Exception as e:
+                import logging
+                logging.getLogger(__name__).warning(f"Face cluster migration failed: {e}")
+
+            # 6. Approximate-nearest-neighbour indexes on face embeddings: only checked here,
+            #    building them blocks writes for minutes on a large table (face_index.py rebuild)
+            try:
+                from src.utils.config_util import get_setting
+                from src.repositories.face_repository import ANN_KINDS, FaceRepository
+                if get_setting("face_ann_index", "hnsw") in ANN_KINDS:
+                    with db.begin_nested():
+                        missing = FaceRepository.missing_ann_indexes(db)
+                    if missing:
+                        import logging
+                        logging.getLogger(__name__).warning(
+                            f"ANN indexes missing or invalid: {', '.join(missing)}; "
+                            f"run `python face_index.py rebuild` to build them",
+                            extra={"event": "ann_indexes_missing", "indexes": missing},
+                        )
+            except Exception as e:
+                import logging
+                logging.getLogger(__name__).warning(f"ANN index check failed: {e}")
+
             db.commit()
 
@@ -5,6 +5,145 @@ from sqlalchemy import text
 import uuid as uuid_module
 import numpy as np
 
+# Person prototypes: up to MAX_PROTOTYPES running centroids per person. A labelled
+# face joins its nearest prototype, or starts a new one when it is farther than
+# PROTOTYPE_SPLIT_DISTANCE (cosine) from all of them and there is room.
+MAX_PROTOTYPES = 4
+PROTOTYPE_SPLIT_DISTANCE = 0.45
+
+# Outlier radius: once a prototype has OUTLIER_MIN_FACES members, a match must also
+# lie within OUTLIER_RADIUS_FACTOR × its radius (mean member distance). 0 disables.
+OUTLIER_MIN_FACES = 5
+OUTLIER_RADIUS_FACTOR = 2.5
+
+
+def prototype_match_limit(face_count: int, radius: float, threshold: float) -> float:
+    """Largest cosine distance at which a face may still match this prototype."""
+    if OUTLIER_RADIUS_FACTOR > 0 and face_count >= OUTLIER_MIN_FACES and radius > 0:
+        return min(threshold, OUTLIER_RADIUS_FACTOR * radius)
+    return threshold
+
+# Trigger-maintained so every path that labels, relabels or deletes faces
+# (including ON DELETE CASCADE from medias/events and bulk writes) keeps the
+# sums exact. Only uses functions available in pgvector 0.5.
+PROTOTYPE_SCHEMA_SQL = [
+    "ALTER TABLE face_detections ADD COLUMN IF NOT EXISTS prototype_idx SMALLINT",
+    "ALTER TABLE persons ADD COLUMN IF NOT EXISTS reference_prototype_idx SMALLINT",
+    """
+    CREATE TABLE IF NOT EXISTS person_prototypes (
+        person_id UUID NOT NULL REFERENCES persons(id) ON DELETE CASCADE,
+        idx SMALLINT NOT NULL,
+        embedding_sum vector(512) NOT NULL,
+        face_count INTEGER NOT NULL DEFAULT 0,
+        radius FLOAT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ DEFAULT now(),
+        PRIMARY KEY (person_id, idx)
+    )
+    """,
+    """
+    CREATE OR REPLACE FUNCTION person_prototype_unit(emb vector) RETURNS vector AS $$
+        SELECT CASE WHEN vector_norm(emb) = 0 THEN emb ELSE
+            (SELECT array_agg(x / vector_norm(emb) ORDER BY i)
+             FROM unnest(emb::real[]) WITH ORDINALITY AS t(x, i))::vector
+        END
+    $$ LANGUAGE sql IMMUTABLE STRICT
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION person_prototype_add(pid uuid, emb vector) RETURNS smallint AS $$
+    DECLARE
+        unit vector := person_prototype_unit(emb);
+        best_idx smallint;
+        best_dist float8;
+        n_protos int;
+    BEGIN
+        SELECT idx, embedding_sum <=> unit INTO best_idx, best_dist
+        FROM person_prototypes WHERE person_id = pid
+        ORDER BY embedding_sum <=> unit LIMIT 1;
+        SELECT count(*) INTO n_protos FROM person_prototypes WHERE person_id = pid;
+        IF best_idx IS NULL OR (best_dist > {PROTOTYPE_SPLIT_DISTANCE} AND n_protos < {MAX_PROTOTYPES}) THEN
+            SELECT min(g)::smallint INTO best_idx FROM generate_series(0, {MAX_PROTOTYPES} - 1) g
+            WHERE g NOT IN (SELECT idx FROM person_prototypes WHERE person_id = pid);
+        END IF;
+        INSERT INTO person_prototypes AS pp (person_id, idx, embedding_sum, face_count, radius)
+        VALUES (pid, best_idx, unit, 1, 0)
+        ON CONFLICT (person_id, idx) DO UPDATE SET
+            embedding_sum = pp.embedding_sum + EXCLUDED.embedding_sum,
+            face_count = pp.face_count + 1,
+            radius = 1 - vector_norm(pp.embedding_sum + EXCLUDED.embedding_sum) / (pp.face_count + 1),
+            updated_at = now();
+        RETURN best_idx;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION person_prototype_remove(pid uuid, pidx smallint, emb vector) RETURNS void AS $$
+    DECLARE
+        unit vector := person_prototype_unit(emb);
+    BEGIN
+        UPDATE person_prototypes SET
+            embedding_sum = embedding_sum - unit,
+            face_count = face_count - 1,
+            radius = CASE WHEN face_count > 1
+                          THEN 1 - vector_norm(embedding_sum - unit) / (face_count - 1) ELSE 0 END,
+            updated_at = now()
+        WHERE person_id = pid AND idx = pidx;
+        DELETE FROM person_prototypes WHERE person_id = pid AND idx = pidx AND face_count <= 0;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION face_detections_prototype_trg() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND NEW.person_id IS NOT DISTINCT FROM OLD.person_id
+           AND NEW.embedding IS NOT DISTINCT FROM OLD.embedding THEN
+            RETURN NEW;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.prototype_idx IS NOT NULL
+           AND OLD.person_id IS NOT NULL AND OLD.embedding IS NOT NULL THEN
+            PERFORM person_prototype_remove(OLD.person_id, OLD.prototype_idx, OLD.embedding);
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            RETURN OLD;
+        END IF;
+        NEW.prototype_idx := NULL;
+        IF NEW.person_id IS NOT NULL AND NEW.embedding IS NOT NULL THEN
+            NEW.prototype_idx := person_prototype_add(NEW.person_id, NEW.embedding);
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_face_detections_prototype ON face_detections",
+    """
+    CREATE TRIGGER trg_face_detections_prototype
+    BEFORE INSERT OR UPDATE OF person_id, embedding OR DELETE ON face_detections
+    FOR EACH ROW EXECUTE FUNCTION face_detections_prototype_trg()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION persons_prototype_trg() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.reference_embedding IS NOT DISTINCT FROM OLD.reference_embedding THEN
+            RETURN NEW;
+        END IF;
+        IF OLD.reference_prototype_idx IS NOT NULL AND OLD.reference_embedding IS NOT NULL THEN
+            PERFORM person_prototype_remove(OLD.id, OLD.reference_prototype_idx, OLD.reference_embedding);
+        END IF;
+        NEW.reference_prototype_idx := NULL;
+        IF NEW.reference_embedding IS NOT NULL THEN
+            NEW.reference_prototype_idx := person_prototype_add(NEW.id, NEW.reference_embedding);
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_persons_prototype ON persons",
+    """
+    CREATE TRIGGER trg_persons_prototype
+    BEFORE UPDATE OF reference_embedding ON persons
+    FOR EACH ROW EXECUTE FUNCTION persons_prototype_trg()
+    """,
+]
+
 
 class PersonRepository:
     def find_or_create(self, name: str) -> UUID:
@@ -155,7 +294,10 @@ class PersonRepository:
             return [row.name for row in result.fetchall()]
 
     def set_reference_embedding(self, person_id: UUID, embedding: np.ndarray) -> None:
-        """Store a reference face embedding on the person record."""
+        """
+        Store a reference face embedding on the person record.
+        The persons trigger folds it into the person's prototypes (replacing the old one).
+        """
         emb_str = "[" + ",".join(str(v) for v in embedding.tolist()) + "]"
         with get_db() as db:
             db.execute(text("""
@@ -196,3 +338,75 @@ class PersonRepository:
                 ORDER BY face_count DESC, p.name
             """), {"event_id": str(event_id)})
             return [dict(row._mapping) for row in result.fetchall()]
+
+    # ------------------------------------------------------------------
+    # Prototypes
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def ensure_prototype_schema(db) -> None:
+        """
+        Create person_prototypes, its columns, functions and triggers inside the
+        caller's session (no commit), and backfill once for existing labels.
+        Called from MediaRepository.apply_schema_migrations.
+        """
+        for stmt in PROTOTYPE_SCHEMA_SQL:
+            db.execute(text(stmt))
+        needs_backfill = db.execute(text("""
+            SELECT NOT EXISTS (SELECT 1 FROM person_prototypes)
+               AND (EXISTS (SELECT 1 FROM face_detections WHERE person_id IS NOT NULL AND embedding IS NOT NULL)
+                    OR EXISTS (SELECT 1 FROM persons WHERE reference_embedding IS NOT NULL))
+        """)).scalar()
+        if needs_backfill:
+            PersonRepository._rebuild_prototypes(db)
+
+    @staticmethod
+    def _rebuild_prototypes(db) -> None:
+        """Recompute every person's prototypes from scratch as a single centroid (idx 0)."""
+        db.execute(text("DELETE FROM person_prototypes"))
+        # Only prototype columns are written, so the UPDATE OF person_id/embedding triggers stay quiet
+        db.execute(text("""
+            UPDATE face_detections
+            SET prototype_idx = CASE WHEN person_id IS NOT NULL AND embedding IS NOT NULL THEN 0 END
+        """))
+        db.execute(text("""
+            UPDATE persons SET reference_prototype_idx = CASE WHEN reference_embedding IS NOT NULL THEN 0 END
+        """))
+        db.execute(text("""
+            INSERT INTO person_prototypes (person_id, idx, embedding_sum, face_count, radius)
+            SELECT person_id, 0, sum(unit), count(*), 1 - vector_norm(sum(unit)) / count(*)
+            FROM (
+                SELECT person_id, person_prototype_unit(embedding) AS unit
+                FROM face_detections WHERE person_id IS NOT NULL AND embedding IS NOT NULL
+                UNION ALL
+                SELECT id, person_prototype_unit(reference_embedding)
+                FROM persons WHERE reference_embedding IS NOT NULL
+            ) members
+            GROUP BY person_id
+        """))
+
+    def rebuild_prototypes(self) -> None:
+        """Recompute all prototypes (e.g. to clear accumulated float drift). Collapses each person to one prototype."""
+        with get_db() as db:
+            self._rebuild_prototypes(db)
+            db.commit()
+
+    def get_prototypes(self) -> list[dict]:
+        """
+        Return every prototype with keys: person_id, idx, name, embedding_sum
+        (np.ndarray), face_count, radius. Used to load PersonMatchIndex.
+        """
+        with get_db() as db:
+            result = db.execute(text("""
+                SELECT pp.person_id, pp.idx, p.name, pp.embedding_sum::text AS embedding_sum,
+                       pp.face_count, pp.radius
+                FROM person_prototypes pp
+                JOIN persons p ON p.id = pp.person_id
+                WHERE pp.face_count > 0
+            """))
+            rows = []
+            for r in result.fetchall():
+                d = dict(r._mapping)
+                d["embedding_sum"] = np.array(d["embedding_sum"].strip("[]").split(","), dtype=np.float32)
+                rows.append(d)
+            return rows
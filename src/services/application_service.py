@@ -58,6 +58,8 @@ class ApplicationService:
                 # responses (see OllamaCaptionService.__init__ note). Natural
                 # chain-of-thought without the flag works better here.
                 thinking=False,
+                parallel=config_util.get_setting("caption_ollama_parallel", 2),
+                stream=config_util.get_setting("caption_ollama_stream", True),
             )
             self.logger.info("Caption backend: Gemma4 (Ollama)")
             return svc
@@ -25,6 +25,10 @@ class CaptionBackend(Protocol):
         """Run inference on a single image. Blocking — call from QThread."""
         ...
 
+    def analyse_batch(self, img_paths: list[str], person_names_list: list | None = None) -> list[CaptionResult]:
+        """Run inference on several images; one result per path, in order. Blocking — call from QThread."""
+        ...
+
     def is_ready(self) -> bool:
         """True if the model/connection is loaded and ready to serve."""
         ...
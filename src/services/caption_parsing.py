@@ -25,13 +25,20 @@ CAPTION_JSON_SCHEMA = {
 }
 
 
-def get_combined_prompt(person_names: list[str] = None) -> str:
+def get_prompt_parts(person_names: list[str] = None) -> tuple[str, str]:
+    """Return (instructions, names_instruction).
+
+    The instruction block (rules + JSON example) is identical for every image;
+    only the person-names sentence ("" without names) changes. Backends put the
+    image and the names after the instructions, so the instructions are a
+    shared prompt prefix (CaptionService reuses its KV cache).
+    """
     names_instruction = ""
     if person_names:
         names_str = ", ".join(person_names)
         names_instruction = (
             "Fotoğrafdaki kişiler: " + names_str + ". "
-            "Bu isimleri Türkçe açıklamada doğal bir şekilde kullan. "
+            "Bu isimleri Türkçe açıklamada doğal bir şekilde kullan."
         )
 
     example = json.dumps({
@@ -39,11 +46,10 @@ def get_combined_prompt(person_names: list[str] = None) -> str:
         "tags_tr": "konuşma, kürsü, türk bayrağı, dinleyiciler, resmi toplantı, kapalı mekan",
     }, ensure_ascii=False)
 
-    return (
+    instructions = (
         "Aşağıdaki fotoğrafı Türkçe olarak belgele. "
         "Sadece aşağıdaki JSON formatında yanıt ver, başka hiçbir şey yazma. "
-        + names_instruction
-        + "Kurallar: "
+        "Kurallar: "
         "- Yalnızca açıkça görünen şeyleri yaz; tahmin etme, çıkarım yapma. "
         "- Giysi veya kravat rengini ancak kesinlikle emin olduğunda belirt; emin değilsen rengi hiç yazma. "
         "- ‘bu fotoğrafta’, ‘fotoğrafta görülen’, ‘yer aldığı’, ‘vurgulanıyor’, ‘dikkat çekiyor’ "
@@ -63,6 +69,15 @@ def get_combined_prompt(person_names: list[str] = None) -> str:
         "JSON dışında hiçbir metin yazma.\n"
         + example
     )
+    return instructions, names_instruction
+
+
+def get_combined_prompt(person_names: list[str] = None) -> str:
+    """Single-text prompt: the instructions followed by the names sentence."""
+    instructions, names_instruction = get_prompt_parts(person_names)
+    if not names_instruction:
+        return instructions
+    return instructions + "\n" + names_instruction
 
 
 
@@ -196,3 +211,76 @@ def parse_combined_response(raw: str, person_names: list[str] = None) -> tuple[s
 
     logger.warning("caption_parsing: JSON parse failed, raw response: %s", raw[:200])
     return "", ""
+
+
+_CAPTION_KEYS = ("caption_tr", "caption")
+_TAGS_KEYS = ("tags_tr", "tags_tr_", "tags")
+_PARTIAL_CAPTION_RE = re.compile(r'"(?:caption_tr|caption)"\s*:\s*"((?:[^"\\]|\\.)*)', re.DOTALL)
+
+
+class CaptionStreamParser:
+    """Incremental reader of a streamed caption response.
+
+    feed() takes the response text chunk by chunk and returns the first
+    complete top-level JSON object holding a caption and a tags field as soon
+    as its closing brace arrives (None until then), so the caller can stop the
+    stream; anything the model writes after it is not needed. Braces inside
+    JSON strings are skipped.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> dict | None:
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._depth > 0  # quotes in prose around the object do not count
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = self._complete(text[self._start:i + 1])
+                    if obj is not None:
+                        self._pos = i + 1
+                        return obj
+        self._pos = len(text)
+        return None
+
+    @staticmethod
+    def _complete(candidate: str) -> dict | None:
+        try:
+            obj = json.loads(re.sub(r',\s*\}', '}', candidate))
+        except ValueError:
+            return None
+        if isinstance(obj, dict) and any(k in obj for k in _CAPTION_KEYS) and any(k in obj for k in _TAGS_KEYS):
+            return obj
+        return None
+
+    def partial_caption(self) -> str:
+        """caption_tr text received so far ("" before its value starts)."""
+        m = _PARTIAL_CAPTION_RE.search(self.text)
+        if not m:
+            return ""
+        value = re.sub(r'\\(u[0-9a-fA-F]{0,3})?$', '', m.group(1))  # drop a cut-off escape
+        try:
+            return json.loads(f'"{value}"').strip()
+        except ValueError:
+            return value.strip()
@@ -4,10 +4,18 @@ CaptionService — wraps Qwen2.5-VL-3B-Instruct for image captioning and tagging
 Design:
 - Singleton with threading.Lock (mirrors FaceAnalysisService)
 - Model loads lazily on first analyse() call
+- analyse_batch() left-pads several image+prompt chat inputs into one
+  generate() call and splits the decoded outputs back per image; analyse()
+  is the single-image case
+- The chat prompt up to the image is the same for every image; its KV cache
+  is computed once and reused ("caption_prefix_cache" setting)
 - Runs synchronously; callers must use QThread to avoid UI blocking
 - CUDA used automatically when available; CPU fallback without device_map="auto"
+- "caption_cpu_precision" = "int8" quantizes the decoder's linear layers
+  dynamically after loading on CPU (quality and speed: caption_model.py benchmark)
 """
 from __future__ import annotations
+import copy
 import logging
 import os
 import ssl
@@ -33,7 +41,7 @@ requests.Session.__init__ = _patched_session_init
 
 
 from src.domain.entities.caption_result import CaptionResult
-from src.services.caption_parsing import get_combined_prompt, parse_combined_response
+from src.services.caption_parsing import get_prompt_parts, parse_combined_response
 
 logger = logging.getLogger(__name__)
 
@@ -57,12 +65,71 @@ class CaptionService:
     _processor = None
     _lock = threading.Lock()
     _device: str = "cpu"
+    _cpu_precision: str | None = None  # overrides "caption_cpu_precision"
+    _cpu_threads: int | None = None    # overrides "caption_cpu_threads"
+
+    # Local copies of the model (download_model.py), tried in order before the hub ID
+    MODEL_ID = "Qwen/Qwen2.5-VL-3B-Instruct"
+    LOCAL_MODEL_DIRS = (
+        Path("./src/models/Qwen2.5-VL-3B-Instruct"),
+        Path("./models/Qwen2.5-VL-3B-Instruct"),
+    )
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
 
+    @classmethod
+    def configure_cpu(cls, precision: str | None = None, threads: int | None = None) -> None:
+        """Override CPU precision / torch threads for the next model load."""
+        cls._cpu_precision = precision
+        cls._cpu_threads = threads
+
+    @classmethod
+    def cpu_precision(cls) -> str:
+        """Requested precision on CPU: "fp32" or "int8" (dynamically quantized linear layers)."""
+        from src.utils import config_util
+        precision = cls._cpu_precision or config_util.get_setting("caption_cpu_precision", "fp32") or "fp32"
+        return str(precision).lower()
+
+    @classmethod
+    def cpu_threads(cls) -> int:
+        """torch threads on CPU/MPS; 0 in settings means half the cores (at least 2)."""
+        from src.utils import config_util
+        threads = cls._cpu_threads or int(config_util.get_setting("caption_cpu_threads", 0) or 0)
+        return threads if threads > 0 else max(2, (os.cpu_count() or 4) // 2)
+
+    @classmethod
+    def model_source(cls) -> str:
+        """Local model directory if present, else the hub ID."""
+        local = next((p for p in cls.LOCAL_MODEL_DIRS if (p / "config.json").exists()), None)
+        return str(local) if local else cls.MODEL_ID
+
+    @staticmethod
+    def quantize_for_cpu(model):
+        """
+        int8 dynamic quantization (in place) of the decoder's and lm_head's
+        nn.Linear layers: weights stored as int8, activations quantized per
+        call. The vision tower stays fp32 — it runs once per image, while the
+        decoder runs once per generated token.
+        """
+        from torch.ao.quantization import quantize_dynamic
+
+        names = {
+            name for name, module in model.named_modules()
+            if isinstance(module, torch.nn.Linear) and "visual" not in name.split(".")
+        }
+        return quantize_dynamic(model, names, dtype=torch.qint8, inplace=True)
+
+    def unload(self) -> None:
+        """Drop the loaded model so the next call reloads it with the current options."""
+        with self._lock:
+            self._model = None
+            self._processor = None
+            CaptionService._prefix_cache = None
+            CaptionService._prefix_cache_broken = False
+
     def _load_model(self) -> None:
         """Lazy-load Qwen2.5-VL-3B-Instruct (only once per process).
 
@@ -94,12 +161,7 @@ class CaptionService:
                 self._device = "cpu"
             logger.info(f"CaptionService: loading model on {self._device}")
 
-            _candidates = [
-                Path("./src/models/Qwen2.5-VL-3B-Instruct"),
-                Path("./models/Qwen2.5-VL-3B-Instruct"),
-            ]
-            _local = next((p for p in _candidates if (p / "config.json").exists()), None)
-            model_id = str(_local) if _local else "Qwen/Qwen2.5-VL-3B-Instruct"
+            model_id = self.model_source()
             logger.info(f"CaptionService: model source → {model_id}")
 
             if cuda_available:
@@ -114,7 +176,7 @@ class CaptionService:
             elif mps_available:
                 # Use bfloat16: PyTorch 2.5+ / 2.11.0 on MPS has native bfloat16 support.
                 # bfloat16 prevents numerical overflow/NaN attention loops (which caused !!! repetition bugs).
-                torch.set_num_threads(max(2, (os.cpu_count() or 4) // 2))
+                torch.set_num_threads(self.cpu_threads())
                 self._model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
                     model_id,
                     torch_dtype=torch.bfloat16,
@@ -123,11 +185,15 @@ class CaptionService:
             else:
                 # No device_map on CPU — avoids "cannot copy out of meta tensor" from accelerate.
                 # Limit threads so captioning doesn't saturate all cores on low-end machines.
-                torch.set_num_threads(max(2, (os.cpu_count() or 4) // 2))
+                torch.set_num_threads(self.cpu_threads())
                 self._model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
                     model_id,
                     torch_dtype=torch.float32,
                 )
+                if self.cpu_precision() == "int8":
+                    # Quantized from the fp32 weights at load time; no extra files on disk
+                    self.quantize_for_cpu(self._model)
+                    logger.info("CaptionService: decoder linear layers quantized to int8")
 
             self._processor = Qwen2_5_VLProcessor.from_pretrained(model_id)
             logger.info("✅ CaptionService: Qwen2.5-VL-3B-Instruct loaded", extra={"event": "MODEL_LOAD"})
@@ -147,66 +213,221 @@ class CaptionService:
     MAX_PIXELS = 1280 * 1280
     MIN_PIXELS = 224 * 224
 
-    def _run_prompt(self, image_input, prompt_text: str) -> str:
+    # Decoding settings shared by the plain and the prefix-cached path
+    GENERATE_KWARGS = dict(
+        max_new_tokens=400,  # 400 provides extra headroom to prevent JSON truncation with detailed captions
+        do_sample=False,
+        repetition_penalty=1.15,   # kills token-loop bug ("göğüslerindeki sakallar" repeating)
+        no_repeat_ngram_size=4,    # blocks any 4-gram from repeating verbatim
+    )
+
+    # KV cache of the chat prompt up to the image (system turn + caption
+    # instructions): (prefix token ids, cache, encode seconds). Built on first
+    # use; _prefix_cache_broken turns the cache off for the process after it
+    # failed once (e.g. a transformers version with another model layout).
+    _prefix_cache = None
+    _prefix_cache_broken = False
+
+    def _run_prompt(self, image_input, prompt_parts: tuple[str, str]) -> str:
         """Run a single vision prompt and return stripped output text.
 
         image_input may be a PIL.Image.Image (in-memory) or a file path string.
         """
-        from qwen_vl_utils import process_vision_info
+        return self._run_prompts([image_input], [prompt_parts])[0]
 
-        messages = [
+    def _conversation(self, image_input, prompt_parts: tuple[str, str]) -> list[dict]:
+        """Chat turn ordered instructions → image → names (see get_prompt_parts)."""
+        instructions, names_instruction = prompt_parts
+        content = [
+            {"type": "text", "text": instructions},
             {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "image": image_input,
-                        "min_pixels": self.MIN_PIXELS,
-                        "max_pixels": self.MAX_PIXELS,
-                    },
-                    {"type": "text", "text": prompt_text},
-                ],
-            }
+                "type": "image",
+                "image": image_input,
+                "min_pixels": self.MIN_PIXELS,
+                "max_pixels": self.MAX_PIXELS,
+            },
         ]
+        if names_instruction:
+            content.append({"type": "text", "text": names_instruction})
+        return [{"role": "user", "content": content}]
+
+    def _run_prompts(self, image_inputs: list, prompt_parts: list[tuple[str, str]]) -> list[str]:
+        """Run one vision prompt per image in a single generate() call.
+
+        prompt_parts holds the (instructions, names_instruction) pair of each
+        image. Every chat input starts with the same tokens up to the image;
+        with the prompt prefix cache those are not encoded again (see
+        _generate_with_prefix_cache). Otherwise the inputs are left-padded to
+        a common length, so every row's new tokens start at the same position.
+        Returns the stripped output text per image, in order.
+        """
+        from qwen_vl_utils import process_vision_info
 
-        text_input = self._processor.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
-        )
-        image_inputs, video_inputs = process_vision_info(messages)
+        conversations = [
+            self._conversation(image_input, parts)
+            for image_input, parts in zip(image_inputs, prompt_parts)
+        ]
+        text_inputs = [
+            self._processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+            for messages in conversations
+        ]
+        image_batch, video_batch = process_vision_info(conversations)
+        # Decoder-only generation needs left padding: right padding would put
+        # pad tokens between a short prompt and its generated tokens
+        self._processor.tokenizer.padding_side = "left"
         inputs = self._processor(
-            text=[text_input],
-            images=image_inputs,
-            videos=video_inputs,
+            text=text_inputs,
+            images=image_batch,
+            videos=video_batch,
             padding=True,
             return_tensors="pt",
         )
         # Single fused copy: move to device and cast dtype in one operation
         inputs = inputs.to(device=self._device, dtype=self._model.dtype)
 
-        start_time = time.perf_counter()
-        with torch.no_grad():
-            generated_ids = self._model.generate(
-                **inputs,
-                max_new_tokens=400,  # 400 provides extra headroom to prevent JSON truncation with detailed captions
-                do_sample=False,
-                repetition_penalty=1.15,   # kills token-loop bug ("göğüslerindeki sakallar" repeating)
-                no_repeat_ngram_size=4,    # blocks any 4-gram from repeating verbatim
+        generated_ids = None
+        if self._prefix_cache_enabled():
+            try:
+                generated_ids, input_ids = self._generate_with_prefix_cache(text_inputs[0], inputs)
+            except torch.cuda.OutOfMemoryError:
+                raise
+            except Exception as e:
+                logger.warning(f"CaptionService: prompt prefix cache disabled, encoding full prompts: {e}")
+                CaptionService._prefix_cache_broken = True
+                CaptionService._prefix_cache = None
+
+        if generated_ids is None:
+            input_ids = inputs.input_ids
+            start_time = time.perf_counter()
+            with torch.no_grad():
+                generated_ids = self._model.generate(
+                    **inputs,
+                    **self.GENERATE_KWARGS,
+                    pad_token_id=self._processor.tokenizer.pad_token_id,
+                )
+            generation_time = time.perf_counter() - start_time
+            logger.info(
+                f"CaptionService: generation took {generation_time:.2f}s for {len(text_inputs)} image(s)",
+                extra={"event": "CAPTION_RESULT", "duration_ms": int(generation_time * 1000)},
             )
-        generation_time = time.perf_counter() - start_time
-        logger.info(
-            f"CaptionService: generation took {generation_time:.2f}s",
-            extra={"event": "CAPTION_RESULT", "duration_ms": int(generation_time * 1000)},
-        )
 
-        # Strip input tokens — Qwen canonical pattern
+        # Strip input tokens — Qwen canonical pattern (all rows share the padded prompt length)
         trimmed = [
             out[len(inp):]
-            for inp, out in zip(inputs.input_ids, generated_ids)
+            for inp, out in zip(input_ids, generated_ids)
         ]
         decoded = self._processor.batch_decode(
             trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
         )
-        return decoded[0].strip() if decoded else ""
+        return [text.strip() for text in decoded]
+
+    @classmethod
+    def _prefix_cache_enabled(cls) -> bool:
+        from src.utils import config_util
+        return not cls._prefix_cache_broken and bool(config_util.get_setting("caption_prefix_cache", True))
+
+    def _backbone(self):
+        """Module that embeds the images and owns get_rope_index / rope_deltas.
+
+        transformers >= 4.52 splits Qwen2.5-VL into a Qwen2_5_VLModel (model.model)
+        plus lm_head; older versions keep both on the top-level model.
+        """
+        inner = getattr(self._model, "model", None)
+        return inner if hasattr(inner, "get_rope_index") else self._model
+
+    def _prompt_prefix(self, chat_text: str):
+        """(prefix ids, KV cache, encode seconds) of chat_text up to its first image, built once."""
+        cut = chat_text.find("<|vision_start|>")
+        if cut <= 0:
+            raise ValueError("chat prompt has no image placeholder")
+        prefix_ids = self._processor.tokenizer(
+            chat_text[:cut], add_special_tokens=False, return_tensors="pt"
+        ).input_ids.to(self._device)
+        cached = CaptionService._prefix_cache
+        if cached is not None and torch.equal(cached[0], prefix_ids):
+            return cached
+        start_time = time.perf_counter()
+        with torch.no_grad():
+            outputs = self._backbone()(input_ids=prefix_ids, use_cache=True)
+        cached = (prefix_ids, outputs.past_key_values, time.perf_counter() - start_time)
+        CaptionService._prefix_cache = cached
+        logger.info(f"CaptionService: prompt prefix cached ({prefix_ids.shape[1]} tokens, {cached[2]:.2f}s)")
+        return cached
+
+    def _generate_with_prefix_cache(self, chat_text: str, inputs) -> tuple:
+        """generate() starting from a copy of the prompt prefix's KV cache.
+
+        The rows are rebuilt as prefix + padding + rest (image, names, generation
+        prompt), so the prefix sits at positions 0..P-1 of every row as in the
+        cache. The rest except its last token is prefilled on top of the cache
+        with the M-RoPE positions of the full rows; generate() then continues
+        from the last prompt token. Returns (generated ids, padded input ids).
+        """
+        prefix_ids, prefix_cache, prefix_seconds = self._prompt_prefix(chat_text)
+        prefix_len = prefix_ids.shape[1]
+        rows = [ids[mask.bool()] for ids, mask in zip(inputs.input_ids, inputs.attention_mask)]
+        for ids in rows:
+            if len(ids) <= prefix_len + 1 or not torch.equal(ids[:prefix_len], prefix_ids[0]):
+                raise ValueError("chat prompt does not start with the cached prefix")
+
+        length = max(len(ids) for ids in rows)
+        input_ids = torch.full(
+            (len(rows), length), self._processor.tokenizer.pad_token_id,
+            dtype=inputs.input_ids.dtype, device=inputs.input_ids.device,
+        )
+        attention_mask = torch.zeros_like(input_ids)
+        for i, ids in enumerate(rows):
+            rest = len(ids) - prefix_len
+            input_ids[i, :prefix_len] = ids[:prefix_len]
+            input_ids[i, length - rest:] = ids[prefix_len:]
+            attention_mask[i, :prefix_len] = 1
+            attention_mask[i, length - rest:] = 1
+
+        backbone = self._backbone()
+        position_ids, rope_deltas = backbone.get_rope_index(
+            input_ids, inputs.image_grid_thw, None, attention_mask=attention_mask
+        )
+        cache = copy.deepcopy(prefix_cache)
+        cache.batch_repeat_interleave(len(rows))
+        end = length - 1
+
+        start_time = time.perf_counter()
+        with torch.no_grad():
+            backbone(
+                input_ids=input_ids[:, prefix_len:end],
+                attention_mask=attention_mask[:, :end],
+                position_ids=position_ids[:, :, prefix_len:end],
+                past_key_values=cache,
+                pixel_values=inputs.pixel_values,
+                image_grid_thw=inputs.image_grid_thw,
+                cache_position=torch.arange(prefix_len, end, device=input_ids.device),
+                use_cache=True,
+            )
+            prefill_time = time.perf_counter() - start_time
+            # Decoding steps offset the text positions by rope_deltas (image rows are shorter in M-RoPE)
+            backbone.rope_deltas = rope_deltas
+            generated_ids = self._model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=cache,
+                **self.GENERATE_KWARGS,
+                pad_token_id=self._processor.tokenizer.pad_token_id,
+            )
+        generation_time = time.perf_counter() - start_time
+        # Estimate: each row would have encoded the prefix itself
+        saved = prefix_seconds * len(rows)
+        logger.info(
+            f"CaptionService: generation took {generation_time:.2f}s for {len(rows)} image(s) "
+            f"(prefill {prefill_time:.2f}s, {prefix_len} prompt prefix tokens reused, ~{saved:.2f}s prefill saved)",
+            extra={
+                "event": "CAPTION_RESULT",
+                "duration_ms": int(generation_time * 1000),
+                "prefill_ms": int(prefill_time * 1000),
+                "prefix_tokens": prefix_len,
+                "prefill_saved_ms": int(saved * 1000),
+            },
+        )
+        return generated_ids, input_ids
 
     # Longest side of the pre-resized image fed to the model.
     # 1024 preserves enough detail for color/tie/badge identification while
@@ -252,57 +473,103 @@ class CaptionService:
         so that full-resolution press photos never exhaust GPU/system memory.
         caption_en and tags_en are left empty (Turkish-only output).
         """
-        result = CaptionResult(img_path=img_path)
+        return self.analyse_batch([img_path], [person_names])[0]
 
-        # Pre-resize outside the lock: returns a PIL Image in memory, no temp files
-        try:
-            pil_image = self._prepare_image(img_path, self.MAX_SIDE_PX)
-        except Exception as e:
-            result.error = f"Resim hazırlanamadı: {e}"
-            return result
+    def analyse_batch(self, img_paths: list[str], person_names_list: list[list[str] | None] = None) -> list[CaptionResult]:
+        """
+        Caption several images with one batched generate() call.
+        Blocking — must be called from a QThread worker.
+
+        Each image gets its own prompt (with its own person names); images that
+        cannot be prepared get an error result and are left out of the batch.
+        If the batched call fails (e.g. out of memory) the images are retried
+        one at a time. Each result's duration is its share of the batch time.
+
+        Args:
+            img_paths: Image files, in order.
+            person_names_list: Optional person names per image, parallel to img_paths.
+
+        Returns:
+            One CaptionResult per path, in input order.
+        """
+        if person_names_list is None:
+            person_names_list = [None] * len(img_paths)
+        results = [CaptionResult(img_path=p) for p in img_paths]
+
+        # Pre-resize outside the lock: PIL Images in memory, no temp files
+        images = {}
+        for i, img_path in enumerate(img_paths):
+            try:
+                images[i] = self._prepare_image(img_path, self.MAX_SIDE_PX)
+            except Exception as e:
+                results[i].error = f"Resim hazırlanamadı: {e}"
+        if not images:
+            return results
+        ready = list(images)
 
         with self._lock:
             try:
                 self._load_model()
             except Exception as e:
-                result.error = f"Model yüklenemedi: {e}"
-                return result
+                for i in ready:
+                    results[i].error = f"Model yüklenemedi: {e}"
+                return results
 
             if not self.is_ready():
-                result.error = "Model yüklenemedi (processor eksik)"
-                return result
+                for i in ready:
+                    results[i].error = "Model yüklenemedi (processor eksik)"
+                return results
 
+            full_start = time.perf_counter()
+            prompts = [get_prompt_parts(person_names_list[i]) for i in ready]
             try:
-                full_start = time.perf_counter()
-
-                prompt = get_combined_prompt(person_names)
-                raw = self._run_prompt(pil_image, prompt)
-                caption_tr, tags_tr = parse_combined_response(raw, person_names)
-
-                if caption_tr:
-                    result.caption_tr = self._correct_grammar_if_enabled(caption_tr)
-                    result.tags_tr = tags_tr
-                else:
-                    # Fallback: JSON parse failed but model produced text output.
-                    # Save raw text directly so the caption is not silently lost.
-                    raw_stripped = raw.strip()
-                    if len(raw_stripped) > 20:
-                        result.caption_tr = self._correct_grammar_if_enabled(raw_stripped)
-                        logger.warning(
-                            "CaptionService: JSON parse failed, saving raw text as "
-                            "caption_tr for %s",
-                            os.path.basename(img_path),
-                        )
-
-                total_duration = time.perf_counter() - full_start
-                result.duration = total_duration
-                saved = "yes" if result.caption_tr else "no"
-                logger.info(
-                    f"CaptionService: analysis done {os.path.basename(img_path)} "
-                    f"{total_duration:.2f}s | saved={saved}"
-                )
+                raws = self._run_prompts([images[i] for i in ready], prompts)
             except Exception as e:
-                logger.error(f"CaptionService.analyse error for {img_path}: {e}")
-                result.error = str(e)
-
-        return result
+                if len(ready) == 1:
+                    logger.error(f"CaptionService.analyse error for {img_paths[ready[0]]}: {e}")
+                    results[ready[0]].error = str(e)
+                    return results
+                logger.warning(f"CaptionService: batch of {len(ready)} failed, retrying one by one: {e}")
+                raws = []
+                for i, prompt in zip(ready, prompts):
+                    try:
+                        raws.append(self._run_prompt(images[i], prompt))
+                    except Exception as e1:
+                        logger.error(f"CaptionService.analyse error for {img_paths[i]}: {e1}")
+                        results[i].error = str(e1)
+                        raws.append(None)
+            share = (time.perf_counter() - full_start) / len(ready)
+
+        for i, raw in zip(ready, raws):
+            if raw is None:
+                continue
+            results[i].duration = share
+            try:
+                self._fill_result(results[i], raw, person_names_list[i])
+            except Exception as e:
+                logger.error(f"CaptionService.analyse error for {img_paths[i]}: {e}")
+                results[i].error = str(e)
+        return results
+
+    def _fill_result(self, result: CaptionResult, raw: str, person_names: list[str] | None) -> None:
+        """Parse one model output into result (grammar-corrected caption_tr / tags_tr)."""
+        caption_tr, tags_tr = parse_combined_response(raw, person_names)
+        if caption_tr:
+            result.caption_tr = self._correct_grammar_if_enabled(caption_tr)
+            result.tags_tr = tags_tr
+        else:
+            # Fallback: JSON parse failed but model produced text output.
+            # Save raw text directly so the caption is not silently lost.
+            raw_stripped = raw.strip()
+            if len(raw_stripped) > 20:
+                result.caption_tr = self._correct_grammar_if_enabled(raw_stripped)
+                logger.warning(
+                    "CaptionService: JSON parse failed, saving raw text as "
+                    "caption_tr for %s",
+                    os.path.basename(result.img_path),
+                )
+        saved = "yes" if result.caption_tr else "no"
+        logger.info(
+            f"CaptionService: analysis done {os.path.basename(result.img_path)} "
+            f"{result.duration:.2f}s | saved={saved}"
+        )
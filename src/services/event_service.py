@@ -3,6 +3,7 @@
 from src.services.base_service import BaseService
 from src.repositories.event_repository import EventRepository
 from src.domain.entities.event import Event
+from src.services.person_match_index import PersonMatchIndex
 from src.utils.folder_scanner_util import sanitize_folder_name, ScannedEventFolder
 from src.utils.document_util import DOCUMENT_EXTS, extract_docx_text, extract_doc_metadata, generate_document_thumbnail
 from src.utils.pdf_util import PDF_EXTS, extract_pdf_text, extract_pdf_metadata, generate_pdf_thumbnail
@@ -72,7 +73,9 @@ class EventService(BaseService):
     def delete(self, event_id):
         """Delete event."""
         try:
-            return self.event_repository.delete(event_id)
+            self.event_repository.delete(event_id)
+            # Faces of every media in the event are gone; reload the match index lazily
+            PersonMatchIndex().invalidate()
         except Exception as e:
             self.logger.error(f"Error deleting event {event_id}: {e}")
             raise
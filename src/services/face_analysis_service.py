@@ -5,19 +5,47 @@ Design decisions:
 - Model is loaded lazily on first call (heavy ~200 MB, downloaded once by insightface)
 - Returns a list of FaceResult dataclasses with normalised bbox and numpy embedding
 - Runs synchronously; callers should use QThread to avoid UI blocking
-- A threading.Lock serialises concurrent detect() calls so rapid event-switching
-  cannot corrupt the singleton insightface model state.
+- detect_batch()/detect_from_arrays() push several images through the detector
+  and all their faces through ArcFace in stacked forward passes; detect() and
+  detect_from_array() are single-item wrappers around them
+- JPEGs can be decoded DCT-scaled (Pillow draft) to about DECODE_MAX_SIDE for
+  detection; images with faces too small for a clean 112×112 chip at that size
+  are re-read at full resolution before blur scoring and embedding
+- Faces are not gated here: blur score, face size, detection score and pose
+  are measured for every face (face_quality_util) and stored, and the quality
+  gate is applied when faces are queried
+- Wide panoramas and very large group photos are tiled (see TILE_*): the whole
+  image plus overlapping tiles of about TILE_SIZE pixels go through the
+  detector in the same batch and the detections are merged by NMS, so small
+  faces survive without raising det_size for every image
+- The aligned 112×112 chip of every face is returned JPEG-encoded
+  (FaceResult.chip) and stored, so embed_chips() can re-embed stored faces
+  with a new recognition model without decoding or detecting anything
+- triage_from_arrays() is the coarse pass of the opt-in two-stage mode: a
+  low-resolution, low-threshold detector run that only answers "any face
+  candidate?", so faceless images skip the full decode, detection and embedding
+- ONNX Runtime sessions are built from the "face_ort_*" settings (graph
+  optimisation level, intra/inter-op threads, execution mode, memory arena);
+  "face_model_precision" = "int8" loads the dynamically quantized copy of the
+  model pack written by `python face_model.py quantize`
+- A lock serialises concurrent detect() calls so rapid event-switching
+  cannot corrupt the singleton insightface model state. It is the
+  face_detection_broker.MODEL_LOCK, which serves interactive callers (the
+  single view) before batch callers waiting for the model.
 """
 from __future__ import annotations
 import logging
 import os
-import threading
 import ssl
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import numpy as np
 
-# Limit ONNX Runtime CPU threads so face detection doesn't saturate all cores.
-# PASSIVE wait policy prevents busy-spinning (reduces CPU% even further).
+from src.services.face_detection_broker import MODEL_LOCK
+from src.utils.face_quality_util import measure_faces
+
+# Limit OpenMP threads of OpenMP-built ONNX Runtime packages so face detection
+# doesn't saturate all cores; PASSIVE wait policy prevents busy-spinning.
+# Standard builds use the session options instead (session_options()).
 os.environ.setdefault("OMP_NUM_THREADS", "2")
 os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
 
@@ -36,13 +64,65 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 logger = logging.getLogger(__name__)
 
-BLUR_THRESHOLD = 5.0  # Variance of Laplacian; lowered from 20.0 to allow close-ups with smooth skin.
-
-
-def _variance_of_laplacian(gray_img) -> float:
-    """Return the Laplacian variance of a grayscale image crop (blur metric)."""
-    import cv2
-    return cv2.Laplacian(gray_img, cv2.CV_64F).var()
+# insightface model pack (512-dim ArcFace) and detector input size
+MODEL_NAME = "buffalo_l"
+DET_SIZE = (640, 640)
+
+# int8 model pack: MODEL_NAME + INT8_SUFFIX next to the fp32 pack, holding the
+# quantized detection and recognition ONNX files
+INT8_SUFFIX = "_int8"
+
+# "face_ort_graph_optimization" setting -> onnxruntime.GraphOptimizationLevel
+_GRAPH_OPT_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+# Variance of Laplacian; lowered from 20.0 to allow close-ups with smooth skin.
+# Default of the query-time "face_min_blur_score" gate (face_quality_util) —
+# detection itself keeps blurry faces and stores their blur_score.
+BLUR_THRESHOLD = 5.0
+
+# Batched inference sizes. The detector letterboxes every image to det_size, so
+# DET_BATCH_SIZE full 640×640 inputs share one ONNX forward pass; aligned
+# 112×112 face chips are cheap, so the recognizer takes much larger batches.
+DET_BATCH_SIZE = 8
+REC_BATCH_SIZE = 64
+
+# Reduced-resolution decode: the detector only sees det_size (640) anyway, so
+# JPEGs are decoded at 1/2, 1/4 or 1/8 scale with the long side >= DECODE_MAX_SIDE
+# ("face_decode_max_side" setting, 0 = always full resolution). A face whose
+# short side is below SMALL_FACE_PX in the reduced image triggers a full read.
+DECODE_MAX_SIDE = 1280
+SMALL_FACE_PX = 112
+
+# Triage (coarse pass of the two-stage mode): images decoded to about
+# TRIAGE_MAX_SIDE go through the detector at TRIAGE_DET_SIZE with a lower score
+# threshold; only images with a candidate get the full detection path.
+TRIAGE_MAX_SIDE = 640
+TRIAGE_DET_SIZE = (320, 320)
+TRIAGE_THRESHOLD = 0.3
+
+# Adaptive tiling. An image is tiled when its aspect ratio reaches
+# TILE_MAX_ASPECT ("face_tile_max_aspect") or its long side reaches
+# TILE_MIN_SIDE pixels ("face_tile_min_side"); 0 disables either trigger.
+# The size trigger is off by default: ordinary 24-45 MP camera files would
+# otherwise be decoded in full and split into dozens of tiles.
+# Tiles are squares of TILE_SIZE pixels ("face_tile_size") overlapping by
+# TILE_OVERLAP, each letterboxed to det_size like a whole image, so the cost
+# is one detector input per tile plus the whole-image pass. Tile detections
+# within TILE_EDGE_PX of an inner tile border are cut faces and are dropped.
+TILE_MAX_ASPECT = 2.0
+TILE_MIN_SIDE = 0
+TILE_SIZE = 1280
+TILE_OVERLAP = 0.25
+TILE_EDGE_PX = 2
+
+# Stored face chips ("face_store_chips" setting): JPEG quality of the encoded
+# aligned chip, ~5 KB per face
+CHIP_JPEG_QUALITY = 95
 
 
 @dataclass
@@ -59,6 +139,17 @@ class FaceResult:
     score: float
     # For videos: timestamp in milliseconds
     timestamp_ms: float | None = None
+    # For video face tracks: first / last key frame the face was seen in
+    track_start_ms: float | None = None
+    track_end_ms: float | None = None
+    # Quality attributes (face_quality_util.measure_faces)
+    blur_score: float | None = None
+    face_px: float | None = None
+    yaw: float | None = None
+    pitch: float | None = None
+    roll: float | None = None
+    # JPEG-encoded aligned 112×112 chip the embedding was computed from
+    chip: bytes | None = field(default=None, repr=False)
 
 
 class FaceAnalysisService:
@@ -69,13 +160,77 @@ class FaceAnalysisService:
 
     _instance = None
     _app = None
-    _lock = threading.Lock()
+    _lock = MODEL_LOCK
+    _det_batching = True  # cleared if the exported detector rejects batch > 1
+    _intra_op_threads: int | None = None  # overrides "face_ort_intra_op_threads"
+    _precision: str | None = None  # overrides "face_model_precision"
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
 
+    @classmethod
+    def configure_session(cls, intra_op_threads: int | None = None, precision: str | None = None) -> None:
+        """Override intra-op threads / model precision for the next model load."""
+        cls._intra_op_threads = intra_op_threads
+        cls._precision = precision
+
+    @classmethod
+    def session_options(cls):
+        """onnxruntime.SessionOptions from the "face_ort_*" settings."""
+        import onnxruntime as ort
+        from src.utils import config_util
+        get = config_util.get_setting
+
+        options = ort.SessionOptions()
+        level = str(get("face_ort_graph_optimization", "all") or "all").lower()
+        if level not in _GRAPH_OPT_LEVELS:
+            logger.warning(f"Unknown face_ort_graph_optimization '{level}', using 'all'")
+            level = "all"
+        options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, _GRAPH_OPT_LEVELS[level])
+
+        intra = cls._intra_op_threads or int(get("face_ort_intra_op_threads", 0) or 0)
+        # Worker processes pin their thread count and keep a single inter-op thread
+        inter = int(get("face_ort_inter_op_threads", 0) or 0) or (1 if cls._intra_op_threads else 0)
+        if intra > 0:
+            options.intra_op_num_threads = intra
+        if inter > 0:
+            options.inter_op_num_threads = inter
+
+        parallel = str(get("face_ort_execution_mode", "sequential") or "").lower() == "parallel"
+        options.execution_mode = ort.ExecutionMode.ORT_PARALLEL if parallel else ort.ExecutionMode.ORT_SEQUENTIAL
+        options.enable_cpu_mem_arena = bool(get("face_ort_mem_arena", True))
+        return options
+
+    @classmethod
+    def model_precision(cls) -> str:
+        """Requested model precision: "fp32" or "int8"."""
+        from src.utils import config_util
+        precision = cls._precision or config_util.get_setting("face_model_precision", "fp32") or "fp32"
+        return str(precision).lower()
+
+    @classmethod
+    def model_dir(cls, precision: str | None = None) -> str:
+        """
+        Directory of the model pack to load. The int8 pack is used only if it
+        has been created; otherwise this falls back to the fp32 pack.
+        """
+        root = os.path.join(os.path.expanduser(os.environ.get("INSIGHTFACE_HOME", "~/.insightface")), "models")
+        fp32_dir = os.path.join(root, MODEL_NAME)
+        if (precision or cls.model_precision()) != "int8":
+            return fp32_dir
+        int8_dir = fp32_dir + INT8_SUFFIX
+        if os.path.isdir(int8_dir) and any(n.endswith(".onnx") for n in os.listdir(int8_dir)):
+            return int8_dir
+        logger.warning(f"int8 face model not found at {int8_dir} (run: python face_model.py quantize); using fp32")
+        return fp32_dir
+
+    def unload(self) -> None:
+        """Drop the loaded model so the next call reloads it with the current options."""
+        with self._lock:
+            self._app = None
+
     def _load_best_providers(self):
         """Detect and return a list of best execution providers for the current hardware."""
         import onnxruntime as ort
@@ -103,16 +258,114 @@ class FaceAnalysisService:
         
         try:
             from insightface.app import FaceAnalysis
+            model_dir = self.model_dir()
+            # The fp32 pack goes by name so insightface downloads it on first use
+            name = MODEL_NAME if os.path.basename(model_dir) == MODEL_NAME else model_dir
+            root = os.path.dirname(os.path.dirname(model_dir))
             # Buffalo_l is the 512-dim ArcFace model
-            self._app = FaceAnalysis(name="buffalo_l", providers=providers)
+            # Only detection + recognition are used; skipping the landmark and
+            # gender/age heads saves memory and per-face inference time.
+            self._app = FaceAnalysis(
+                name=name,
+                root=root,
+                providers=providers,
+                allowed_modules=["detection", "recognition"],
+                sess_options=self.session_options(),
+            )
             # det_size=(640, 640) is a good balance of speed vs accuracy for press photos
-            self._app.prepare(ctx_id=0, det_size=(640, 640))
-            logger.info(f"✅ InsightFace model loaded (buffalo_l) with {providers[0]}", extra={"event": "MODEL_LOAD"})
+            self._app.prepare(ctx_id=0, det_size=DET_SIZE)
+            logger.info(
+                f"✅ InsightFace model loaded ({os.path.basename(model_dir)}) with {providers[0]}",
+                extra={"event": "MODEL_LOAD"},
+            )
         except Exception as e:
             logger.error(f"❌ InsightFace model load failed: {e}")
             self._app = None
             raise
 
+    @staticmethod
+    def decode_max_side() -> int:
+        """Configured long side for reduced decoding (0 = full resolution)."""
+        from src.utils import config_util
+        return int(config_util.get_setting("face_decode_max_side", DECODE_MAX_SIDE) or 0)
+
+    @staticmethod
+    def tiling_settings() -> tuple[float, int, int]:
+        """Configured (max aspect, min long side, tile size) for adaptive tiling."""
+        from src.utils import config_util
+        return (
+            float(config_util.get_setting("face_tile_max_aspect", TILE_MAX_ASPECT) or 0),
+            int(config_util.get_setting("face_tile_min_side", TILE_MIN_SIDE) or 0),
+            int(config_util.get_setting("face_tile_size", TILE_SIZE) or TILE_SIZE),
+        )
+
+    @staticmethod
+    def _tile_side(w: int, h: int, tiling: tuple[float, int, int]) -> int:
+        """
+        Long side an image of w×h must be analysed at to be tiled, or 0 if it
+        is not tiled. Aspect-triggered images need a short side of at least one
+        tile; size-triggered ones at least the trigger size.
+        """
+        max_aspect, min_side, tile = tiling
+        long_side, short_side = max(w, h), max(1, min(w, h))
+        need = 0
+        if max_aspect > 0 and long_side / short_side >= max_aspect:
+            need = int(np.ceil(tile * long_side / short_side))
+        if min_side > 0 and long_side >= min_side:
+            need = max(need, min_side)
+        return need if long_side > tile else 0
+
+    @staticmethod
+    def _tile_boxes(w: int, h: int, tile: int) -> list[tuple[int, int, int, int]]:
+        """Overlapping (x0, y0, x1, y1) tiles covering w×h, the last flush with the edge."""
+        step = max(1, int(tile * (1 - TILE_OVERLAP)))
+
+        def starts(n: int) -> list[int]:
+            if n <= tile:
+                return [0]
+            count = int(np.ceil((n - tile) / step)) + 1
+            return [round(i * (n - tile) / (count - 1)) for i in range(count)]
+
+        return [(x, y, min(w, x + tile), min(h, y + tile)) for y in starts(h) for x in starts(w)]
+
+    @staticmethod
+    def decode_image(img_path: str, max_side: int = 0, tile: bool = False) -> np.ndarray | None:
+        """
+        Decode an image file into a BGR array, honouring EXIF orientation.
+
+        Args:
+            img_path: Image file path.
+            max_side: If > 0, JPEGs are decoded with libjpeg DCT scaling to the
+                      smallest 1/2, 1/4 or 1/8 scale whose long side is still
+                      >= max_side. Other formats are always decoded in full.
+            tile: The decode feeds full detection: images that will be tiled are
+                  decoded large enough for their tiles (see _tile_side). Leave
+                  False for small decodes such as the triage pass.
+        """
+        # Use Pillow for robust EXIF orientation handling
+        try:
+            import cv2
+            from PIL import Image, ImageOps
+            with Image.open(img_path) as pil_img:
+                if max_side > 0 and pil_img.format == "JPEG":
+                    w, h = pil_img.size
+                    if tile:
+                        max_side = max(max_side, FaceAnalysisService._tile_side(
+                            w, h, FaceAnalysisService.tiling_settings()
+                        ))
+                    scale = max_side / max(w, h)
+                    if scale < 1.0:
+                        # draft() keeps both sides >= the request, so ask proportionally
+                        pil_img.draft("RGB", (int(np.ceil(w * scale)), int(np.ceil(h * scale))))
+                pil_img = ImageOps.exif_transpose(pil_img)
+                if pil_img.mode != "RGB":
+                    pil_img = pil_img.convert("RGB")
+                # RGB -> BGR for InsightFace/OpenCV in one pass into a contiguous array
+                return cv2.cvtColor(np.asarray(pil_img), cv2.COLOR_RGB2BGR)
+        except Exception as e:
+            logger.error(f"Could not read/decode image via Pillow: {img_path}: {e}")
+            return None
+
     def detect(self, img_path: str) -> list[FaceResult]:
         """
         Detect all faces in an image and return normalised results.
@@ -123,105 +376,397 @@ class FaceAnalysisService:
         Returns:
             List of FaceResult sorted by face area (largest first).
         """
-        import cv2
+        return self.detect_batch([img_path])[0]
 
-        with self._lock:
-            self._load_model()
-            if self._app is None:
-                return []
+    def detect_batch(self, img_paths: list[str]) -> list[list[FaceResult]]:
+        """
+        Detect faces in several image files with batched model calls.
 
-            # Use Pillow for robust EXIF orientation handling
-            try:
-                from PIL import Image, ImageOps
-                with Image.open(img_path) as pil_img:
-                    pil_img = ImageOps.exif_transpose(pil_img)
-                    if pil_img.mode != "RGB":
-                        pil_img = pil_img.convert("RGB")
-                    # Convert RGB to BGR for InsightFace/OpenCV
-                    img = np.array(pil_img)[:, :, ::-1].copy()
-            except Exception as e:
-                logger.error(f"Could not read/decode image via Pillow: {img_path}: {e}")
-                img = None
+        Decoding happens outside the model lock; the detector and recognizer
+        then run over stacked inputs (see detect_from_arrays).
 
+        Returns:
+            One FaceResult list per input path, in input order. Unreadable
+            images yield an empty list.
+        """
+        max_side = self.decode_max_side()
+        imgs = []
+        for img_path in img_paths:
+            img = self.decode_image(img_path, max_side, tile=True)
             if img is None:
                 logger.warning(f"Could not read image: {img_path}")
-                return []
+            imgs.append(img)
+
+        results: list[list[FaceResult]] = [[] for _ in img_paths]
+        readable = [i for i, img in enumerate(imgs) if img is not None]
+        if readable:
+            batch_results = self.detect_from_arrays(
+                [imgs[i] for i in readable], sources=[img_paths[i] for i in readable]
+            )
+            for i, faces in zip(readable, batch_results):
+                results[i] = faces
+        return results
 
-            h, w = img.shape[:2]
-            faces = self._app.get(img)
+    def detect_from_array(self, img: np.ndarray) -> list[FaceResult]:
+        """Detect faces in a BGR numpy array (e.g., a decoded video frame)."""
+        return self.detect_from_arrays([img])[0]
 
-        results = []
-        for face in faces:
-            import cv2
-            bbox = face.bbox.astype(float)
-            x1, y1, x2, y2 = bbox
+    def detect_from_arrays(
+        self, imgs: list[np.ndarray], sources: list[str | None] | None = None
+    ) -> list[list[FaceResult]]:
+        """
+        Detect faces in several BGR arrays.
 
-            # Guard: clamp to image bounds and skip empty/degenerate crops
-            ix1 = max(0, int(x1))
-            iy1 = max(0, int(y1))
-            ix2 = min(w, int(x2))
-            iy2 = min(h, int(y2))
-            if ix2 <= ix1 or iy2 <= iy1:
-                logger.debug("Skipping face: empty crop after clamping bbox to image bounds.")
-                continue
+        The buffalo_l detector runs over stacked letterboxed inputs (DET_BATCH_SIZE
+        images per forward pass) and ArcFace embeds every surviving face crop of
+        the whole batch in REC_BATCH_SIZE chunks. Arrays crossing the tiling
+        limits add their tiles to the same detector batch.
 
-            # Blur gatekeeper: skip faces with no discernible structure (very low threshold)
-            crop = img[iy1:iy2, ix1:ix2]
-            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-            blur_score = _variance_of_laplacian(gray)
-            if blur_score < BLUR_THRESHOLD:
-                logger.info(f"Skipping face: too blurry. Score: {blur_score:.2f} (threshold={BLUR_THRESHOLD})")
-                continue
+        Args:
+            imgs: BGR arrays, possibly decoded at reduced resolution.
+            sources: Optional file path per array. If an array was decoded
+                     reduced and holds a face smaller than SMALL_FACE_PX, the
+                     file is re-read in full and blur scoring / embedding use
+                     crops from that read.
+
+        Returns:
+            One FaceResult list per input array, each sorted by face area
+            (largest first). Bboxes are normalised, so they do not depend on
+            the decode resolution.
+        """
+        if not imgs:
+            return []
+
+        with self._lock:
+            self._load_model()
+            if self._app is None:
+                return [[] for _ in imgs]
+            detections = self._run_detector_tiled(imgs)
+
+        # Full-resolution re-reads happen outside the model lock
+        imgs = list(imgs)
+        for i, source in enumerate(sources or []):
+            if source and self._has_small_face(detections[i][0]):
+                full = self._read_full(source, imgs[i])
+                if full is not None:
+                    detections[i] = self._rescale_detections(detections[i], imgs[i], full)
+                    imgs[i] = full
+
+        kept = [self._valid_faces(img, bboxes) for img, (bboxes, _) in zip(imgs, detections)]
+        qualities = [
+            measure_faces(img, bboxes[keep], kpss[keep] if kpss is not None else None)
+            for img, (bboxes, kpss), keep in zip(imgs, detections, kept)
+        ]
+
+        with self._lock:
+            chips = []
+            for img, (_, kpss), keep in zip(imgs, detections, kept):
+                for j in keep:
+                    chips.append(self._align_face(img, kpss[j]))
+            embeddings = self._run_recognizer(chips)
 
-            results.append(FaceResult(
-                x1=max(0.0, x1 / w),
-                y1=max(0.0, y1 / h),
-                x2=min(1.0, x2 / w),
-                y2=min(1.0, y2 / h),
-                embedding=face.embedding,
-                score=float(face.det_score),
-            ))
+        encoded = [self.encode_chip(chip) for chip in chips] if self.store_chips() else [None] * len(chips)
 
-        results.sort(key=lambda f: (f.x2 - f.x1) * (f.y2 - f.y1), reverse=True)
+        results = []
+        offset = 0
+        for img, (bboxes, _), keep, quality in zip(imgs, detections, kept, qualities):
+            h, w = img.shape[:2]
+            faces = []
+            for k, j in enumerate(keep):
+                x1, y1, x2, y2, score = (float(v) for v in bboxes[j, :5])
+                attrs = {name: float(values[k]) for name, values in quality.items() if not np.isnan(values[k])}
+                faces.append(FaceResult(
+                    x1=max(0.0, x1 / w),
+                    y1=max(0.0, y1 / h),
+                    x2=min(1.0, x2 / w),
+                    y2=min(1.0, y2 / h),
+                    embedding=embeddings[offset],
+                    score=score,
+                    chip=encoded[offset],
+                    **attrs,
+                ))
+                offset += 1
+            faces.sort(key=lambda f: (f.x2 - f.x1) * (f.y2 - f.y1), reverse=True)
+            results.append(faces)
         return results
 
-    def detect_from_array(self, img: np.ndarray) -> list[FaceResult]:
-        """Detect faces in a BGR numpy array (e.g., a decoded video frame)."""
+    def embed_chips(self, chips: list[np.ndarray]) -> list[np.ndarray]:
+        """
+        Embed already aligned face chips (decode_chip() of stored chips) with
+        the current recognition model, REC_BATCH_SIZE chips per forward pass.
+        """
+        if not chips:
+            return []
+        with self._lock:
+            self._load_model()
+            if self._app is None:
+                raise RuntimeError("InsightFace model is not available")
+            return self._run_recognizer(chips)
+
+    @staticmethod
+    def store_chips() -> bool:
+        from src.utils import config_util
+        return bool(config_util.get_setting("face_store_chips", True))
+
+    @staticmethod
+    def encode_chip(chip: np.ndarray) -> bytes | None:
+        import cv2
+        ok, buf = cv2.imencode(".jpg", chip, [cv2.IMWRITE_JPEG_QUALITY, CHIP_JPEG_QUALITY])
+        return buf.tobytes() if ok else None
+
+    @staticmethod
+    def decode_chip(data: bytes) -> np.ndarray | None:
         import cv2
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
 
+    def triage_from_arrays(self, imgs: list[np.ndarray]) -> list[bool]:
+        """
+        Coarse pass of the two-stage mode: True for every array in which the
+        detector finds a face candidate at TRIAGE_DET_SIZE / TRIAGE_THRESHOLD.
+
+        Arrays are expected small (about TRIAGE_MAX_SIDE); no landmarks,
+        quality or embeddings are computed.
+        """
+        if not imgs:
+            return []
         with self._lock:
             self._load_model()
             if self._app is None:
-                return []
-            h, w = img.shape[:2]
-            faces = self._app.get(img)
+                return [False for _ in imgs]
+            det_model = self._app.det_model
+            det_thresh = det_model.det_thresh
+            det_model.det_thresh = min(det_thresh, TRIAGE_THRESHOLD)
+            try:
+                detections = self._run_detector(list(imgs), input_size=TRIAGE_DET_SIZE)
+            finally:
+                det_model.det_thresh = det_thresh
+        return [bboxes is not None and len(bboxes) > 0 for bboxes, _ in detections]
+
+    # ------------------------------------------------------------------
+    # Reduced-decode helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _has_small_face(bboxes: np.ndarray) -> bool:
+        if bboxes is None or len(bboxes) == 0:
+            return False
+        sides = np.minimum(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1])
+        return bool((sides < SMALL_FACE_PX).any())
+
+    def _read_full(self, source: str, img: np.ndarray) -> np.ndarray | None:
+        """Full-resolution decode of source, or None if img already is full resolution."""
+        try:
+            from PIL import Image
+            with Image.open(source) as pil_img:
+                full_side = max(pil_img.size)
+        except Exception:
+            return None
+        if full_side <= max(img.shape[:2]):
+            return None
+        return self.decode_image(source)
+
+    @staticmethod
+    def _rescale_detections(detection, small: np.ndarray, full: np.ndarray):
+        """Map (bboxes, kpss) from the reduced array onto the full-resolution one."""
+        bboxes, kpss = detection
+        sx = full.shape[1] / small.shape[1]
+        sy = full.shape[0] / small.shape[0]
+        bboxes = bboxes.copy()
+        bboxes[:, [0, 2]] *= sx
+        bboxes[:, [1, 3]] *= sy
+        if kpss is not None:
+            kpss = kpss * np.array([sx, sy], dtype=kpss.dtype)
+        return bboxes, kpss
+
+    # ------------------------------------------------------------------
+    # Batched model internals (caller must hold _lock)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _valid_faces(img: np.ndarray, bboxes: np.ndarray) -> list[int]:
+        """Return indices of detections with a non-empty crop inside the image."""
+        h, w = img.shape[:2]
+        keep = []
+        for j in range(bboxes.shape[0]):
+            x1, y1, x2, y2 = bboxes[j, :4]
 
-        results = []
-        for face in faces:
-            bbox = face.bbox.astype(float)
-            x1, y1, x2, y2 = bbox
+            # Guard: clamp to image bounds and skip empty/degenerate crops
             ix1 = max(0, int(x1))
             iy1 = max(0, int(y1))
             ix2 = min(w, int(x2))
             iy2 = min(h, int(y2))
             if ix2 <= ix1 or iy2 <= iy1:
+                logger.debug("Skipping face: empty crop after clamping bbox to image bounds.")
                 continue
-            crop = img[iy1:iy2, ix1:ix2]
-            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-            blur_score = _variance_of_laplacian(gray)
-            if blur_score < BLUR_THRESHOLD:
-                logger.info(f"Skipping video frame face: too blurry. Score: {blur_score:.2f}")
+            keep.append(j)
+        return keep
+
+    def _align_face(self, img: np.ndarray, kps: np.ndarray) -> np.ndarray:
+        """Warp a face to the recognizer's canonical 112×112 ArcFace pose."""
+        from insightface.utils import face_align
+        rec_model = self._app.models["recognition"]
+        return face_align.norm_crop(img, landmark=kps, image_size=rec_model.input_size[0])
+
+    def _run_recognizer(self, chips: list[np.ndarray]) -> list[np.ndarray]:
+        """Embed aligned face chips in REC_BATCH_SIZE chunks."""
+        if not chips:
+            return []
+        rec_model = self._app.models["recognition"]
+        embeddings = []
+        for start in range(0, len(chips), REC_BATCH_SIZE):
+            feats = rec_model.get_feat(chips[start:start + REC_BATCH_SIZE])
+            embeddings.extend(feats[k].flatten() for k in range(feats.shape[0]))
+        return embeddings
+
+    def _run_detector_tiled(self, imgs: list[np.ndarray]) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        _run_detector() over the whole arrays plus the tiles of every array
+        that crosses the tiling limits, all in one batch; tile detections are
+        shifted into image coordinates and merged with the whole-image ones by NMS.
+        """
+        tiling = self.tiling_settings()
+        jobs, owners = list(imgs), []
+        for i, img in enumerate(imgs):
+            h, w = img.shape[:2]
+            if self._tile_side(w, h, tiling):
+                for box in self._tile_boxes(w, h, tiling[2]):
+                    x0, y0, x1, y1 = box
+                    jobs.append(np.ascontiguousarray(img[y0:y1, x0:x1]))
+                    owners.append((i, box))
+        detections = self._run_detector(jobs)
+        if not owners:
+            return detections
+
+        parts = {i: [detections[i]] for i, _ in owners}
+        for (i, (x0, y0, x1, y1)), (bboxes, kpss) in zip(owners, detections[len(imgs):]):
+            if bboxes is None or len(bboxes) == 0:
                 continue
-            results.append(FaceResult(
-                x1=max(0.0, x1 / w),
-                y1=max(0.0, y1 / h),
-                x2=min(1.0, x2 / w),
-                y2=min(1.0, y2 / h),
-                embedding=face.embedding,
-                score=float(face.det_score),
-            ))
-        results.sort(key=lambda f: (f.x2 - f.x1) * (f.y2 - f.y1), reverse=True)
-        return results
+            h, w = imgs[i].shape[:2]
+            cut = (
+                ((bboxes[:, 0] <= TILE_EDGE_PX) & (x0 > 0))
+                | ((bboxes[:, 1] <= TILE_EDGE_PX) & (y0 > 0))
+                | ((bboxes[:, 2] >= x1 - x0 - TILE_EDGE_PX) & (x1 < w))
+                | ((bboxes[:, 3] >= y1 - y0 - TILE_EDGE_PX) & (y1 < h))
+            )
+            bboxes = bboxes[~cut].copy()
+            bboxes[:, [0, 2]] += x0
+            bboxes[:, [1, 3]] += y0
+            if kpss is not None:
+                kpss = kpss[~cut] + np.array([x0, y0], dtype=kpss.dtype)
+            parts[i].append((bboxes, kpss))
+
+        det_model = self._app.det_model
+        merged = detections[:len(imgs)]
+        for i, dets in parts.items():
+            pre_det = np.vstack([b for b, _ in dets]).astype(np.float32, copy=False)
+            order = np.argsort(-pre_det[:, 4], kind="stable")
+            pre_det = pre_det[order]
+            keep = det_model.nms(pre_det)
+            kpss = None
+            if all(k is not None for _, k in dets):
+                kpss = np.vstack([k for _, k in dets])[order][keep]
+            merged[i] = (pre_det[keep], kpss)
+        logger.debug(f"Tiled face detection: {len(owners)} tiles for {len(parts)} images")
+        return merged
+
+    def _run_detector(
+        self, imgs: list[np.ndarray], input_size: tuple[int, int] | None = None
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Run the detector and return (bboxes[N, 5], kpss[N, 5, 2]) per image.
+
+        Images are letterboxed to det_size (or input_size) exactly like
+        SCRFD.detect() does, stacked into one blob and pushed through the ONNX
+        session together. Falls back to per-image SCRFD.detect() if the
+        exported model rejects a batch dimension > 1.
+        """
+        det_model = self._app.det_model
+        if not self._det_batching or len(imgs) == 1:
+            return [det_model.detect(img, input_size=input_size, max_num=0, metric="default") for img in imgs]
+
+        detections = []
+        for start in range(0, len(imgs), DET_BATCH_SIZE):
+            chunk = imgs[start:start + DET_BATCH_SIZE]
+            try:
+                detections.extend(self._run_detector_batch(chunk, input_size))
+            except Exception as e:
+                logger.warning(f"Batched face detection unsupported by model, falling back to per-image: {e}")
+                self._det_batching = False
+                detections.extend(
+                    det_model.detect(img, input_size=input_size, max_num=0, metric="default") for img in chunk
+                )
+        return detections
+
+    def _run_detector_batch(
+        self, imgs: list[np.ndarray], input_size: tuple[int, int] | None = None
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """One stacked SCRFD forward pass followed by per-image decoding and NMS."""
+        import cv2
+        from insightface.model_zoo.scrfd import distance2bbox, distance2kps
+
+        det_model = self._app.det_model
+        in_w, in_h = input_size or det_model.input_size
+        model_ratio = float(in_h) / in_w
+
+        det_imgs, det_scales = [], []
+        for img in imgs:
+            im_ratio = float(img.shape[0]) / img.shape[1]
+            if im_ratio > model_ratio:
+                new_h = in_h
+                new_w = int(new_h / im_ratio)
+            else:
+                new_w = in_w
+                new_h = int(new_w * im_ratio)
+            det_img = np.zeros((in_h, in_w, 3), dtype=np.uint8)
+            det_img[:new_h, :new_w, :] = cv2.resize(img, (new_w, new_h))
+            det_imgs.append(det_img)
+            det_scales.append(float(new_h) / img.shape[0])
+
+        mean = det_model.input_mean
+        blob = cv2.dnn.blobFromImages(
+            det_imgs, 1.0 / det_model.input_std, (in_w, in_h), (mean, mean, mean), swapRB=True
+        )
+        net_outs = det_model.session.run(det_model.output_names, {det_model.input_name: blob})
+
+        n = len(imgs)
+        fmc = det_model.fmc
+        threshold = det_model.det_thresh
+        per_image = [([], [], []) for _ in range(n)]
+        for idx, stride in enumerate(det_model._feat_stride_fpn):
+            height, width = in_h // stride, in_w // stride
+            anchor_centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+            anchor_centers = (anchor_centers * stride).reshape((-1, 2))
+            if det_model._num_anchors > 1:
+                anchor_centers = np.stack([anchor_centers] * det_model._num_anchors, axis=1).reshape((-1, 2))
+            k = anchor_centers.shape[0]
+
+            # Batched exports keep a leading batch axis; flat exports concatenate
+            # the images' anchors batch-major, so both reshape to (n, k, c).
+            scores = net_outs[idx].reshape(n, k, -1)
+            bbox_preds = net_outs[idx + fmc].reshape(n, k, -1) * stride
+            kps_preds = net_outs[idx + fmc * 2].reshape(n, k, -1) * stride if det_model.use_kps else None
+
+            for b in range(n):
+                pos_inds = np.where(scores[b] >= threshold)[0]
+                bboxes = distance2bbox(anchor_centers, bbox_preds[b])
+                per_image[b][0].append(scores[b][pos_inds])
+                per_image[b][1].append(bboxes[pos_inds])
+                if kps_preds is not None:
+                    kpss = distance2kps(anchor_centers, kps_preds[b]).reshape((k, -1, 2))
+                    per_image[b][2].append(kpss[pos_inds])
+
+        detections = []
+        for (scores_list, bboxes_list, kpss_list), det_scale in zip(per_image, det_scales):
+            scores = np.vstack(scores_list)
+            order = np.argsort(-scores.ravel(), kind="stable")
+            bboxes = np.vstack(bboxes_list) / det_scale
+            pre_det = np.hstack((bboxes, scores)).astype(np.float32, copy=False)[order, :]
+            keep = det_model.nms(pre_det)
+            det = pre_det[keep, :]
+            kpss = None
+            if kpss_list:
+                kpss = (np.vstack(kpss_list) / det_scale)[order, :, :][keep, :, :]
+            detections.append((det, kpss))
+        return detections
 
     def is_ready(self) -> bool:
         return self._app is not None
@@ -0,0 +1,566 @@
+"""
+FaceBatchPipeline — staged decode → detect → persist pipeline for batch face detection.
+
+Stages, connected by bounded queues so memory stays flat on 40k-photo events:
+- decode:  thread pool ahead of the model; validates the file, ensures its media
+           row, decodes the photo (Pillow, DCT-scaled to the face_decode_max_side
+           setting, + EXIF transpose) and reads IPTC metadata while the file is
+           hot in the page cache; videos get a lazy key-frame reader that the
+           detect stage drains a chunk at a time (key frames only, scaled to the
+           same setting during colour conversion)
+- detect:  caller's thread; groups decoded photos into DET_BATCH_SIZE batches for
+           FaceAnalysisService.detect_from_arrays(), or — with a FaceProcessPool —
+           keeps up to one batch per worker process in flight. Photos go through the
+           FaceDetectionBroker, so a file the single view is detecting (or has
+           just detected) is taken from that run instead; a video's key-frame
+           detections are linked into face tracks (face_tracker) so each track is
+           matched and stored once. In triage mode (two-stage, per batch) photos
+           are first decoded small and checked by a coarse detector pass; only
+           those with a face candidate are re-decoded and fully detected
+- persist: writer thread behind the model; auto-matches persons, then saves faces
+           (binary COPY, already assigned) and media links for up to
+           WRITE_BATCH_SIZE media per transaction, and marks media as processed
+
+With the "face_detection_cache" setting on, the decode stage first looks the
+file's content hash up in face_detection_cache (face_result_cache); a hit skips
+decoding and detection, and the writer stores every fresh result there.
+
+Items keep their input order through every stage, so progress callbacks are
+monotonic. Per-stage timings are returned by run() for the FACE_BATCH_* logs.
+"""
+from __future__ import annotations
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterator
+from uuid import UUID
+
+import numpy as np
+
+from src.services.face_analysis_service import DET_BATCH_SIZE, TRIAGE_MAX_SIDE, FaceAnalysisService
+from src.services.face_detection_broker import FaceDetectionBroker
+from src.services.face_tracker import track_faces
+from src.utils.face_quality_util import QualityGate
+
+logger = logging.getLogger(__name__)
+
+DECODE_WORKERS = min(4, os.cpu_count() or 2)
+WRITE_BATCH_SIZE = 32   # media items per persist transaction
+QUEUE_SIZE = 2 * DET_BATCH_SIZE  # decoded items buffered between stages
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".gif", ".webp"}
+
+_DONE = object()
+
+
+@dataclass
+class _Item:
+    """One file travelling through the pipeline."""
+    index: int
+    file_path: str
+    media_id: UUID | None = None
+    is_video: bool = False
+    skipped: bool = False            # already processed and not forced
+    error: Exception | None = None
+    image: np.ndarray | None = None  # decoded BGR photo, released after detection
+    frames: Iterator | None = None   # lazy (BGR frame, timestamp_ms) key frames, consumed by detection
+    meta: dict | None = None
+    results: list = field(default_factory=list)
+    cache_key: tuple[str, str] | None = None  # (content hash, detection signature)
+    cached: bool = False             # results came from face_detection_cache
+    detected: bool = False           # results came from a successful detection run
+
+
+class FaceBatchPipeline:
+    """Runs face detection for a list of files with overlapping decode, inference and DB stages."""
+
+    def __init__(
+        self,
+        face_service,
+        media_service,
+        person_service,
+        event_id,
+        force: bool = False,
+        decode_workers: int = DECODE_WORKERS,
+        batch_size: int = DET_BATCH_SIZE,
+        write_batch_size: int = WRITE_BATCH_SIZE,
+        queue_size: int = QUEUE_SIZE,
+        decode_max_side: int | None = None,
+        process_pool=None,
+        use_cache: bool | None = None,
+        triage: bool = False,
+    ):
+        self._face_svc = face_service
+        self._media_svc = media_service
+        self._person_svc = person_service
+        self._event_id = event_id
+        self._force = force
+        self._pool = process_pool
+        if process_pool is not None:
+            # Decoding has to keep up with many detector processes
+            decode_workers = max(decode_workers, min(os.cpu_count() or 2, process_pool.workers))
+        self._decode_workers = max(1, decode_workers)
+        self._batch_size = max(1, batch_size)
+        self._write_batch_size = max(1, write_batch_size)
+        self._queue_size = max(1, queue_size)
+        self._decode_max_side = (
+            FaceAnalysisService.decode_max_side() if decode_max_side is None else decode_max_side
+        )
+        if use_cache is None:
+            from src.utils import config_util
+            use_cache = bool(config_util.get_setting("face_detection_cache", True))
+        self._use_cache = use_cache
+        self._triage = triage
+        self._broker = FaceDetectionBroker()  # singleton
+        self._decoder: ThreadPoolExecutor | None = None
+        self._stop = threading.Event()  # set when the detect stage ends early; the feeder stops submitting
+        self._timings_lock = threading.Lock()
+        self._timings: dict[str, float] = {}
+        self._triage_counts: dict[str, int] = {}
+        # (items, photos, future) in input order; future is None when nothing is pending
+        self._in_flight: deque = deque()
+
+    def run(self, file_paths: list[str], on_progress=None, on_processed=None) -> dict[str, int]:
+        """
+        Process every file and block until the writer has committed the last batch.
+
+        Args:
+            file_paths: Files to process, in display order.
+            on_progress: Called as on_progress(current, total) for every file.
+            on_processed: Called with file_path for every file that was not skipped.
+
+        Returns:
+            Cumulative milliseconds per stage: decode (summed over pool threads),
+            detect, persist, and detect_wait (detector idle, waiting for decode).
+            In triage mode also triage (coarse passes), triage_skipped (photos
+            that skipped the full path) and triage_saved (estimated time saved:
+            skipped photos × average full-path cost of the others, minus the
+            triage time).
+        """
+        total = len(file_paths)
+        self._timings = {"decode": 0.0, "detect": 0.0, "persist": 0.0, "detect_wait": 0.0}
+        if self._triage:
+            self._timings.update({"triage": 0.0, "triage_full": 0.0})
+            self._triage_counts = {"positive": 0, "skipped": 0}
+        decoded_q: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        write_q: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        self._stop.clear()
+
+        with ThreadPoolExecutor(max_workers=self._decode_workers, thread_name_prefix="face-decode") as pool:
+            self._decoder = pool
+            feeder = threading.Thread(
+                target=self._feed, args=(pool, file_paths, decoded_q), name="face-feed", daemon=True
+            )
+            writer = threading.Thread(
+                target=self._write_loop, args=(write_q, total, on_progress, on_processed),
+                name="face-write", daemon=True,
+            )
+            feeder.start()
+            writer.start()
+            try:
+                self._detect_loop(decoded_q, write_q)
+            finally:
+                # After an error the feeder may be blocked on the full decoded_q: stop it and
+                # empty the queue until it exits, so neither it nor the decode pool hangs
+                self._stop.set()
+                while feeder.is_alive():
+                    self._discard(decoded_q)
+                    feeder.join(timeout=0.05)
+                self._discard(decoded_q)
+                self._in_flight.clear()
+                write_q.put(_DONE)
+                writer.join()
+                self._decoder = None
+
+        timings = dict(self._timings)
+        stage_ms = {stage: int(timings.pop(stage) * 1000) for stage in ("decode", "detect", "persist", "detect_wait")}
+        if self._triage:
+            positive, skipped = self._triage_counts["positive"], self._triage_counts["skipped"]
+            full_per_photo = timings["triage_full"] / positive if positive else 0.0
+            stage_ms["triage"] = int(timings["triage"] * 1000)
+            stage_ms["triage_skipped"] = skipped
+            stage_ms["triage_saved"] = max(0, int((skipped * full_per_photo - timings["triage"]) * 1000))
+        return stage_ms
+
+    def _add_timing(self, stage: str, seconds: float) -> None:
+        with self._timings_lock:
+            self._timings[stage] += seconds
+
+    # ------------------------------------------------------------------
+    # Stage 1: decode (thread pool)
+    # ------------------------------------------------------------------
+
+    def _feed(self, pool, file_paths, decoded_q) -> None:
+        """Submit decode jobs in order; the bounded queue throttles read-ahead."""
+        for i, file_path in enumerate(file_paths, 1):
+            if self._stop.is_set():
+                break
+            decoded_q.put(pool.submit(self._decode, i, file_path))
+        decoded_q.put(_DONE)
+
+    @staticmethod
+    def _discard(decoded_q) -> None:
+        """Empty decoded_q, cancelling decode jobs that have not started."""
+        while True:
+            try:
+                future = decoded_q.get_nowait()
+            except queue.Empty:
+                return
+            if future is not _DONE:
+                future.cancel()
+
+    def _decode(self, index: int, file_path: str) -> _Item:
+        from src.utils import metadata_util
+        from src.utils.video_util import extract_key_frames
+
+        item = _Item(index=index, file_path=file_path)
+        t0 = time.perf_counter()
+        try:
+            prepared = self._prepare(file_path)
+            if prepared is None:
+                item.skipped = True
+                return item
+            item.media_id, item.is_video = prepared
+            if self._use_cache and self._load_cached(item):
+                if not item.is_video:
+                    item.meta = metadata_util.extract_metadata(file_path)
+            elif item.is_video:
+                # Decoded lazily by the detect stage, a chunk at a time
+                item.frames = extract_key_frames(
+                    file_path, interval_seconds=1.0, max_side=self._decode_max_side
+                )
+            else:
+                # Triage mode: a small decode for the coarse pass; candidates are re-read later
+                max_side = TRIAGE_MAX_SIDE if self._triage else self._decode_max_side
+                item.image = FaceAnalysisService.decode_image(file_path, max_side, tile=not self._triage)
+                # --- Automatic Metadata Extraction (images only) ---
+                item.meta = metadata_util.extract_metadata(file_path)
+        except Exception as e:
+            item.error = e
+        finally:
+            self._add_timing("decode", time.perf_counter() - t0)
+        return item
+
+    def _load_cached(self, item: _Item) -> bool:
+        """Look the file's content up in the detection cache; True on a hit."""
+        from src.services.face_result_cache import content_hash, detection_signature
+        try:
+            item.cache_key = (
+                content_hash(item.file_path),
+                detection_signature(
+                    self._decode_max_side, video=item.is_video, triage=self._triage and not item.is_video
+                ),
+            )
+            cached = self._face_svc.get_cached_faces(*item.cache_key)
+        except Exception as e:
+            logger.warning(f"BatchFaceWorker: detection cache lookup failed for {item.file_path}: {e}")
+            return False
+        if cached is None:
+            return False
+        item.results, item.cached = cached, True
+        return True
+
+    def _prepare(self, file_path: str):
+        """Validate the file and ensure its media row. Returns (media_id, is_video) or None to skip."""
+        from src.utils.video_util import VIDEO_EXTS
+        from src.utils.document_util import DOCUMENT_EXTS
+        ext = os.path.splitext(file_path)[1].lower()
+        is_video = ext in VIDEO_EXTS
+
+        if ext in DOCUMENT_EXTS:
+            raise ValueError(f"Yüz tanıma doküman dosyaları için desteklenmemektedir: {ext}")
+
+        if not is_video and ext not in IMAGE_EXTS:
+            raise ValueError(f"Yüz tanıma bu dosya türü için desteklenmemektedir: {ext}")
+
+        media_type = "video" if is_video else "photo"
+
+        media_id = self._media_svc.ensure_media_exists(
+            self._event_id, file_path, media_type
+        )
+        media_row = self._media_svc.get_by_file_path(file_path)
+        if not self._force and media_row and media_row.get("face_detected_at"):
+            return None
+
+        if self._force:
+            self._face_svc.delete_faces_for_media(media_id)
+        return media_id, is_video
+
+    # ------------------------------------------------------------------
+    # Stage 2: detect (caller's thread)
+    # ------------------------------------------------------------------
+
+    def _detect_loop(self, decoded_q, write_q) -> None:
+        pending: list[_Item] = []
+        while True:
+            t0 = time.perf_counter()
+            future = decoded_q.get()
+            if future is _DONE:
+                break
+            item = future.result()
+            self._add_timing("detect_wait", time.perf_counter() - t0)
+
+            if item.is_video and item.frames is not None:
+                self._flush_photos(pending, write_q)
+                self._detect_video(item)
+                self._forward([item], write_q)
+            elif item.image is None and not pending:
+                # Nothing to batch with (skipped, failed or unreadable): pass straight through
+                self._forward([item], write_q)
+            else:
+                pending.append(item)
+                if sum(1 for it in pending if it.image is not None) >= self._batch_size:
+                    self._flush_photos(pending, write_q)
+        self._flush_photos(pending, write_q)
+        self._drain(write_q, 0)
+
+    def _flush_photos(self, pending: list[_Item], write_q) -> None:
+        """Detect all pending photos in one batch and forward every pending item in order."""
+        photos = [it for it in pending if it.image is not None]
+        if self._triage and photos:
+            photos = self._triage_photos(photos)
+        future = None
+        if photos:
+            t0 = time.perf_counter()
+            paths = [it.file_path for it in photos]
+            signature = self._detection_signature()
+            if self._pool is not None:
+                # Copied into shared memory; resolved later by _drain
+                try:
+                    future = self._broker.claim(paths, signature).attach(
+                        lambda idx: self._pool.submit_arrays([photos[i].image for i in idx], [paths[i] for i in idx])
+                    )
+                except Exception as e:
+                    # e.g. BrokenProcessPool: _collect retries each file by path, like a failed batch
+                    future = Future()
+                    future.set_exception(e)
+            else:
+                try:
+                    batch_results = self._broker.detect(
+                        paths, signature,
+                        lambda idx: self._face_svc.detect_faces_from_arrays(
+                            [photos[i].image for i in idx], [paths[i] for i in idx]
+                        ),
+                    )
+                    for it, results in zip(photos, batch_results):
+                        it.results, it.detected = results, True
+                except Exception as e:
+                    logger.warning(f"BatchFaceWorker: batch detection failed, retrying per file: {e}")
+                    for it in photos:
+                        try:
+                            it.results = self._face_svc.detect_faces_from_arrays([it.image], [it.file_path])[0]
+                            it.detected = True
+                        except Exception as e2:
+                            it.error = e2
+            for it in photos:
+                it.image = None
+            self._add_timing("detect", time.perf_counter() - t0)
+            if self._triage:
+                self._add_timing("triage_full", time.perf_counter() - t0)
+        self._forward(pending, write_q, photos, future)
+        pending.clear()
+
+    def _detection_signature(self) -> str:
+        """Key of the full detection pass for the broker (the same in triage mode)."""
+        from src.services.face_result_cache import detection_signature
+        return detection_signature(self._decode_max_side)
+
+    def _triage_photos(self, photos: list[_Item]) -> list[_Item]:
+        """
+        Coarse pass over small decodes; returns the photos with face candidates,
+        re-decoded at the normal size. The others are done with no faces.
+        """
+        t0 = time.perf_counter()
+        imgs = [it.image for it in photos]
+        try:
+            if self._pool is not None:
+                flags = self._pool.submit_arrays(imgs, triage=True).result()
+            else:
+                flags = self._face_svc.triage_faces_from_arrays(imgs)
+        except Exception as e:
+            logger.warning(f"BatchFaceWorker: triage failed, running full detection: {e}")
+            flags = [True] * len(photos)
+        del imgs
+        self._add_timing("triage", time.perf_counter() - t0)
+
+        candidates = []
+        for it, has_candidate in zip(photos, flags):
+            if has_candidate:
+                candidates.append(it)
+            else:
+                it.image, it.results, it.detected = None, [], True
+        self._triage_counts["positive"] += len(candidates)
+        self._triage_counts["skipped"] += len(photos) - len(candidates)
+
+        def decode(it: _Item):
+            return FaceAnalysisService.decode_image(it.file_path, self._decode_max_side, tile=True)
+
+        t1 = time.perf_counter()
+        images = list(self._decoder.map(decode, candidates)) if self._decoder else [decode(it) for it in candidates]
+        for it, img in zip(candidates, images):
+            it.image = img
+        elapsed = time.perf_counter() - t1
+        self._add_timing("decode", elapsed)
+        self._add_timing("triage_full", elapsed)
+        return [it for it in candidates if it.image is not None]
+
+    def _forward(self, items: list[_Item], write_q, photos=(), future=None) -> None:
+        """Queue items for the writer behind any batches still running in the process pool."""
+        self._in_flight.append((list(items), list(photos), future))
+        self._drain(write_q, self._pool.workers if self._pool is not None else 0)
+
+    def _drain(self, write_q, keep: int) -> None:
+        """Hand finished entries to the writer in order, waiting until at most keep batches run."""
+        while self._in_flight:
+            items, photos, future = self._in_flight[0]
+            running = sum(1 for _, _, f in self._in_flight if f is not None)
+            if future is not None and not future.done() and running <= keep:
+                break
+            self._in_flight.popleft()
+            if future is not None:
+                self._collect(photos, future)
+            for it in items:
+                write_q.put(it)
+
+    def _collect(self, photos: list[_Item], future) -> None:
+        """Take a process-pool batch result; on failure retry each file by path in the pool."""
+        t0 = time.perf_counter()
+        try:
+            for it, results in zip(photos, future.result()):
+                it.results, it.detected = results, True
+        except Exception as e:
+            logger.warning(f"BatchFaceWorker: batch detection failed, retrying per file: {e}")
+            for it in photos:
+                try:
+                    it.results = self._pool.submit_paths([it.file_path], self._decode_max_side).result()[0]
+                    it.detected = True
+                except Exception as e2:
+                    it.error = e2
+        self._add_timing("detect", time.perf_counter() - t0)
+        if self._triage:
+            self._add_timing("triage_full", time.perf_counter() - t0)
+
+    def _detect_video(self, item: _Item) -> None:
+        """
+        Detect faces on the key frames as they are decoded, batch_size frames per
+        model call, then collapse them into face tracks (one representative face
+        per track). Only a few chunks of frames are alive at any time.
+        """
+        t0 = time.perf_counter()
+        decode_s = 0.0
+        frames = item.frames
+        item.frames = None
+        try:
+            per_frame = []
+            running: deque = deque()  # (timestamps, future) submitted to the process pool
+            while True:
+                t_dec = time.perf_counter()
+                chunk = list(islice(frames, self._batch_size))
+                decode_s += time.perf_counter() - t_dec
+                if not chunk:
+                    break
+                imgs, timestamps = [frame for frame, _ in chunk], [tms for _, tms in chunk]
+                del chunk
+                if self._pool is not None:
+                    # Up to one chunk per worker process in flight, decoding the next meanwhile
+                    running.append((timestamps, self._pool.submit_arrays(imgs)))
+                    while len(running) > self._pool.workers:
+                        done_ts, future = running.popleft()
+                        per_frame.extend(zip(done_ts, future.result()))
+                else:
+                    per_frame.extend(zip(timestamps, self._face_svc.detect_faces_from_arrays(imgs)))
+                del imgs
+            for done_ts, future in running:
+                per_frame.extend(zip(done_ts, future.result()))
+            item.results = track_faces(per_frame)
+            item.detected = True
+        except Exception as e:
+            item.error = e
+        finally:
+            frames.close()
+        self._add_timing("decode", decode_s)
+        self._add_timing("detect", time.perf_counter() - t0 - decode_s)
+
+    # ------------------------------------------------------------------
+    # Stage 3: persist (writer thread)
+    # ------------------------------------------------------------------
+
+    def _write_loop(self, write_q, total: int, on_progress, on_processed) -> None:
+        finished = False
+        while not finished:
+            batch = [write_q.get()]
+            # Take whatever else is already waiting, up to one transaction's worth
+            while len(batch) < self._write_batch_size and batch[-1] is not _DONE:
+                try:
+                    batch.append(write_q.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _DONE:
+                finished = True
+                batch.pop()
+            if not batch:
+                continue
+
+            t0 = time.perf_counter()
+            self._persist(batch)
+            self._add_timing("persist", time.perf_counter() - t0)
+
+            for item in batch:
+                if item.error is not None:
+                    logger.warning(f"BatchFaceWorker: error on {item.file_path}: {item.error}")
+                if not item.skipped and on_processed:
+                    on_processed(item.file_path)
+                if on_progress:
+                    on_progress(item.index, total)
+
+    def _persist(self, items: list[_Item]) -> None:
+        """Match persons, then save faces, assignments and links for all ready items in one transaction."""
+        ready = [it for it in items if it.media_id is not None and it.error is None and not it.skipped]
+        with_faces = [it for it in ready if it.results]
+
+        # One vectorised index lookup for every face of the batch that passes the
+        # quality gate; the others are stored unassigned
+        assignments = None
+        try:
+            gate = QualityGate.from_settings()
+            embeddings = [fr.embedding for it in with_faces for fr in it.results if gate.passes(fr)]
+            matches = iter(self._face_svc.find_similar_persons(embeddings)) if embeddings else iter(())
+            assignments = [
+                [next(matches)[0] if gate.passes(fr) else None for fr in it.results] for it in with_faces
+            ]
+        except Exception as e:
+            logger.warning(f"BatchFaceWorker: person matching failed, saving faces unassigned: {e}")
+
+        try:
+            self._face_svc.save_faces_batch([(it.media_id, it.results) for it in with_faces], assignments)
+        except Exception as e:
+            for it in with_faces:
+                it.error = e
+
+        for item in ready:
+            if item.error is None and item.meta and any(v.strip() for v in item.meta.values()):
+                try:
+                    self._media_svc.save_iptc_data(item.media_id, item.meta)
+                except Exception as e:
+                    item.error = e
+
+        done_ids = [it.media_id for it in ready if it.error is None]
+        try:
+            self._media_svc.mark_face_detected_many(done_ids)
+        except Exception as e:
+            for it in ready:
+                if it.error is None:
+                    it.error = e
+
+        fresh = [it for it in ready if it.error is None and it.detected and it.cache_key is not None]
+        if fresh:
+            try:
+                self._face_svc.cache_faces([(*it.cache_key, it.results) for it in fresh])
+            except Exception as e:
+                logger.warning(f"BatchFaceWorker: could not cache detections of {len(fresh)} files: {e}")
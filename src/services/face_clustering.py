@@ -0,0 +1,201 @@
+"""
+face_clustering — unsupervised grouping of unassigned face embeddings.
+
+Pure numpy, CPU only, built for ~1M faces in minutes:
+- knn_graph(): approximate k-nearest-neighbour graph through an inverted-file
+  partition (spherical k-means on a sample, √N cells). Every face is filed
+  under its CELL_REPLICAS nearest cells and searches only its own nearest
+  cell, so per-cell matmuls stay around √N × CELL_REPLICAS·√N and neighbours
+  across a cell border are still found
+- chinese_whispers(): label propagation over that graph — each node takes the
+  label with the largest summed edge similarity among its neighbours; a random
+  half of the nodes update per round, fully vectorised over the edge arrays
+- cluster_embeddings() combines both and drops clusters below MIN_CLUSTER_SIZE
+- attach_to_centroids() is the incremental path: new faces join the nearest
+  existing cluster centroid if it is close enough
+
+Distances are cosine distances (1 - dot of unit vectors), the same scale as
+pgvector's <=> and PersonMatchIndex.
+"""
+from __future__ import annotations
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_MAX_DISTANCE = 0.45   # graph edges; stricter than MATCH_THRESHOLD (0.5) so clusters stay pure
+CLUSTER_ATTACH_DISTANCE = 0.40  # incremental: new face -> existing cluster centroid
+KNN_K = 10
+MIN_CLUSTER_SIZE = 3
+CELL_REPLICAS = 3
+_KMEANS_SAMPLE = 50_000
+_KMEANS_ITERATIONS = 8
+_CHUNK = 4096
+
+
+def normalise(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise rows in place (float32) and return them."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def _top_cells(vectors: np.ndarray, centroids: np.ndarray, r: int) -> np.ndarray:
+    """Indices of the r most similar centroids per vector, most similar first."""
+    out = np.empty((len(vectors), r), dtype=np.int64)
+    for start in range(0, len(vectors), _CHUNK):
+        sims = vectors[start:start + _CHUNK] @ centroids.T
+        if r < sims.shape[1]:
+            idx = np.argpartition(-sims, r - 1, axis=1)[:, :r]
+        else:
+            idx = np.broadcast_to(np.arange(sims.shape[1]), sims.shape).copy()
+        order = np.argsort(-np.take_along_axis(sims, idx, axis=1), axis=1, kind="stable")
+        out[start:start + _CHUNK] = np.take_along_axis(idx, order, axis=1)[:, :r]
+    return out
+
+
+def _kmeans(vectors: np.ndarray, n_cells: int, rng) -> np.ndarray:
+    """Spherical k-means on a sample; returns unit centroids."""
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), _KMEANS_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_cells, replace=False)].copy()
+    for _ in range(_KMEANS_ITERATIONS):
+        assign = _top_cells(sample, centroids, 1)[:, 0]
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=n_cells) == 0
+        sums[empty] = centroids[empty]  # keep the old centroid for empty cells
+        centroids = normalise(sums)
+    return centroids
+
+
+def knn_graph(vectors: np.ndarray, k: int = KNN_K, max_distance: float = CLUSTER_MAX_DISTANCE,
+              seed: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Approximate kNN graph of unit vectors.
+
+    Returns:
+        (src, dst, similarity) edge arrays; only edges with cosine distance below
+        max_distance, each unordered pair at most once per direction found.
+    """
+    n = len(vectors)
+    if n < 2:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+    rng = np.random.default_rng(seed)
+    n_cells = max(1, int(np.sqrt(n)))
+    replicas = min(CELL_REPLICAS, n_cells)
+    centroids = _kmeans(vectors, n_cells, rng) if n_cells > 1 else normalise(vectors.mean(axis=0, keepdims=True))
+    cells = _top_cells(vectors, centroids, replicas)
+
+    # Inverted lists: every face under each of its nearest cells
+    flat_cells = cells.ravel()
+    flat_ids = np.repeat(np.arange(n), replicas)
+    order = np.argsort(flat_cells, kind="stable")
+    list_ids = flat_ids[order]
+    bounds = np.searchsorted(flat_cells[order], np.arange(n_cells + 1))
+
+    primary = cells[:, 0]
+    q_order = np.argsort(primary, kind="stable")
+    q_bounds = np.searchsorted(primary[q_order], np.arange(n_cells + 1))
+
+    srcs, dsts, sims = [], [], []
+    min_sim = 1.0 - max_distance
+    for c in range(n_cells):
+        queries = q_order[q_bounds[c]:q_bounds[c + 1]]
+        members = list_ids[bounds[c]:bounds[c + 1]]
+        if len(queries) == 0 or len(members) < 2:
+            continue
+        members_vec = vectors[members]
+        for start in range(0, len(queries), _CHUNK):
+            q = queries[start:start + _CHUNK]
+            s = vectors[q] @ members_vec.T
+            s[members[None, :] == q[:, None]] = -np.inf  # no self edges
+            kk = min(k, len(members) - 1)
+            top = np.argpartition(-s, kk - 1, axis=1)[:, :kk]
+            top_s = np.take_along_axis(s, top, axis=1)
+            keep = top_s > min_sim
+            rows = np.broadcast_to(q[:, None], top.shape)
+            srcs.append(rows[keep])
+            dsts.append(members[top[keep]])
+            sims.append(top_s[keep].astype(np.float32))
+    if not srcs:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+    return np.concatenate(srcs), np.concatenate(dsts), np.concatenate(sims)
+
+
+def chinese_whispers(n: int, src: np.ndarray, dst: np.ndarray, weight: np.ndarray,
+                     iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Chinese-whispers labels for n nodes over an undirected weighted edge list.
+
+    Returns:
+        int64 label per node; isolated nodes keep their own index.
+    """
+    labels = np.arange(n, dtype=np.int64)
+    if len(src) == 0:
+        return labels
+    s = np.concatenate([src, dst]).astype(np.int64)
+    d = np.concatenate([dst, src]).astype(np.int64)
+    w = np.concatenate([weight, weight]).astype(np.float64)
+    rng = np.random.default_rng(seed)
+    for _ in range(iterations):
+        key = s * n + labels[d]
+        order = np.argsort(key, kind="stable")
+        key, ww = key[order], w[order]
+        uniq, start = np.unique(key, return_index=True)
+        totals = np.add.reduceat(ww, start)
+        nodes, cand = uniq // n, uniq % n
+        top = np.lexsort((cand, -totals, nodes))  # per node: heaviest label, then lowest id
+        nodes, cand = nodes[top], cand[top]
+        first = np.r_[True, nodes[1:] != nodes[:-1]]
+        best = labels.copy()
+        best[nodes[first]] = cand[first]
+        if np.array_equal(best, labels):
+            break  # every node already holds its heaviest neighbour label
+        # Asynchronous-style: only a random half moves per round, so pairs don't flip-flop
+        active = rng.random(n) < 0.5
+        labels = np.where(active, best, labels)
+    return labels
+
+
+def cluster_embeddings(vectors: np.ndarray, min_size: int = MIN_CLUSTER_SIZE,
+                       max_distance: float = CLUSTER_MAX_DISTANCE, k: int = KNN_K,
+                       seed: int = 0) -> np.ndarray:
+    """
+    Cluster unit vectors.
+
+    Returns:
+        Cluster index per vector (0..C-1, largest cluster first), -1 for faces in
+        clusters smaller than min_size.
+    """
+    n = len(vectors)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    src, dst, sim = knn_graph(vectors, k=k, max_distance=max_distance, seed=seed)
+    labels = chinese_whispers(n, src, dst, sim, seed=seed)
+    uniq, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    rank = np.full(len(uniq), -1, dtype=np.int64)
+    big = np.where(counts >= max(1, min_size))[0]
+    big = big[np.argsort(-counts[big], kind="stable")]
+    rank[big] = np.arange(len(big))
+    return rank[inverse]
+
+
+def attach_to_centroids(vectors: np.ndarray, centroids: np.ndarray,
+                        max_distance: float = CLUSTER_ATTACH_DISTANCE) -> np.ndarray:
+    """
+    Nearest centroid row per unit vector, or -1 if none is within max_distance.
+
+    centroids must be unit rows.
+    """
+    out = np.full(len(vectors), -1, dtype=np.int64)
+    if len(vectors) == 0 or len(centroids) == 0:
+        return out
+    for start in range(0, len(vectors), _CHUNK):
+        sims = vectors[start:start + _CHUNK] @ centroids.T
+        best = sims.argmax(axis=1)
+        ok = sims[np.arange(len(best)), best] > 1.0 - max_distance
+        out[start:start + _CHUNK] = np.where(ok, best, -1)
+    return out
@@ -0,0 +1,283 @@
+"""
+FaceDetectionBroker — coalesces face detection requests for the same file
+between the interactive single view and the batch pipeline.
+
+- a request is keyed by the file's normalised absolute path and the detection
+  signature (face_result_cache.detection_signature: model pack, decode size,
+  tiling ...);
+  asking for a file that is already being detected waits for that run instead
+  of starting another, and every waiting caller receives the same result
+- the results of the last RECENT_RESULTS files stay available for RECENT_TTL
+  seconds (while the file's size and mtime are unchanged), so a batch reaching
+  a file the user has just opened does not detect it again
+- model access goes through MODEL_LOCK (FaceAnalysisService._lock): threads
+  inside ModelLock.interactive() acquire it ahead of waiting batch threads, so
+  an opened image waits for the batch's current forward pass only, not for
+  the rest of the batch
+
+Results are the raw detect_from_arrays() output (no quality gate); callers get
+their own list of the shared FaceResult objects.
+"""
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+RECENT_RESULTS = 64
+RECENT_TTL = 300.0  # seconds
+
+
+class ModelLock:
+    """
+    Non-reentrant lock where interactive threads are served before batch threads.
+
+    Waiting batch threads only get the lock while no interactive thread waits
+    for it; among threads of the same kind the order is unspecified.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._held = False
+        self._urgent_waiting = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def interactive(self):
+        """Mark the calling thread's acquisitions inside the block as interactive."""
+        previous = getattr(self._local, "urgent", False)
+        self._local.urgent = True
+        try:
+            yield
+        finally:
+            self._local.urgent = previous
+
+    def acquire(self) -> bool:
+        urgent = getattr(self._local, "urgent", False)
+        with self._cond:
+            if urgent:
+                self._urgent_waiting += 1
+                try:
+                    while self._held:
+                        self._cond.wait()
+                finally:
+                    self._urgent_waiting -= 1
+            else:
+                while self._held or self._urgent_waiting:
+                    self._cond.wait()
+            self._held = True
+        return True
+
+    def release(self) -> None:
+        with self._cond:
+            if not self._held:
+                raise RuntimeError("release unlocked ModelLock")
+            self._held = False
+            self._cond.notify_all()
+
+    def locked(self) -> bool:
+        return self._held
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+MODEL_LOCK = ModelLock()
+
+
+def _file_state(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class DetectionClaim:
+    """
+    Result of FaceDetectionBroker.claim(): the caller runs detection for
+    `owned` (indexes into the claimed paths) and hands the results back with
+    resolve() — or fail() — while the other paths are delivered by whoever
+    already runs them.
+    """
+
+    def __init__(self, broker: FaceDetectionBroker, keys: list, futures: list[Future], owned: list[int]):
+        self._broker = broker
+        self._keys = keys
+        self.futures = futures
+        self.owned = owned
+
+    @property
+    def shared(self) -> int:
+        """Number of paths served by another caller's run or by a recent result."""
+        return len(self.futures) - len(self.owned)
+
+    def resolve(self, results: list) -> None:
+        """Deliver the results of the owned paths (in owned order) to every waiting caller."""
+        for i, faces in zip(self.owned, results):
+            self.futures[i].set_result(faces)
+            self._broker._finish(self._keys[i], self.futures[i], faces)
+
+    def fail(self, exc: BaseException) -> None:
+        for i in self.owned:
+            self.futures[i].set_exception(exc)
+            self._broker._finish(self._keys[i], self.futures[i], None)
+
+    def results(self) -> list[list]:
+        """One FaceResult list per claimed path; waits for paths detected by other callers."""
+        return [list(f.result()) for f in self.futures]
+
+    def attach(self, submit) -> Future:
+        """
+        Asynchronous variant for process-pool batches: submit(owned) must return
+        a Future of the owned paths' results. Returns a Future of the results of
+        every claimed path, in order.
+        """
+        combined: Future = Future()
+        lock = threading.Lock()
+
+        def on_own_done(future: Future) -> None:
+            exc = future.exception()
+            if exc is not None:
+                self.fail(exc)
+            else:
+                self.resolve(future.result())
+
+        def on_any_done(_future: Future) -> None:
+            if not all(f.done() for f in self.futures):
+                return
+            with lock:
+                if combined.done():
+                    return
+                try:
+                    combined.set_result(self.results())
+                except BaseException as exc:  # the owned run or another caller's run failed
+                    combined.set_exception(exc)
+
+        if self.owned:
+            try:
+                own_future = submit(self.owned)
+            except BaseException as e:
+                self.fail(e)
+                raise
+            own_future.add_done_callback(on_own_done)
+        for future in self.futures:
+            future.add_done_callback(on_any_done)
+        if not self.futures:
+            combined.set_result([])
+        return combined
+
+
+class FaceDetectionBroker:
+    """Singleton; shared by the single view's detection worker and the batch pipeline."""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    inst = super().__new__(cls)
+                    inst._lock = threading.Lock()
+                    inst._in_flight = {}        # key -> Future
+                    inst._recent = OrderedDict()  # key -> (file state, results, finished at)
+                    cls._instance = inst
+        return cls._instance
+
+    @staticmethod
+    def _key(path: str, signature: str) -> tuple[str, str]:
+        return os.path.normcase(os.path.abspath(path)), signature
+
+    def claim(self, paths: list[str], signature: str) -> DetectionClaim:
+        """
+        Register a detection of paths with the given detection signature. Paths already in
+        flight or detected recently are shared; the rest are owned by the caller,
+        who must resolve() or fail() the claim.
+        """
+        keys = [self._key(p, signature) for p in paths]
+        states = [_file_state(p) for p in paths]
+        futures, owned = [], []
+        now = time.monotonic()
+        with self._lock:
+            for i, (key, state) in enumerate(zip(keys, states)):
+                future = self._in_flight.get(key)
+                if future is None:
+                    recent = self._recent.get(key)
+                    if recent is not None and state is not None and recent[0] == state \
+                            and now - recent[2] < RECENT_TTL:
+                        future = Future()
+                        future.set_result(recent[1])
+                if future is None:
+                    future = Future()
+                    self._in_flight[key] = future
+                    owned.append(i)
+                futures.append(future)
+        if len(owned) < len(paths):
+            logger.debug(f"FaceDetectionBroker: {len(paths) - len(owned)}/{len(paths)} files shared")
+        return DetectionClaim(self, keys, futures, owned)
+
+    def _finish(self, key, future: Future, results: list | None) -> None:
+        state = _file_state(key[0]) if results is not None else None
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            if state is not None:
+                self._recent[key] = (state, results, time.monotonic())
+                self._recent.move_to_end(key)
+                while len(self._recent) > RECENT_RESULTS:
+                    self._recent.popitem(last=False)
+
+    def detect(self, paths: list[str], signature: str, run, interactive: bool = False) -> list[list]:
+        """
+        Detect faces in paths through the broker.
+
+        Args:
+            signature: Detection parameters the results depend on (part of the key).
+            run: Callable(indexes) returning one FaceResult list per given index
+                 into paths; called for the owned paths and, if another caller's
+                 run failed, once more for those paths.
+            interactive: Run the model ahead of batch callers (MODEL_LOCK).
+
+        Returns:
+            One FaceResult list per path, in order.
+        """
+        claim = self.claim(paths, signature)
+
+        def call(indexes):
+            if not interactive:
+                return run(indexes)
+            with MODEL_LOCK.interactive():
+                return run(indexes)
+
+        if claim.owned:
+            try:
+                own = call(claim.owned)
+            except BaseException as e:
+                claim.fail(e)
+                raise
+            claim.resolve(own)
+
+        results, retry = [], []
+        for i, future in enumerate(claim.futures):
+            try:
+                results.append(list(future.result()))
+            except Exception:
+                results.append([])
+                retry.append(i)
+        if retry:
+            for i, faces in zip(retry, call(retry)):
+                results[i] = faces
+        return results
+
+    def clear(self) -> None:
+        """Forget recent results (in-flight requests are kept)."""
+        with self._lock:
+            self._recent.clear()
@@ -0,0 +1,166 @@
+"""
+FaceProcessPool — opt-in multi-process face detection.
+
+FaceAnalysisService is a per-process singleton behind a threading.Lock, so one
+process runs one inference at a time on a couple of ONNX Runtime threads. This
+pool spreads batches over worker processes instead:
+- every worker owns its own insightface model / ONNX Runtime sessions, created
+  once in the initializer with `intra_op_threads` threads each
+- work is handed over either as file paths (the worker decodes, DCT-scaled) or
+  as already-decoded BGR arrays packed into one multiprocessing.shared_memory
+  block per batch, so frames are not pickled through the pool pipe
+- workers return FaceResult lists, exactly as FaceAnalysisService.detect_from_arrays
+
+Workers are started with the "spawn" method so the Qt main process is never
+forked. Enabled by the "face_detect_processes" setting (0 = in-process).
+"""
+from __future__ import annotations
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTRA_OP_THREADS = 2
+
+
+def default_workers(intra_op_threads: int = DEFAULT_INTRA_OP_THREADS) -> int:
+    """One worker per intra_op_threads cores."""
+    return max(1, (os.cpu_count() or 2) // max(1, intra_op_threads))
+
+
+# ----------------------------------------------------------------------
+# Worker side (runs in the child processes)
+# ----------------------------------------------------------------------
+
+def _init_worker(intra_op_threads: int) -> None:
+    os.environ["OMP_NUM_THREADS"] = str(intra_op_threads)
+    from src.services.face_analysis_service import FaceAnalysisService
+    FaceAnalysisService.configure_session(intra_op_threads)
+    FaceAnalysisService()._load_model()
+
+
+def _detect_paths(paths: list[str], max_side: int) -> list[list]:
+    from src.services.face_analysis_service import FaceAnalysisService
+    service = FaceAnalysisService()
+    imgs = [service.decode_image(p, max_side, tile=True) for p in paths]
+    results: list[list] = [[] for _ in paths]
+    readable = [i for i, img in enumerate(imgs) if img is not None]
+    if readable:
+        found = service.detect_from_arrays([imgs[i] for i in readable], [paths[i] for i in readable])
+        for i, faces in zip(readable, found):
+            results[i] = faces
+    return results
+
+
+def _detect_shared(shm_name: str, layout: list[tuple[int, tuple, str]], sources: list | None,
+                   triage: bool = False) -> list:
+    from multiprocessing import resource_tracker
+    from src.services.face_analysis_service import FaceAnalysisService
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    # The parent owns (and unlinks) the block; don't let this process's tracker claim it too
+    resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        imgs = [
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            for offset, shape, dtype in layout
+        ]
+        service = FaceAnalysisService()
+        results = service.triage_from_arrays(imgs) if triage else service.detect_from_arrays(imgs, sources)
+        del imgs
+        return results
+    finally:
+        shm.close()
+
+
+# ----------------------------------------------------------------------
+# Parent side
+# ----------------------------------------------------------------------
+
+class FaceProcessPool:
+    """
+    Process pool running FaceAnalysisService in `workers` child processes.
+
+    Use as a context manager; submit_*() return concurrent.futures.Future objects
+    resolving to one FaceResult list per input, in input order.
+    """
+
+    def __init__(self, workers: int | None = None, intra_op_threads: int = DEFAULT_INTRA_OP_THREADS):
+        self.intra_op_threads = max(1, intra_op_threads)
+        self.workers = workers or default_workers(self.intra_op_threads)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.intra_op_threads,),
+        )
+        self._shm_lock = threading.Lock()
+        self._live_shm: dict[str, shared_memory.SharedMemory] = {}
+        logger.info(
+            f"FaceProcessPool: {self.workers} workers × {self.intra_op_threads} threads",
+            extra={"event": "FACE_POOL_START"},
+        )
+
+    def __enter__(self) -> "FaceProcessPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit_paths(self, paths: list[str], max_side: int = 0) -> Future:
+        """Decode and detect the given image files in one worker."""
+        return self._executor.submit(_detect_paths, list(paths), max_side)
+
+    def submit_arrays(self, imgs: list[np.ndarray], sources: list[str | None] | None = None,
+                      triage: bool = False) -> Future:
+        """
+        Detect faces in decoded BGR arrays in one worker.
+
+        The arrays are copied into a single shared-memory block, so callers may
+        drop their references as soon as this returns. With triage=True the
+        worker runs the coarse pass instead and the future resolves to one
+        bool per array (FaceAnalysisService.triage_from_arrays).
+        """
+        layout, offset = [], 0
+        for img in imgs:
+            layout.append((offset, img.shape, img.dtype.str))
+            offset += img.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(1, offset))
+        try:
+            for img, (start, shape, dtype) in zip(imgs, layout):
+                view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+                view[...] = img
+                del view
+            future = self._executor.submit(_detect_shared, shm.name, layout, sources, triage)
+        except Exception:
+            self._release(shm)
+            raise
+        with self._shm_lock:
+            self._live_shm[shm.name] = shm
+        future.add_done_callback(lambda _f, s=shm: self._release(s))
+        return future
+
+    def detect_arrays(self, imgs: list[np.ndarray], sources: list[str | None] | None = None) -> list[list]:
+        return self.submit_arrays(imgs, sources).result()
+
+    def _release(self, shm: shared_memory.SharedMemory) -> None:
+        with self._shm_lock:
+            self._live_shm.pop(shm.name, None)
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._shm_lock:
+            leftover = list(self._live_shm.values())
+        for shm in leftover:
+            self._release(shm)
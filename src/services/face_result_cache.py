@@ -0,0 +1,131 @@
+"""
+face_result_cache — content-addressed keys and storage format for cached face
+detection results (face_detection_cache table).
+
+A cache entry is keyed by
+- content_hash(): BLAKE2b of the file's bytes, so a re-import of the same file
+  under another path or into another event hits the same entry. Files above
+  FULL_HASH_LIMIT (long videos) are hashed from their size and SAMPLE_CHUNKS
+  evenly spaced 1 MB chunks instead of every byte
+- detection_signature(): everything besides the bytes that changes the output —
+  record format version, model pack (fp32 or int8) and its ONNX files, det_size, decode size,
+  the tiling limits, the triage parameters in two-stage mode and, for videos, the key-frame
+  interval and face tracker thresholds
+
+Results are stored as a face count, one packed numpy record per face (~2 KB)
+and the faces' JPEG chips back to back (pack_results / unpack_results).
+"""
+from __future__ import annotations
+import hashlib
+import os
+
+import numpy as np
+
+from src.services import face_tracker
+from src.services.face_analysis_service import (
+    DET_SIZE, MODEL_NAME, SMALL_FACE_PX, TILE_OVERLAP, TRIAGE_DET_SIZE, TRIAGE_MAX_SIDE, TRIAGE_THRESHOLD,
+    FaceAnalysisService, FaceResult,
+)
+
+FULL_HASH_LIMIT = 64 * 1024 * 1024
+SAMPLE_CHUNKS = 16
+_CHUNK = 1024 * 1024
+
+# Bump _RECORD_VERSION whenever _FACE_RECORD changes; it is part of the signature
+_RECORD_VERSION = 3
+_OPTIONAL_FIELDS = ("timestamp_ms", "track_start_ms", "track_end_ms",
+                    "blur_score", "face_px", "yaw", "pitch", "roll")
+_FACE_RECORD = np.dtype(
+    [("x1", "<f8"), ("y1", "<f8"), ("x2", "<f8"), ("y2", "<f8"), ("score", "<f8")]
+    + [(name, "<f8") for name in _OPTIONAL_FIELDS]
+    + [("embedding", "<f4", (512,)), ("chip_len", "<u4")]
+)
+_COUNT = np.dtype("<u4")
+
+_model_fingerprint: str | None = None
+
+
+def content_hash(file_path: str) -> str:
+    """Hex digest of the file content ("s:"-prefixed when sampled)."""
+    h = hashlib.blake2b(digest_size=20)
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        if size <= FULL_HASH_LIMIT:
+            while chunk := f.read(_CHUNK):
+                h.update(chunk)
+            return h.hexdigest()
+        h.update(size.to_bytes(8, "little"))
+        step = max(0, size - _CHUNK) // (SAMPLE_CHUNKS - 1)
+        for i in range(SAMPLE_CHUNKS):
+            f.seek(i * step)
+            h.update(f.read(_CHUNK))
+    return "s:" + h.hexdigest()
+
+
+def _model_files() -> str:
+    """Pack directory plus name and size of each of its ONNX files, once per process."""
+    global _model_fingerprint
+    if _model_fingerprint is None:
+        root = FaceAnalysisService.model_dir()
+        try:
+            files = sorted(n for n in os.listdir(root) if n.endswith(".onnx"))
+            _model_fingerprint = os.path.basename(root) + ":" + ",".join(
+                f"{n}:{os.path.getsize(os.path.join(root, n))}" for n in files
+            )
+        except OSError:
+            return ""  # not downloaded yet; retried next time
+    return _model_fingerprint
+
+
+def detection_signature(max_side: int, video: bool = False, interval_seconds: float = 1.0,
+                        triage: bool = False) -> str:
+    """Parameters the cached result depends on besides the file content."""
+    parts = [
+        f"v{_RECORD_VERSION}",
+        f"{MODEL_NAME}[{_model_files()}]",
+        f"det={DET_SIZE[0]}x{DET_SIZE[1]}",
+        f"side={max_side}",
+        f"small={SMALL_FACE_PX}",
+        "tile={},{},{},{}".format(*FaceAnalysisService.tiling_settings(), TILE_OVERLAP),
+    ]
+    if triage:
+        # Two-stage mode: photos without a coarse candidate are stored faceless
+        parts.append(f"triage={TRIAGE_MAX_SIDE},{TRIAGE_DET_SIZE[0]}x{TRIAGE_DET_SIZE[1]},{TRIAGE_THRESHOLD}")
+    if video:
+        parts.append(
+            f"kf={interval_seconds}|track={face_tracker.TRACK_MIN_IOU},{face_tracker.TRACK_MIN_SIM},"
+            f"{face_tracker.TRACK_REID_SIM},{face_tracker.TRACK_IOU_WEIGHT},{face_tracker.TRACK_MAX_GAP_MS}"
+        )
+    return "|".join(parts)
+
+
+def pack_results(results: list[FaceResult]) -> bytes:
+    records = np.zeros(len(results), dtype=_FACE_RECORD)
+    for rec, face in zip(records, results):
+        rec["x1"], rec["y1"], rec["x2"], rec["y2"] = face.x1, face.y1, face.x2, face.y2
+        rec["score"] = face.score
+        for name in _OPTIONAL_FIELDS:
+            value = getattr(face, name)
+            rec[name] = np.nan if value is None else value
+        if face.embedding is not None:
+            rec["embedding"] = face.embedding
+        rec["chip_len"] = len(face.chip) if face.chip else 0
+    chips = b"".join(face.chip or b"" for face in results)
+    return np.array(len(results), dtype=_COUNT).tobytes() + records.tobytes() + chips
+
+
+def unpack_results(data: bytes) -> list[FaceResult]:
+    count = int(np.frombuffer(data, dtype=_COUNT, count=1)[0])
+    records = np.frombuffer(data, dtype=_FACE_RECORD, count=count, offset=_COUNT.itemsize)
+    pos = _COUNT.itemsize + records.nbytes
+    results = []
+    for rec in records:
+        optional = {name: None if np.isnan(rec[name]) else float(rec[name]) for name in _OPTIONAL_FIELDS}
+        chip_len = int(rec["chip_len"])
+        results.append(FaceResult(
+            x1=float(rec["x1"]), y1=float(rec["y1"]), x2=float(rec["x2"]), y2=float(rec["y2"]),
+            embedding=rec["embedding"].copy(), score=float(rec["score"]),
+            chip=bytes(data[pos:pos + chip_len]) if chip_len else None, **optional,
+        ))
+        pos += chip_len
+    return results
@@ -2,6 +2,8 @@
 
 from src.services.base_service import BaseService
 from src.services.face_analysis_service import FaceAnalysisService
+from src.services.face_detection_broker import FaceDetectionBroker
+from src.services.person_match_index import MATCH_THRESHOLD, PersonMatchIndex
 from src.repositories.face_repository import FaceRepository
 from src.repositories.person_repository import PersonRepository
 from src.database import get_db
@@ -9,6 +11,21 @@ from sqlalchemy import text
 import logging
 import uuid
 
+import numpy as np
+
+# Incremental clustering falls back to a full run when this many new faces
+# (relative to the already-clustered ones) have arrived since the last full run.
+RECLUSTER_FRACTION = 0.2
+# Faces per transaction in assign_person_bulk
+BULK_ASSIGN_CHUNK = 1000
+# Re-embedding from stored chips: job_checkpoints key and chips per read/transaction
+REEMBED_JOB = "face_reembed"
+REEMBED_BATCH = 2048
+# Global re-matching: job_checkpoints key, faces per read/transaction and per matmul
+REMATCH_JOB = "face_rematch"
+REMATCH_PAGE = 100_000
+REMATCH_CHUNK = 4096
+
 class FaceService(BaseService):
     """Service for handling face detection and recognition."""
     
@@ -17,6 +34,8 @@ class FaceService(BaseService):
         self.face_repository = face_repository
         self.person_repository = person_repository
         self.face_analysis_service = FaceAnalysisService()  # singleton
+        self.match_index = PersonMatchIndex()  # singleton
+        self.detection_broker = FaceDetectionBroker()  # singleton
         self.logger = logging.getLogger(self.__class__.__name__)
     
     def get_all(self):
@@ -60,7 +79,14 @@ class FaceService(BaseService):
             raise
     
     def detect_faces(self, image_path):
-        """Detect faces in an image."""
+        """
+        Detect faces in an image for an interactive caller; only faces passing
+        the quality gate are returned.
+
+        Goes through the detection broker: a file the batch pipeline is already
+        detecting (or has just detected) is not detected again, and otherwise
+        the model is taken ahead of waiting batch work.
+        """
         try:
             import os
             from src.utils.document_util import DOCUMENT_EXTS
@@ -72,7 +98,14 @@ class FaceService(BaseService):
             if ext not in image_exts:
                 raise ValueError(f"Yüz tanıma bu dosya türü için desteklenmemektedir: {ext}")
 
-            return self.face_analysis_service.detect(image_path)
+            from src.utils.face_quality_util import QualityGate
+            gate = QualityGate.from_settings()
+            from src.services.face_result_cache import detection_signature
+            faces = self.detection_broker.detect(
+                [image_path], detection_signature(self.face_analysis_service.decode_max_side()),
+                lambda _: [self.face_analysis_service.detect(image_path)], interactive=True,
+            )[0]
+            return [face for face in faces if gate.passes(face)]
         except Exception as e:
             self.logger.error(f"Error detecting faces in {image_path}: {e}")
             raise
@@ -84,6 +117,35 @@ class FaceService(BaseService):
         except Exception as e:
             self.logger.error(f"Error detecting faces in frame array: {e}")
             raise
+
+    def detect_faces_batch(self, image_paths):
+        """Detect faces in several images with batched model calls (one result list per path)."""
+        try:
+            return self.face_analysis_service.detect_batch(list(image_paths))
+        except Exception as e:
+            self.logger.error(f"Error detecting faces in batch of {len(image_paths)} images: {e}")
+            raise
+
+    def detect_faces_from_arrays(self, imgs, sources=None):
+        """
+        Detect faces in several BGR numpy arrays (e.g., video frames) with batched model calls.
+
+        sources: optional file path per array, used to re-read reduced-resolution
+        decodes in full when they contain small faces.
+        """
+        try:
+            return self.face_analysis_service.detect_from_arrays(list(imgs), sources)
+        except Exception as e:
+            self.logger.error(f"Error detecting faces in {len(imgs)} frame arrays: {e}")
+            raise
+
+    def triage_faces_from_arrays(self, imgs):
+        """Coarse face-candidate check per small BGR array (two-stage detection mode)."""
+        try:
+            return self.face_analysis_service.triage_from_arrays(list(imgs))
+        except Exception as e:
+            self.logger.error(f"Error triaging {len(imgs)} arrays: {e}")
+            raise
     
     def recognize_faces(self, face_embeddings):
         """Recognize faces using embeddings."""
@@ -115,23 +177,140 @@ class FaceService(BaseService):
             # Validate that media_id is actually a UUID
             if not isinstance(media_id, uuid.UUID):
                 raise ValueError(f"Expected media_id to be a UUID, got {type(media_id)}")
-            return self.face_repository.save_faces(media_id, results)
+            ids = self.face_repository.save_faces(media_id, results)
+            self.match_index.remove_media(media_id)
+            return ids
         except Exception as e:
             self.logger.error(f"Error saving faces for media {media_id}: {e}")
             raise
 
-    def assign_person(self, face_id, person_id):
-        """Assign a person to a face detection."""
+    def save_faces_batch(self, items, assignments=None):
+        """
+        Save face detection results for several media items in one transaction.
+
+        assignments: optional person_id (or None) per face, parallel to items —
+        faces are stored already assigned and linked to their media.
+        """
+        try:
+            for media_id, _ in items:
+                if not isinstance(media_id, uuid.UUID):
+                    raise ValueError(f"Expected media_id to be a UUID, got {type(media_id)}")
+            all_ids = self.face_repository.save_faces_batch(items, assignments)
+            for media_id, _ in items:
+                self.match_index.remove_media(media_id)
+            if assignments is not None and self.match_index.loaded:
+                self._index_assigned_faces(items, assignments, all_ids)
+            return all_ids
+        except Exception as e:
+            self.logger.error(f"Error saving faces for {len(items)} media: {e}")
+            raise
+
+    def _index_assigned_faces(self, items, assignments, all_ids):
+        """Mirror the prototype trigger for faces inserted already assigned."""
+        assigned = [
+            (face_id, pid, face.embedding, media_id)
+            for (media_id, results), pids, ids in zip(items, assignments, all_ids)
+            for face, pid, face_id in zip(results, pids, ids)
+            if pid is not None
+        ]
+        if not assigned:
+            return
+        proto_idx = self.face_repository.get_prototype_indexes([a[0] for a in assigned])
+        for face_id, pid, embedding, media_id in assigned:
+            self.match_index.add_face(
+                pid, proto_idx.get(face_id), self.match_index.person_name(pid), embedding, media_id
+            )
+
+    def assign_person(self, face_id, person_id, auto: bool = False):
+        """Assign a person to a face detection (auto: by automatic matching, see rematch_faces)."""
         try:
-            return self.face_repository.assign_person(face_id, person_id)
+            updated = self.face_repository.assign_person(face_id, person_id, auto=auto)
+            if updated and self.match_index.loaded:
+                # Mirror the prototype trigger: leave the old prototype, join the new one
+                self.match_index.remove_face(
+                    updated["old_person_id"], updated["old_prototype_idx"], updated["embedding"]
+                )
+                name = self.match_index.person_name(person_id)
+                if name is None:
+                    person = self.person_repository.get_by_id(person_id)
+                    name = person["name"] if person else None
+                self.match_index.add_face(
+                    person_id, updated["prototype_idx"], name, updated["embedding"], updated["media_id"]
+                )
         except Exception as e:
             self.logger.error(f"Error assigning person {person_id} to face {face_id}: {e}")
             raise
 
+    def assign_person_bulk(self, face_ids, person_id, chunk_size: int = BULK_ASSIGN_CHUNK, on_progress=None,
+                           auto: bool = False) -> int:
+        """
+        Assign many faces to a person and link their media, one transaction per chunk.
+
+        Args:
+            on_progress: Called as on_progress(done, total) after every chunk.
+            auto: As in assign_person.
+
+        Returns:
+            Number of faces assigned.
+        """
+        try:
+            face_ids = list(face_ids)
+            total = len(face_ids)
+            name = None
+            assigned = 0
+            for start in range(0, total, chunk_size):
+                track = self.match_index.loaded
+                updated = self.face_repository.assign_person_bulk(
+                    face_ids[start:start + chunk_size], person_id, with_embeddings=track, auto=auto
+                )
+                if track:
+                    if name is None:
+                        name = self.match_index.person_name(person_id)
+                    if name is None:
+                        person = self.person_repository.get_by_id(person_id)
+                        name = person["name"] if person else None
+                    for face in updated:
+                        self.match_index.remove_face(
+                            face["old_person_id"], face["old_prototype_idx"], face["embedding"]
+                        )
+                        self.match_index.add_face(
+                            person_id, face["prototype_idx"], name, face["embedding"], face["media_id"]
+                        )
+                assigned += len(updated)
+                if on_progress:
+                    on_progress(min(start + chunk_size, total), total)
+            return assigned
+        except Exception as e:
+            self.logger.error(f"Error bulk-assigning {len(face_ids)} faces to person {person_id}: {e}")
+            raise
+
+    def get_cached_faces(self, content_hash: str, signature: str):
+        """Cached FaceResult list for this file content and detection signature, or None."""
+        from src.services.face_result_cache import unpack_results
+        try:
+            data = self.face_repository.get_cached_detections(content_hash, signature)
+            return unpack_results(data) if data is not None else None
+        except Exception as e:
+            self.logger.error(f"Error reading detection cache for {content_hash}: {e}")
+            raise
+
+    def cache_faces(self, entries):
+        """Store detection results as (content_hash, signature, FaceResult list) entries."""
+        from src.services.face_result_cache import pack_results
+        try:
+            self.face_repository.save_cached_detections([
+                (content_hash, signature, pack_results(results), len(results))
+                for content_hash, signature, results in entries
+            ])
+        except Exception as e:
+            self.logger.error(f"Error writing {len(entries)} detection cache entries: {e}")
+            raise
+
     def delete_faces_for_media(self, media_id):
         """Delete all face detections for a media item."""
         try:
-            return self.face_repository.delete_faces_for_media(media_id)
+            self.face_repository.delete_faces_for_media(media_id)
+            self.match_index.remove_media(media_id)
         except Exception as e:
             self.logger.error(f"Error deleting faces for media {media_id}: {e}")
             raise
@@ -139,23 +318,348 @@ class FaceService(BaseService):
     def clear_person_for_face(self, face_id):
         """Clear person assignment from a single face detection row."""
         try:
-            return self.face_repository.clear_person_for_face(face_id)
+            cleared = self.face_repository.clear_person_for_face(face_id)
+            if cleared:
+                self.match_index.remove_face(
+                    cleared["old_person_id"], cleared["old_prototype_idx"], cleared["embedding"]
+                )
         except Exception as e:
             self.logger.error(f"Error clearing person for face {face_id}: {e}")
             raise
 
+    def _load_match_index(self):
+        return self.person_repository.get_prototypes(), self.face_repository.get_labelled_media_ids()
+
     def find_similar_person(self, embedding) -> tuple:
-        """Find closest matching person for a face embedding via pgvector similarity."""
+        """Find closest matching person for a face embedding via the in-memory prototype index."""
+        return self.find_similar_persons([embedding])[0]
+
+    @staticmethod
+    def match_threshold() -> float:
+        """Cosine distance below which a face matches a person ("face_match_threshold")."""
+        from src.utils import config_util
+        return float(config_util.get_setting("face_match_threshold", MATCH_THRESHOLD) or MATCH_THRESHOLD)
+
+    def find_similar_persons(self, embeddings) -> list[tuple]:
+        """Find the closest matching person for each embedding with one vectorised search."""
         try:
-            return self.face_repository.find_similar_person(embedding)
+            self.match_index.ensure_loaded(self._load_match_index)
+            return self.match_index.best_matches(list(embeddings), threshold=self.match_threshold())
         except Exception as e:
-            self.logger.error(f"Error finding similar person: {e}")
+            self.logger.error(f"Error finding similar persons for {len(embeddings)} embeddings: {e}")
             raise
 
-    def find_unassigned_faces_matching(self, embedding, threshold: float = 0.5) -> list:
-        """Return all unassigned face_detections matching the given embedding."""
+    def find_unassigned_faces_matching(self, embedding, threshold: float | None = None) -> list:
+        """
+        Return all unassigned face_detections matching the given embedding
+        (default: match_threshold()), closest first; used by the person scan
+        background job. Index-backed, with an exact scan only when the matches
+        outnumber the index candidates (FaceRepository.find_unassigned_faces_matching).
+        """
         try:
+            if threshold is None:
+                threshold = self.match_threshold()
             return self.face_repository.find_unassigned_faces_matching(embedding, threshold)
         except Exception as e:
             self.logger.error(f"Error finding unassigned faces matching embedding: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def cluster_unassigned_faces_if_due(self) -> dict | None:
+        """
+        Incremental clustering after a detection job, only once at least
+        "face_cluster_min_new_faces" faces no run has seen are waiting; the
+        clusters dialog runs it on demand regardless.
+
+        Returns:
+            The cluster_unassigned_faces() stats, or None when it was not due.
+        """
+        from src.utils import config_util
+        try:
+            due = max(1, int(config_util.get_setting("face_cluster_min_new_faces", 200) or 0))
+            unseen = self.face_repository.count_unseen_unassigned_faces()
+        except Exception as e:
+            self.logger.error(f"Error counting unclustered faces: {e}")
+            raise
+        if unseen < due:
+            return None
+        return self.cluster_unassigned_faces()
+
+    def cluster_unassigned_faces(self, full: bool = False) -> dict:
+        """
+        Group unassigned faces into clusters for bulk naming.
+
+        Incremental by default: faces no run has seen yet join the nearest stored
+        cluster centroid (face_clusters), and the rest are clustered together with
+        the leftovers of earlier runs that lie near them (found through the
+        unassigned ANN index), so faces of a new person arriving in different
+        batches can still form a cluster while leftovers no new face came near are
+        not read again. A full run re-clusters every unassigned face; it also
+        happens automatically when there are no clusters yet or the faces no run
+        has seen exceed RECLUSTER_FRACTION of the already-clustered ones.
+
+        Returns:
+            Dict with mode ("full"/"incremental"), faces, clusters and duration_ms.
+        """
+        import time
+        import numpy as np
+        from src.services import face_clustering
+
+        t0 = time.monotonic()
+        try:
+            cluster_ids = counts = sums = None
+            if not full:
+                cluster_ids, counts, sums = self.face_repository.get_cluster_centroids()
+                if len(cluster_ids) == 0 or \
+                        self.face_repository.count_unseen_unassigned_faces() > RECLUSTER_FRACTION * counts.sum():
+                    full = True
+                else:
+                    face_ids, vectors = self.face_repository.load_unassigned_embeddings("unseen")
+            if full:
+                face_ids, vectors = self.face_repository.load_unassigned_embeddings()
+            vectors = face_clustering.normalise(vectors)
+
+            assigned = np.zeros(len(face_ids), dtype="V16")  # all-zero = no cluster
+            rest = np.arange(len(face_ids))
+            if not full and len(face_ids):
+                nearest = face_clustering.attach_to_centroids(vectors, face_clustering.normalise(sums))
+                hit = nearest >= 0
+                assigned[hit] = cluster_ids[nearest[hit]]
+                rest = np.where(~hit)[0]
+                if len(rest):
+                    if self.face_repository.unassigned_ann_index_ready():
+                        near_ids, near_vectors = self.face_repository.find_leftover_neighbours(
+                            face_ids[rest], face_clustering.KNN_K, face_clustering.CLUSTER_MAX_DISTANCE
+                        )
+                    else:
+                        self.logger.warning(
+                            "Unassigned-faces ANN index missing: clustering reads every leftover face",
+                            extra={"event": "FACE_CLUSTER_NO_INDEX"},
+                        )
+                        near_ids, near_vectors = self.face_repository.load_unassigned_embeddings("leftovers")
+                    rest = np.concatenate([rest, np.arange(len(face_ids), len(face_ids) + len(near_ids))])
+                    face_ids = np.concatenate([face_ids, near_ids])
+                    vectors = np.vstack([vectors, face_clustering.normalise(near_vectors)])
+                    assigned = np.concatenate([assigned, np.zeros(len(near_ids), dtype="V16")])
+
+            labels = face_clustering.cluster_embeddings(vectors[rest])
+            n_new = int(labels.max()) + 1 if len(labels) else 0
+            new_ids = np.array([uuid.uuid4().bytes for _ in range(n_new)], dtype="V16")
+            found = labels >= 0
+            assigned[rest[found]] = new_ids[labels[found]]
+
+            centroids = None
+            if full:
+                # A full run replaces the stored centroids outright
+                new_sums = np.zeros((n_new, vectors.shape[1]), np.float32)
+                np.add.at(new_sums, labels[found], vectors[rest[found]])
+                centroids = (new_ids, np.bincount(labels[found], minlength=n_new), new_sums)
+            self.face_repository.save_face_clusters(face_ids, assigned, reset=full, centroids=centroids)
+            stats = {
+                "mode": "full" if full else "incremental",
+                "faces": int(len(face_ids)),
+                "clusters": n_new + (0 if full else int(len(cluster_ids))),
+                "duration_ms": int((time.monotonic() - t0) * 1000),
+            }
+            self.logger.info(
+                f"Face clustering ({stats['mode']}): {stats['faces']} faces, {stats['clusters']} clusters",
+                extra={"event": "FACE_CLUSTER", "duration_ms": stats["duration_ms"]},
+            )
+            return stats
+        except Exception as e:
+            self.logger.error(f"Error clustering unassigned faces: {e}")
+            raise
+
+    def reembed_faces(self, restart: bool = False, batch_size: int = REEMBED_BATCH,
+                      on_progress=None, should_stop=None) -> dict:
+        """
+        Recompute stored face embeddings from their stored chips with the
+        current recognition model — no image decoding or detection.
+
+        Chips are read in face_id order, batch_size per round trip, and embedded
+        in REC_BATCH_SIZE forward passes; each batch's embeddings and the job
+        checkpoint are written in one transaction, so an interrupted run resumes
+        after the last finished batch unless restart is set. Faces without a
+        chip keep their embedding.
+
+        Args:
+            on_progress: Optional callable(done, total).
+            should_stop: Optional callable returning True to stop after the current batch.
+
+        Returns:
+            Dict with faces (re-embedded this run), total, resumed, finished and duration_ms.
+        """
+        import time
+        t0 = time.monotonic()
+        try:
+            checkpoint = None if restart else self.face_repository.get_job_checkpoint(REEMBED_JOB)
+            after = uuid.UUID(checkpoint["position"]) if checkpoint else None
+            done = checkpoint["processed"] if checkpoint else 0
+            total = done + self.face_repository.count_face_chips(after)
+            faces = 0
+            finished = False
+            while True:
+                if should_stop is not None and should_stop():
+                    break
+                rows = self.face_repository.load_face_chips(after, batch_size)
+                if not rows:
+                    finished = True
+                    break
+                face_ids, chips = [], []
+                for face_id, data in rows:
+                    chip = self.face_analysis_service.decode_chip(data)
+                    if chip is None:
+                        self.logger.warning(f"Unreadable face chip for face {face_id}; embedding kept")
+                        continue
+                    face_ids.append(face_id)
+                    chips.append(chip)
+                embeddings = self.face_analysis_service.embed_chips(chips)
+                after = rows[-1][0]
+                done += len(rows)
+                faces += len(face_ids)
+                self.face_repository.save_reembedded(REEMBED_JOB, face_ids, embeddings, after, done)
+                if on_progress:
+                    on_progress(done, total)
+
+            if finished:
+                self.face_repository.delete_job_checkpoint(REEMBED_JOB)
+            if faces:
+                self.match_index.invalidate()
+            stats = {
+                "faces": faces,
+                "total": total,
+                "resumed": checkpoint is not None,
+                "finished": finished,
+                "duration_ms": int((time.monotonic() - t0) * 1000),
+            }
+            self.logger.info(
+                f"Face re-embedding: {faces} faces ({done}/{total}, finished={finished})",
+                extra={"event": "FACE_REEMBED", "duration_ms": stats["duration_ms"]},
+            )
+            return stats
+        except Exception as e:
+            self.logger.error(f"Error re-embedding faces from stored chips: {e}")
+            raise
+
+    def rematch_faces(self, threshold: float | None = None, restart: bool = False, page_size: int = REMATCH_PAGE,
+                      include_legacy: bool = False, on_progress=None, should_stop=None) -> dict:
+        """
+        Recompute automatic person assignments across the archive, e.g. after
+        changing the match threshold or the recognition model.
+
+        Candidates are faces assigned by automatic matching (person_auto) and
+        unassigned faces passing the quality gate; faces the user assigned or
+        cleared are never touched. Assignments made before person_auto existed
+        carry it unset like the user's own, so they are only revised with
+        include_legacy, which makes every non-cleared assignment a candidate
+        (an explicit one-off for archives labelled before the upgrade). They are read in face_id order, page_size per
+        binary COPY, and matched against the prototype index REMATCH_CHUNK at a
+        time with one matmul each (PersonMatchIndex.rematch, leave-one-out for
+        the face's own prototype). Only faces whose person changes are written,
+        together with the job checkpoint in one transaction per page, so an
+        interrupted run resumes after the last finished page unless restart is
+        set. Matching runs against the prototypes as loaded at the start; the
+        index is reloaded once the run has changed anything.
+
+        Args:
+            threshold: Cosine distance limit (default: match_threshold()).
+            include_legacy: Also re-match assigned faces without person_auto;
+                            pass it again when resuming such a run.
+            on_progress: Optional callable(done, total).
+            should_stop: Optional callable returning True to stop after the current page.
+
+        Returns:
+            Dict with faces (examined this run), assigned, moved, unassigned,
+            total, resumed, finished and duration_ms.
+        """
+        import time
+        t0 = time.monotonic()
+        if threshold is None:
+            threshold = self.match_threshold()
+        nil = np.void(bytes(16))
+        try:
+            checkpoint = None if restart else self.face_repository.get_job_checkpoint(REMATCH_JOB)
+            after = uuid.UUID(checkpoint["position"]) if checkpoint else None
+            done = checkpoint["processed"] if checkpoint else 0
+            total = done + self.face_repository.count_rematch_candidates(after, include_legacy)
+            stats = {"faces": 0, "assigned": 0, "moved": 0, "unassigned": 0}
+            finished = False
+            while True:
+                if should_stop is not None and should_stop():
+                    break
+                rows = self.face_repository.load_rematch_candidates(after, page_size, include_legacy)
+                if len(rows) == 0:
+                    finished = True
+                    break
+                vecs = rows["vec"].astype(np.float32)
+                current = rows["pid"]
+                own_keys = [
+                    (uuid.UUID(bytes=bytes(pid)), int(idx)) if idx >= 0 and pid != nil else None
+                    for pid, idx in zip(current, rows["idx"])
+                ]
+                matched = []
+                for start in range(0, len(rows), REMATCH_CHUNK):
+                    self.match_index.ensure_loaded(self._load_match_index)
+                    matched.extend(self.match_index.rematch(
+                        vecs[start:start + REMATCH_CHUNK], own_keys[start:start + REMATCH_CHUNK], threshold
+                    ))
+                new = np.array([pid.bytes if pid else bytes(16) for pid in matched], dtype="V16")
+                changed = new != current
+                was_set, now_set = current[changed] != nil, new[changed] != nil
+                after = uuid.UUID(bytes=bytes(rows["id"][-1]))
+                done += len(rows)
+                stats["faces"] += len(rows)
+                stats["assigned"] += int(np.count_nonzero(~was_set & now_set))
+                stats["moved"] += int(np.count_nonzero(was_set & now_set))
+                stats["unassigned"] += int(np.count_nonzero(was_set & ~now_set))
+                self.face_repository.apply_rematch(
+                    REMATCH_JOB, rows["id"][changed], new[changed], after, done, include_legacy
+                )
+                if on_progress:
+                    on_progress(done, total)
+
+            if finished:
+                self.face_repository.delete_job_checkpoint(REMATCH_JOB)
+            if stats["assigned"] or stats["moved"] or stats["unassigned"]:
+                self.match_index.invalidate()
+            stats.update({
+                "total": total,
+                "resumed": checkpoint is not None,
+                "finished": finished,
+                "duration_ms": int((time.monotonic() - t0) * 1000),
+            })
+            self.logger.info(
+                f"Face re-matching (threshold {threshold}): {stats['faces']} faces, "
+                f"{stats['assigned']} assigned, {stats['moved']} moved, {stats['unassigned']} unassigned "
+                f"({done}/{total}, finished={finished})",
+                extra={"event": "FACE_REMATCH", "duration_ms": stats["duration_ms"]},
+            )
+            return stats
+        except Exception as e:
+            self.logger.error(f"Error re-matching faces: {e}")
+            raise
+
+    def get_face_clusters(self, min_size: int = 1, limit: int = 500) -> list:
+        """Current clusters of unassigned faces, largest first."""
+        try:
+            return self.face_repository.get_face_clusters(min_size, limit)
+        except Exception as e:
+            self.logger.error(f"Error getting face clusters: {e}")
+            raise
+
+    def name_cluster(self, cluster_id, person_id) -> int:
+        """Assign every face of a cluster to a person in one operation; returns the face count."""
+        try:
+            faces = self.face_repository.name_cluster(cluster_id, person_id)
+            if faces and self.match_index.loaded:
+                name = self.match_index.person_name(person_id)
+                if name is None:
+                    person = self.person_repository.get_by_id(person_id)
+                    name = person["name"] if person else None
+                for face in faces:
+                    self.match_index.add_face(
+                        person_id, face["prototype_idx"], name, face["embedding"], face["media_id"]
+                    )
+            return len(faces)
+        except Exception as e:
+            self.logger.error(f"Error naming cluster {cluster_id} as person {person_id}: {e}")
+            raise
@@ -0,0 +1,123 @@
+"""
+face_tracker — collapse per-key-frame video face detections into face tracks.
+
+Video key frames are sampled about a second apart, so one speaker yields a
+detection in nearly every frame. track_faces() links detections of consecutive
+frames into tracks:
+- candidates are scored by embedding cosine similarity plus TRACK_IOU_WEIGHT ×
+  bbox IoU against the track's last box; a pair is linked when the faces
+  overlap (IoU >= TRACK_MIN_IOU) and look alike (similarity >= TRACK_MIN_SIM),
+  or — after a cut or a jump — when they look clearly alike on their own
+  (similarity >= TRACK_REID_SIM)
+- assignment per frame is greedy by score, one detection per track
+- a track not seen for TRACK_MAX_GAP_MS is closed
+
+Each track becomes one FaceResult: its best detection (largest face × score)
+with that detection's own bbox, score, timestamp, chip and embedding, plus the
+track's first/last timestamps in track_start_ms / track_end_ms. Recognition and
+storage then run once per track. The members' mean embedding only links
+detections; it is not stored, because the stored chip is the best frame's and
+re-embedding from chips (FaceService.reembed_faces) must reproduce the stored
+vector rather than replace a mean with a single frame.
+"""
+from __future__ import annotations
+from dataclasses import replace
+
+import numpy as np
+
+from src.services.face_analysis_service import FaceResult
+
+TRACK_MIN_IOU = 0.3
+TRACK_MIN_SIM = 0.35       # cosine similarity (1 - distance), with overlapping boxes
+TRACK_REID_SIM = 0.55      # cosine similarity alone, for faces that moved or reappeared
+TRACK_IOU_WEIGHT = 0.5
+TRACK_MAX_GAP_MS = 10_000
+
+
+def _unit(embedding) -> np.ndarray | None:
+    if embedding is None:
+        return None
+    vec = np.asarray(embedding, dtype=np.float64).reshape(-1)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else None
+
+
+def _iou(a: FaceResult, b: FaceResult) -> float:
+    ix = max(0.0, min(a.x2, b.x2) - max(a.x1, b.x1))
+    iy = max(0.0, min(a.y2, b.y2) - max(a.y1, b.y1))
+    inter = ix * iy
+    union = (a.x2 - a.x1) * (a.y2 - a.y1) + (b.x2 - b.x1) * (b.y2 - b.y1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _quality(face: FaceResult) -> float:
+    return max(0.0, (face.x2 - face.x1) * (face.y2 - face.y1)) * face.score
+
+
+class _Track:
+    __slots__ = ("last", "last_ms", "start_ms", "best", "emb_sum")
+
+    def __init__(self, face: FaceResult, tms: float, unit: np.ndarray | None):
+        self.last = face
+        self.best = face
+        self.start_ms = self.last_ms = tms
+        self.emb_sum = unit.copy() if unit is not None else None
+
+    def add(self, face: FaceResult, tms: float, unit: np.ndarray | None) -> None:
+        self.last, self.last_ms = face, tms
+        if _quality(face) > _quality(self.best):
+            self.best = face
+        if unit is not None:
+            self.emb_sum = unit.copy() if self.emb_sum is None else self.emb_sum + unit
+
+    def centroid(self) -> np.ndarray | None:
+        return _unit(self.emb_sum) if self.emb_sum is not None else None
+
+    def result(self) -> FaceResult:
+        return replace(self.best, track_start_ms=self.start_ms, track_end_ms=self.last_ms)
+
+
+def track_faces(frames: list[tuple[float, list[FaceResult]]]) -> list[FaceResult]:
+    """
+    Link per-frame detections into tracks.
+
+    Args:
+        frames: (timestamp_ms, detections of that frame) in time order; each
+                detection's timestamp_ms is taken from the frame.
+
+    Returns:
+        One representative FaceResult per track, ordered by track start.
+    """
+    active: list[_Track] = []
+    closed: list[_Track] = []
+    for tms, faces in frames:
+        still = []
+        for track in active:
+            (still if tms - track.last_ms <= TRACK_MAX_GAP_MS else closed).append(track)
+        active = still
+
+        units = [_unit(f.embedding) for f in faces]
+        centroids = [t.centroid() for t in active]
+        candidates = []
+        for i, (face, unit) in enumerate(zip(faces, units)):
+            for j, (track, centroid) in enumerate(zip(active, centroids)):
+                sim = float(unit @ centroid) if unit is not None and centroid is not None else 0.0
+                iou = _iou(face, track.last)
+                if (iou >= TRACK_MIN_IOU and sim >= TRACK_MIN_SIM) or sim >= TRACK_REID_SIM:
+                    candidates.append((sim + TRACK_IOU_WEIGHT * iou, i, j))
+
+        used_faces, used_tracks = set(), set()
+        for _, i, j in sorted(candidates, reverse=True):
+            if i in used_faces or j in used_tracks:
+                continue
+            used_faces.add(i)
+            used_tracks.add(j)
+            faces[i].timestamp_ms = tms
+            active[j].add(faces[i], tms, units[i])
+        for i, (face, unit) in enumerate(zip(faces, units)):
+            if i not in used_faces:
+                face.timestamp_ms = tms
+                active.append(_Track(face, tms, unit))
+
+    tracks = sorted(closed + active, key=lambda t: t.start_ms)
+    return [t.result() for t in tracks]
@@ -3,6 +3,7 @@
 from src.services.base_service import BaseService
 from src.repositories.media_repository import MediaRepository
 from src.repositories.event_repository import EventRepository
+from src.services.person_match_index import PersonMatchIndex
 import logging
 import os
 from src.utils import path_util
@@ -59,7 +60,9 @@ class MediaService(BaseService):
     def delete(self, media_id, file_path=None):
         """Delete media record, vault file, and thumbnail."""
         try:
-            return self.media_repository.delete(media_id, file_path)
+            self.media_repository.delete(media_id, file_path)
+            # Labelled faces of this media were removed by ON DELETE CASCADE
+            PersonMatchIndex().remove_media(media_id)
         except Exception as e:
             self.logger.error(f"Error deleting media {media_id}: {e}")
             raise
@@ -169,6 +172,14 @@ class MediaService(BaseService):
             self.logger.error(f"Error marking face detected for media {media_id}: {e}")
             raise
 
+    def mark_face_detected_many(self, media_ids):
+        """Mark face detection as completed for several media records at once."""
+        try:
+            return self.media_repository.mark_face_detected_many(media_ids)
+        except Exception as e:
+            self.logger.error(f"Error marking face detected for {len(media_ids)} media: {e}")
+            raise
+
     def get_file_paths_for_event(self, event_id):
         """Get all file paths for a given event."""
         try:
@@ -10,18 +10,36 @@ Why Ollama:
 - `think` parameter enables silent chain-of-thought reasoning; the final
   `response` field stays a clean JSON object while internal reasoning is
   returned separately (and dropped).
+
+Concurrency: submit() queues an image and returns a Future. Images are
+resized and base64-encoded ahead on a small prep pool while up to `parallel`
+/api/generate requests are in flight (match the server's OLLAMA_NUM_PARALLEL;
+extra requests would only queue inside Ollama). Each image still gets its
+own CaptionResult with its own error, and analyse_batch() returns them in
+input order.
+
+Streaming ("caption_ollama_stream"): the response is read token by token
+(CaptionStreamParser); as soon as a complete {caption_tr, tags_tr} object has
+arrived the connection is closed, which makes Ollama stop generating, so a
+model that keeps talking after the JSON does not run on to num_predict. The
+caption streamed so far is passed to the caller's on_partial callback.
 """
 from __future__ import annotations
 import base64
 import io
+import json
 import logging
 import os
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import requests
 
 from src.domain.entities.caption_result import CaptionResult
-from src.services.caption_parsing import get_combined_prompt, parse_combined_response, CAPTION_JSON_SCHEMA
+from src.services.caption_parsing import (
+    get_combined_prompt, parse_combined_response, CaptionStreamParser, CAPTION_JSON_SCHEMA,
+)
 from src.services.caption_service import CaptionService  # reuse _prepare_image staticmethod
 
 logger = logging.getLogger(__name__)
@@ -38,6 +56,9 @@ class OllamaCaptionService:
     # Lower this (e.g. 768) on 8GB GPUs to avoid OOM when thinking mode is on.
     MAX_SIDE_PX = 1024
 
+    # Minimum seconds between two on_partial calls for the same image
+    PARTIAL_INTERVAL = 0.3
+
     # NOTE on `thinking`: Gemma4 in Ollama think-mode treats structured-output
     # prompts (with explicit OUTPUT FORMAT examples) as a "thinking task" and
     # never emits the final answer in the `response` field. It produces good
@@ -50,17 +71,34 @@ class OllamaCaptionService:
         url: str = "http://localhost:11434",
         thinking: bool = False,
         timeout: int = 300,
+        parallel: int = 1,
+        stream: bool = False,
     ):
         self._model = model
         self._url = url.rstrip("/")
         self._thinking = thinking
         self._timeout = timeout
-        self._session = requests.Session()
-        self._session.verify = False  # match project-wide SSL bypass policy
+        self.parallel = max(1, int(parallel or 1))
+        self._stream = stream
+        self._local = threading.local()  # one requests.Session per thread
+        self._pool_lock = threading.Lock()
+        self._prep_pool: ThreadPoolExecutor | None = None
+        self._request_pool: ThreadPoolExecutor | None = None
         logger.info(
-            f"OllamaCaptionService init model={model} url={url} thinking={thinking}"
+            f"OllamaCaptionService init model={model} url={url} thinking={thinking} "
+            f"parallel={self.parallel} stream={stream}"
         )
 
+    @property
+    def _session(self) -> requests.Session:
+        """The calling thread's session (requests.Session is not thread-safe)."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.verify = False  # match project-wide SSL bypass policy
+            self._local.session = session
+        return session
+
     def is_ready(self) -> bool:
         """Probe Ollama for the model. Returns True if reachable AND model present."""
         try:
@@ -91,6 +129,42 @@ class OllamaCaptionService:
         pil.save(buf, "JPEG", quality=90)
         return base64.b64encode(buf.getvalue()).decode("ascii")
 
+    def _pools(self) -> tuple[ThreadPoolExecutor, ThreadPoolExecutor]:
+        """(prep pool, request pool), created on first use."""
+        with self._pool_lock:
+            if self._request_pool is None:
+                self._prep_pool = ThreadPoolExecutor(
+                    max_workers=min(self.parallel, os.cpu_count() or 1), thread_name_prefix="ollama-prep"
+                )
+                self._request_pool = ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix="ollama-request")
+            return self._prep_pool, self._request_pool
+
+    def _prepare(self, img_path: str) -> tuple[str | None, str | None, float]:
+        """(base64 JPEG, error message, seconds) — never raises."""
+        start = time.perf_counter()
+        try:
+            return self._image_to_b64(img_path), None, time.perf_counter() - start
+        except Exception as e:
+            return None, f"Resim hazırlanamadı: {e}", time.perf_counter() - start
+
+    def submit(self, img_path: str, person_names: list[str] = None, on_partial=None) -> Future:
+        """Queue one image; the Future resolves to its CaptionResult (errors included, never raised).
+
+        on_partial(img_path, caption_so_far) is called from a request thread
+        while a streamed response arrives.
+        """
+        prep_pool, request_pool = self._pools()
+        prepared = prep_pool.submit(self._prepare, img_path)
+        return request_pool.submit(self._analyse_queued, img_path, prepared, person_names, on_partial)
+
+    def _analyse_queued(self, img_path: str, prepared: Future, person_names: list[str] = None,
+                        on_partial=None) -> CaptionResult:
+        try:
+            return self._analyse_prepared(img_path, prepared, person_names, on_partial)
+        except Exception as e:
+            logger.error(f"OllamaCaptionService.analyse error for {img_path}: {e}")
+            return CaptionResult(img_path=img_path, error=str(e))
+
     def analyse(self, img_path: str, person_names: list[str] = None) -> CaptionResult:
         """Single-image captioning. Blocking — call from a QThread worker.
 
@@ -98,14 +172,30 @@ class OllamaCaptionService:
         populated. caption_en and tags_en stay empty (Turkish-only output,
         matching the Qwen backend's behavior).
         """
-        result = CaptionResult(img_path=img_path)
-        full_start = time.perf_counter()
+        return self._analyse_prepared(img_path, self._prepare(img_path), person_names)
 
-        try:
-            b64 = self._image_to_b64(img_path)
-        except Exception as e:
-            result.error = f"Resim hazırlanamadı: {e}"
+    def analyse_batch(self, img_paths: list[str], person_names_list: list | None = None) -> list[CaptionResult]:
+        """Caption several images with up to `parallel` requests in flight; results in input order."""
+        if person_names_list is None:
+            person_names_list = [None] * len(img_paths)
+        futures = [self.submit(p, names) for p, names in zip(img_paths, person_names_list)]
+        return [f.result() for f in futures]
+
+    def _analyse_prepared(self, img_path: str, prepared, person_names: list[str] = None,
+                          on_partial=None) -> CaptionResult:
+        """Run /api/generate for one prepared image. prepared is a _prepare() result or a Future of one.
+
+        duration covers the image preparation and the request, not the time
+        spent waiting for a free request slot.
+        """
+        result = CaptionResult(img_path=img_path)
+        if isinstance(prepared, Future):
+            prepared = prepared.result()
+        b64, error, prep_seconds = prepared
+        if error:
+            result.error = error
             return result
+        full_start = time.perf_counter()
 
         prompt = get_combined_prompt(person_names)
 
@@ -113,7 +203,7 @@ class OllamaCaptionService:
             "model": self._model,
             "prompt": prompt,
             "images": [b64],
-            "stream": False,
+            "stream": self._stream,
             "think": self._thinking,
             "format": CAPTION_JSON_SCHEMA,
             "options": {
@@ -126,17 +216,18 @@ class OllamaCaptionService:
         try:
             gen_start = time.perf_counter()
             r = self._session.post(
-                f"{self._url}/api/generate", json=payload, timeout=self._timeout
+                f"{self._url}/api/generate", json=payload, timeout=self._timeout, stream=self._stream
             )
             if r.status_code == 400 and "format" in payload:
                 # Maybe older Ollama version that doesn't support JSON Schema? Try falling back to "json"
                 logger.warning("Ollama returned 400, retrying with format='json'")
+                r.close()
                 payload["format"] = "json"
                 r = self._session.post(
-                    f"{self._url}/api/generate", json=payload, timeout=self._timeout
+                    f"{self._url}/api/generate", json=payload, timeout=self._timeout, stream=self._stream
                 )
             r.raise_for_status()
-            data = r.json()
+            data = self._read_stream(r, img_path, on_partial) if self._stream else r.json()
             gen_ms = int((time.perf_counter() - gen_start) * 1000)
         except Exception as e:
             logger.error(f"OllamaCaptionService HTTP error for {img_path}: {e}")
@@ -153,7 +244,8 @@ class OllamaCaptionService:
             logger.info("OllamaCaptionService: response empty, falling back to thinking blob")
         logger.info(
             f"OllamaCaptionService: gen {gen_ms}ms model={self._model} "
-            f"thinking_len={len(thinking_blob)} response_len={len(raw)}",
+            f"thinking_len={len(thinking_blob)} response_len={len(raw)}"
+            + (" stopped after JSON" if data.get("stopped_early") else ""),
             extra={"event": "CAPTION_RESULT", "duration_ms": gen_ms},
         )
 
@@ -172,10 +264,43 @@ class OllamaCaptionService:
                 os.path.basename(img_path),
             )
 
-        result.duration = time.perf_counter() - full_start
+        result.duration = prep_seconds + time.perf_counter() - full_start
         saved = "yes" if result.caption_tr else "no"
         logger.info(
             f"OllamaCaptionService: analysis done {os.path.basename(img_path)} "
             f"{result.duration:.2f}s | saved={saved}"
         )
         return result
+
+    def _read_stream(self, r: requests.Response, img_path: str, on_partial=None) -> dict:
+        """Collect a streamed /api/generate response like the non-streamed one.
+
+        Stops reading (and closes the connection, cancelling the generation)
+        once the response holds a complete caption JSON object; sets
+        "stopped_early" in that case.
+        """
+        parser = CaptionStreamParser()
+        thinking = []
+        stopped_early = False
+        last_partial, last_call = "", 0.0
+        with r:
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                if chunk.get("thinking"):
+                    thinking.append(chunk["thinking"])
+                piece = chunk.get("response") or ""
+                if piece and parser.feed(piece) is not None:
+                    stopped_early = not chunk.get("done")
+                    break
+                if chunk.get("done"):
+                    break
+                if piece and on_partial is not None and time.monotonic() - last_call >= self.PARTIAL_INTERVAL:
+                    partial = parser.partial_caption()
+                    if partial and partial != last_partial:
+                        last_partial, last_call = partial, time.monotonic()
+                        on_partial(img_path, partial)
+        return {"response": parser.text, "thinking": "".join(thinking), "stopped_early": stopped_early}
@@ -0,0 +1,390 @@
+"""
+PersonMatchIndex — process-local, vectorised index of person prototypes.
+
+Replaces the per-face pgvector scan over person prototypes:
+- every person's prototypes (running centroids of unit-normalised labelled face
+  embeddings plus the reference embedding, see person_prototypes) are kept in one
+  contiguous, L2-normalised float32 matrix with a parallel person id array, so a
+  match scans N persons × a few prototypes instead of M labelled faces
+- a whole batch of query faces is answered with a single matmul (cosine distance
+  = 1 - dot product, same scale as pgvector's <=> operator)
+- FaceService / PersonService mirror the DB prototype triggers incrementally when
+  labels change (same sums and counts); bulk changes call invalidate() and the
+  next query reloads
+
+Loading is lazy: the first query pulls the prototypes from the DB through the
+loader passed to ensure_loaded(). Mutations while the index is not loaded are
+ignored — the load reads the committed state anyway.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+from uuid import UUID
+
+import numpy as np
+
+from src.repositories.person_repository import OUTLIER_MIN_FACES, OUTLIER_RADIUS_FACTOR
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+MATCH_THRESHOLD = 0.5   # cosine distance; default of the "face_match_threshold" setting
+_INITIAL_CAPACITY = 256
+
+
+def _as_uuid(value) -> UUID:
+    return value if isinstance(value, UUID) else UUID(str(value))
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _unit(embedding) -> np.ndarray:
+    vec = np.asarray(embedding, dtype=np.float64).reshape(-1)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else vec
+
+
+class PersonMatchIndex:
+    """
+    Singleton in-memory matching index. Thread-safe; shared by every service instance.
+
+    Rows are keyed by (person_id, prototype idx) and hold the prototype's running
+    sum and member count, from which the centroid row and outlier radius derive.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    inst = super().__new__(cls)
+                    inst._lock = threading.RLock()
+                    inst._loaded = False
+                    inst._generation = 0
+                    inst._reset()
+                    cls._instance = inst
+        return cls._instance
+
+    def _reset(self) -> None:
+        self._matrix = np.empty((_INITIAL_CAPACITY, EMBEDDING_DIM), dtype=np.float32)
+        self._counts = np.zeros(_INITIAL_CAPACITY, dtype=np.int64)
+        self._radius = np.zeros(_INITIAL_CAPACITY, dtype=np.float32)
+        self._size = 0
+        self._keys: list[tuple[UUID, int]] = []
+        self._person_ids: list[UUID] = []
+        self._sums: dict[tuple[UUID, int], np.ndarray] = {}   # float64 running sums
+        self._pos: dict[tuple[UUID, int], int] = {}           # key -> row
+        self._by_person: dict[UUID, set] = {}                 # person_id -> keys
+        self._names: dict[UUID, str] = {}
+        self._labelled_media: set[UUID] = set()
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return self._size
+
+    def ensure_loaded(self, loader) -> None:
+        """
+        Load the index on first use.
+
+        Args:
+            loader: Callable returning (prototypes, labelled_media_ids), where
+                    prototypes are dicts with keys person_id, idx, name,
+                    embedding_sum, face_count — see PersonRepository.get_prototypes.
+        """
+        if self._loaded:
+            return
+        for _ in range(3):
+            generation = self._generation
+            t0 = time.monotonic()
+            prototypes, labelled_media = loader()  # DB read outside the lock
+            with self._lock:
+                if self._loaded:
+                    return
+                if generation != self._generation:
+                    continue  # labels changed while reading; read again
+                self.load(prototypes, labelled_media)
+            logger.info(
+                f"PersonMatchIndex: loaded {self._size} prototypes",
+                extra={"event": "MATCH_INDEX_LOAD", "duration_ms": int((time.monotonic() - t0) * 1000)},
+            )
+            return
+        with self._lock:
+            self.load(*loader())
+
+    def load(self, prototypes, labelled_media=()) -> None:
+        """Replace the index contents (see ensure_loaded)."""
+        with self._lock:
+            self._reset()
+            for row in prototypes:
+                if row.get("embedding_sum") is None or not row.get("face_count"):
+                    continue
+                person_id = _as_uuid(row["person_id"])
+                key = (person_id, int(row["idx"]))
+                self._sums[key] = np.asarray(row["embedding_sum"], dtype=np.float64).reshape(-1)
+                self._set_row(key, int(row["face_count"]), row.get("name"))
+            self._labelled_media = {_as_uuid(m) for m in labelled_media}
+            self._loaded = True
+
+    def invalidate(self) -> None:
+        """Drop everything; the next query reloads from the DB."""
+        with self._lock:
+            self._reset()
+            self._loaded = False
+            self._generation += 1
+
+    # ------------------------------------------------------------------
+    # Incremental updates (mirror the person_prototypes triggers)
+    # ------------------------------------------------------------------
+
+    def add_face(self, person_id: UUID, idx: int | None, name: str | None, embedding,
+                 media_id: UUID | None = None) -> None:
+        """A face (or reference embedding) joined prototype idx of person_id."""
+        person_id = _as_uuid(person_id)
+        with self._lock:
+            self._generation += 1
+            if not self._loaded or idx is None or embedding is None:
+                return
+            key = (person_id, int(idx))
+            row = self._pos.get(key)
+            count = int(self._counts[row]) if row is not None else 0
+            self._sums[key] = self._sums.get(key, np.zeros(EMBEDDING_DIM)) + _unit(embedding)
+            self._set_row(key, count + 1, name)
+            if media_id is not None:
+                self._labelled_media.add(_as_uuid(media_id))
+
+    def remove_face(self, person_id: UUID | None, idx: int | None, embedding) -> None:
+        """A face left prototype idx of person_id (relabelled or cleared)."""
+        with self._lock:
+            self._generation += 1
+            if person_id is None or idx is None or embedding is None:
+                return
+            key = (_as_uuid(person_id), int(idx))
+            row = self._pos.get(key)
+            if row is None:
+                return
+            count = int(self._counts[row]) - 1
+            if count <= 0:
+                self._remove(key)
+                return
+            self._sums[key] = self._sums[key] - _unit(embedding)
+            self._set_row(key, count, None)
+
+    def remove_media(self, media_id: UUID) -> None:
+        """A media item's detections were deleted or replaced; reload if it had labelled faces."""
+        media_id = _as_uuid(media_id)
+        with self._lock:
+            self._generation += 1
+            if media_id in self._labelled_media:
+                self.invalidate()
+
+    def remove_person(self, person_id: UUID) -> None:
+        """Drop every prototype of a person (the person was deleted)."""
+        person_id = _as_uuid(person_id)
+        with self._lock:
+            self._generation += 1
+            for key in list(self._by_person.get(person_id, ())):
+                self._remove(key)
+            self._names.pop(person_id, None)
+
+    def rename_person(self, person_id: UUID, name: str) -> None:
+        person_id = _as_uuid(person_id)
+        with self._lock:
+            if person_id in self._names:
+                self._names[person_id] = name
+
+    def person_name(self, person_id: UUID) -> str | None:
+        with self._lock:
+            return self._names.get(_as_uuid(person_id))
+
+    def _set_row(self, key: tuple[UUID, int], count: int, name: str | None) -> None:
+        """Write the centroid, count and radius of key from its running sum."""
+        person_id = key[0]
+        total = self._sums[key]
+        norm = float(np.linalg.norm(total))
+        row = self._pos.get(key)
+        if row is None:
+            if self._size == len(self._matrix):
+                capacity = 2 * len(self._matrix)
+                grown = np.empty((capacity, EMBEDDING_DIM), dtype=np.float32)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+                self._counts = np.resize(self._counts, capacity)
+                self._radius = np.resize(self._radius, capacity)
+            row = self._size
+            self._size += 1
+            self._keys.append(key)
+            self._person_ids.append(person_id)
+            self._pos[key] = row
+            self._by_person.setdefault(person_id, set()).add(key)
+        self._matrix[row] = total / norm if norm > 0 else total
+        self._counts[row] = count
+        self._radius[row] = max(0.0, 1.0 - norm / count) if count else 0.0
+        if name is not None or person_id not in self._names:
+            self._names[person_id] = name
+
+    def _remove(self, key: tuple[UUID, int]) -> None:
+        row = self._pos.pop(key, None)
+        if row is None:
+            return
+        self._sums.pop(key, None)
+        self._by_person.get(key[0], set()).discard(key)
+
+        last = self._size - 1
+        if row != last:
+            # Swap the last row into the hole to keep the matrix contiguous
+            self._matrix[row] = self._matrix[last]
+            self._counts[row] = self._counts[last]
+            self._radius[row] = self._radius[last]
+            self._keys[row] = self._keys[last]
+            self._person_ids[row] = self._person_ids[last]
+            self._pos[self._keys[row]] = row
+        self._keys.pop()
+        self._person_ids.pop()
+        self._size -= 1
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def search(self, embeddings, k: int = 1, threshold: float = MATCH_THRESHOLD) -> list[list[tuple]]:
+        """
+        Top-k distinct persons per query embedding.
+
+        Args:
+            embeddings: (m, 512) array or sequence of 512-d vectors.
+            k: Maximum persons returned per query.
+            threshold: Only matches with cosine distance strictly below this (and
+                       within the prototype's outlier radius) are returned.
+
+        Returns:
+            One list per query of (person_id, name, distance), closest first.
+        """
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        if len(queries) == 0:
+            return []
+        queries = _normalise(queries)
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return [[] for _ in range(len(queries))]
+            dists = 1.0 - queries @ self._matrix[:n].T
+            limits = np.full(n, threshold, dtype=np.float32)
+            if OUTLIER_RADIUS_FACTOR > 0:
+                tight = (self._counts[:n] >= OUTLIER_MIN_FACES) & (self._radius[:n] > 0)
+                limits[tight] = np.minimum(threshold, OUTLIER_RADIUS_FACTOR * self._radius[:n][tight])
+            person_ids = list(self._person_ids)
+            names = dict(self._names)
+
+        # Rejected prototypes (outliers or beyond threshold) drop out entirely
+        dists = np.where(dists < limits, dists, np.inf)
+        take = min(n, max(1, k) * 8)
+        results = []
+        for row in dists:
+            if take < n:
+                idx = np.argpartition(row, take - 1)[:take]
+                idx = idx[np.argsort(row[idx], kind="stable")]
+            else:
+                idx = np.argsort(row, kind="stable")
+            hits, seen = [], set()
+            for j in idx:
+                dist = float(row[j])
+                if not np.isfinite(dist):
+                    break
+                pid = person_ids[j]
+                if pid in seen:
+                    continue
+                seen.add(pid)
+                hits.append((pid, names.get(pid), dist))
+                if len(hits) >= k:
+                    break
+            results.append(hits)
+        return results
+
+    def best_matches(self, embeddings, threshold: float = MATCH_THRESHOLD) -> list[tuple]:
+        """
+        Closest person per embedding; (None, None) for misses and for None entries.
+
+        Returns:
+            One (person_id | None, name | None) tuple per input, in order.
+        """
+        out: list[tuple] = [(None, None)] * len(embeddings)
+        present = [i for i, emb in enumerate(embeddings) if emb is not None]
+        if not present:
+            return out
+        hits = self.search(np.stack([np.asarray(embeddings[i], dtype=np.float32) for i in present]),
+                           k=1, threshold=threshold)
+        for i, h in zip(present, hits):
+            if h:
+                out[i] = (h[0][0], h[0][1])
+        return out
+
+    def rematch(self, embeddings, own_keys, threshold: float = MATCH_THRESHOLD) -> list:
+        """
+        Closest person per embedding for the re-matching job, leave-one-out.
+
+        A face that is already assigned is folded into one of its person's
+        prototypes; own_keys[i] names that (person_id, idx) and the face is
+        matched against the prototype as it would be without it (its unit vector
+        taken out of the sum, count and outlier radius), so a wrong automatic
+        assignment does not keep itself in place. A prototype made of only that
+        face is skipped.
+
+        Args:
+            embeddings: (m, 512) array of face embeddings.
+            own_keys: (person_id, prototype idx) or None per embedding.
+            threshold: Cosine distance limit, as in search().
+
+        Returns:
+            person_id or None per embedding, in order.
+        """
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        if len(queries) == 0:
+            return []
+        queries = _normalise(queries)
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return [None] * len(queries)
+            dists = 1.0 - queries @ self._matrix[:n].T
+            limits = np.full(n, threshold, dtype=np.float32)
+            if OUTLIER_RADIUS_FACTOR > 0:
+                tight = (self._counts[:n] >= OUTLIER_MIN_FACES) & (self._radius[:n] > 0)
+                limits[tight] = np.minimum(threshold, OUTLIER_RADIUS_FACTOR * self._radius[:n][tight])
+            dists = np.where(dists < limits, dists, np.inf)
+
+            own = np.array([self._pos.get((_as_uuid(k[0]), int(k[1])), -1) if k else -1 for k in own_keys])
+            faces = np.nonzero(own >= 0)[0]
+            if len(faces):
+                rows = own[faces]
+                q = queries[faces].astype(np.float64)
+                rest = np.stack([self._sums[self._keys[r]] for r in rows]) - q
+                norm = np.linalg.norm(rest, axis=1)
+                count = self._counts[rows] - 1
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    own_dist = 1.0 - np.einsum("ij,ij->i", q, rest) / norm
+                    own_radius = np.maximum(0.0, 1.0 - norm / count)
+                own_limit = np.full(len(faces), threshold)
+                if OUTLIER_RADIUS_FACTOR > 0:
+                    tight = (count >= OUTLIER_MIN_FACES) & (own_radius > 0)
+                    own_limit[tight] = np.minimum(threshold, OUTLIER_RADIUS_FACTOR * own_radius[tight])
+                keep = (count > 0) & (norm > 0) & (own_dist < own_limit)
+                dists[faces, rows] = np.where(keep, own_dist, np.inf)
+            person_ids = list(self._person_ids)
+
+        best = np.argmin(dists, axis=1)
+        found = np.isfinite(dists[np.arange(len(dists)), best])
+        return [person_ids[j] if ok else None for j, ok in zip(best, found)]
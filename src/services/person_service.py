@@ -3,6 +3,7 @@
 from src.services.base_service import BaseService
 from src.repositories.person_repository import PersonRepository
 from src.repositories.person_note_repository import PersonNoteRepository
+from src.services.person_match_index import PersonMatchIndex
 import logging
 
 class PersonService(BaseService):
@@ -12,6 +13,7 @@ class PersonService(BaseService):
         super().__init__()
         self.person_repository = person_repository
         self.person_note_repository = person_note_repository
+        self.match_index = PersonMatchIndex()  # singleton
         self.logger = logging.getLogger(self.__class__.__name__)
     
     def get_all(self):
@@ -49,7 +51,8 @@ class PersonService(BaseService):
     def delete(self, person_id):
         """Delete person."""
         try:
-            return self.person_repository.delete(person_id)
+            self.person_repository.delete(person_id)
+            self.match_index.remove_person(person_id)
         except Exception as e:
             self.logger.error(f"Error deleting person {person_id}: {e}")
             raise
@@ -97,7 +100,8 @@ class PersonService(BaseService):
     def rename(self, person_id, new_name):
         """Rename a person."""
         try:
-            return self.person_repository.rename(person_id, new_name)
+            self.person_repository.rename(person_id, new_name)
+            self.match_index.rename_person(person_id, new_name.strip())
         except Exception as e:
             self.logger.error(f"Error renaming person {person_id}: {e}")
             raise
@@ -150,7 +154,9 @@ class PersonService(BaseService):
     def set_reference_embedding(self, person_id, embedding) -> None:
         """Store a reference face embedding on the person record."""
         try:
-            return self.person_repository.set_reference_embedding(person_id, embedding)
+            self.person_repository.set_reference_embedding(person_id, embedding)
+            # The trigger re-folded the reference into the prototypes; reload lazily
+            self.match_index.invalidate()
         except Exception as e:
             self.logger.error(f"Error setting reference embedding for person {person_id}: {e}")
             raise
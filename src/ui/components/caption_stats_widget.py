@@ -43,6 +43,14 @@ class CaptionStatsWidget(QtWidgets.QWidget):
         last_info_layout.addWidget(self._last_event_label)
         layout.addWidget(self._last_info_frame)
 
+        # Caption being streamed (partial results)
+        self._partial_path = ""
+        self._partial_label = QtWidgets.QLabel("")
+        self._partial_label.setWordWrap(True)
+        self._partial_label.setStyleSheet("font-size: 12px; color: #95a5a6; font-style: italic;")
+        self._partial_label.hide()
+        layout.addWidget(self._partial_label)
+
         # Summary Section
         summary_group = QtWidgets.QGroupBox("Genel İstatistikler")
         summary_group.setStyleSheet("QGroupBox { font-weight: bold; border: 1px solid #3f3f46; margin-top: 10px; padding-top: 15px; } QGroupBox::title { subcontrol-origin: margin; left: 10px; padding: 0 3px; }")
@@ -99,7 +107,15 @@ class CaptionStatsWidget(QtWidgets.QWidget):
         layout.addStretch()
 
     def add_result(self, result):
-        """Add a new CaptionResult to the statistics."""
+        """Add a new CaptionResult to the statistics; partial results only update the streaming line."""
+        if getattr(result, "partial", False):
+            self._partial_path = result.img_path
+            self._partial_label.setText(f"✍️ {os.path.basename(result.img_path)}: {result.caption_tr}")
+            self._partial_label.show()
+            return
+        if result.img_path == self._partial_path:
+            self._partial_path = ""
+            self._partial_label.hide()
         self._results.append(result)
         self._update_display()
 
@@ -162,6 +178,8 @@ class CaptionStatsWidget(QtWidgets.QWidget):
 
     def clear_stats(self):
         self._results = []
+        self._partial_path = ""
+        self._partial_label.hide()
         self._last_file_label.setText("Son İşlenen: —")
         self._last_event_label.setText("")
         self._update_display()
@@ -0,0 +1,171 @@
+"""
+FaceClustersDialog — Etiketlenmemiş yüz kümelerini toplu adlandırma diyaloğu.
+Benzer yüzler arka planda kümelenir; kullanıcı bir küme seçip isim verdiğinde
+kümedeki tüm yüzler tek işlemle o kişiye atanır.
+"""
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from src.ui.dialogs.event_persons_dialog import _crop_face
+
+
+class FaceClusterWorker(QtCore.QThread):
+    """Kümeleme işini UI'yi bloklamadan çalıştırır."""
+    done  = QtCore.Signal(object)   # stats dict
+    error = QtCore.Signal(str)
+
+    def __init__(self, face_service, full: bool, parent=None):
+        super().__init__(parent)
+        self._face_service = face_service
+        self._full = full
+
+    def run(self):
+        try:
+            self.done.emit(self._face_service.cluster_unassigned_faces(full=self._full))
+        except Exception as e:
+            self.error.emit(str(e))
+
+
+class FaceClustersDialog(QtWidgets.QDialog):
+    # Emitted after a cluster was named (person name, face count)
+    cluster_named = QtCore.Signal(str, int)
+
+    def __init__(self, face_service, person_service, parent=None):
+        super().__init__(parent)
+        self._face_service = face_service
+        self._person_service = person_service
+        self._worker: FaceClusterWorker | None = None
+
+        self.setWindowTitle("Yüz Kümeleri")
+        self.setMinimumSize(640, 520)
+        self._init_ui()
+        self._load_clusters()
+
+    # ── UI ────────────────────────────────────────────────────────────────
+
+    def _init_ui(self):
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        top = QtWidgets.QHBoxLayout()
+        self._status = QtWidgets.QLabel("")
+        self._status.setStyleSheet("color: #888; font-size: 11px;")
+        top.addWidget(self._status, 1)
+        self._update_btn = QtWidgets.QPushButton("Güncelle")
+        self._update_btn.setToolTip("Yeni yüzleri mevcut kümelere ekler")
+        self._update_btn.clicked.connect(lambda: self._run_clustering(full=False))
+        top.addWidget(self._update_btn)
+        self._recluster_btn = QtWidgets.QPushButton("Yeniden Kümele")
+        self._recluster_btn.setToolTip("Tüm etiketlenmemiş yüzleri baştan kümeler")
+        self._recluster_btn.clicked.connect(lambda: self._run_clustering(full=True))
+        top.addWidget(self._recluster_btn)
+        layout.addLayout(top)
+
+        self._list = QtWidgets.QListWidget()
+        self._list.setViewMode(QtWidgets.QListView.IconMode)
+        self._list.setIconSize(QtCore.QSize(96, 96))
+        self._list.setGridSize(QtCore.QSize(120, 140))
+        self._list.setResizeMode(QtWidgets.QListView.Adjust)
+        self._list.setMovement(QtWidgets.QListView.Static)
+        self._list.currentItemChanged.connect(lambda *_: self._update_name_button())
+        layout.addWidget(self._list, 1)
+
+        name_row = QtWidgets.QHBoxLayout()
+        name_row.addWidget(QtWidgets.QLabel("İsim:"))
+        self._name_input = QtWidgets.QLineEdit()
+        self._name_input.setPlaceholderText("Seçili kümedeki kişinin adı")
+        try:
+            names = [p["name"] for p in self._person_service.get_all_with_counts()]
+        except Exception:
+            names = []
+        completer = QtWidgets.QCompleter(names, self)
+        completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self._name_input.setCompleter(completer)
+        self._name_input.textChanged.connect(lambda *_: self._update_name_button())
+        self._name_input.returnPressed.connect(self._name_selected_cluster)
+        name_row.addWidget(self._name_input, 1)
+        self._name_btn = QtWidgets.QPushButton("Kümeyi Adlandır")
+        self._name_btn.setEnabled(False)
+        self._name_btn.setStyleSheet(
+            "QPushButton:enabled { background-color: #0078D7; color: white; font-weight: bold; }"
+        )
+        self._name_btn.clicked.connect(self._name_selected_cluster)
+        name_row.addWidget(self._name_btn)
+        layout.addLayout(name_row)
+
+        btn_row = QtWidgets.QHBoxLayout()
+        btn_row.addStretch()
+        close_btn = QtWidgets.QPushButton("Kapat")
+        close_btn.clicked.connect(self.accept)
+        btn_row.addWidget(close_btn)
+        layout.addLayout(btn_row)
+
+    # ── Data ──────────────────────────────────────────────────────────────
+
+    def _load_clusters(self):
+        self._list.clear()
+        try:
+            clusters = self._face_service.get_face_clusters()
+        except Exception as e:
+            self._status.setText(f"Kümeler yüklenemedi: {e}")
+            return
+        for cluster in clusters:
+            item = QtWidgets.QListWidgetItem(
+                f"{cluster['face_count']} yüz\n{cluster['media_count']} medya"
+            )
+            item.setData(QtCore.Qt.UserRole, cluster["cluster_id"])
+            crop = _crop_face(
+                cluster["sample_file_path"], cluster["sample_bbox"], cluster.get("sample_timestamp_ms")
+            )
+            if crop and not crop.isNull():
+                item.setIcon(QtGui.QIcon(crop))
+            self._list.addItem(item)
+        if clusters:
+            self._status.setText(f"{len(clusters)} küme — bir küme seçip isim verin.")
+        else:
+            self._status.setText("Adlandırılacak küme yok. 'Yeniden Kümele' ile kümeleme başlatın.")
+        self._update_name_button()
+
+    def _update_name_button(self):
+        self._name_btn.setEnabled(
+            self._list.currentItem() is not None and bool(self._name_input.text().strip())
+        )
+
+    # ── Slots ─────────────────────────────────────────────────────────────
+
+    def _run_clustering(self, full: bool):
+        if self._worker is not None and self._worker.isRunning():
+            return
+        self._update_btn.setEnabled(False)
+        self._recluster_btn.setEnabled(False)
+        self._status.setText("Yüzler kümeleniyor…")
+        self._worker = FaceClusterWorker(self._face_service, full, parent=self)
+        self._worker.done.connect(self._on_clustering_done)
+        self._worker.error.connect(self._on_clustering_error)
+        self._worker.start()
+
+    def _on_clustering_done(self, stats: dict):
+        self._update_btn.setEnabled(True)
+        self._recluster_btn.setEnabled(True)
+        self._load_clusters()
+
+    def _on_clustering_error(self, message: str):
+        self._update_btn.setEnabled(True)
+        self._recluster_btn.setEnabled(True)
+        self._status.setText(f"Kümeleme başarısız: {message}")
+
+    def _name_selected_cluster(self):
+        item = self._list.currentItem()
+        name = self._name_input.text().strip()
+        if item is None or not name:
+            return
+        try:
+            person_id = self._person_service.find_or_create(name)
+            count = self._face_service.name_cluster(item.data(QtCore.Qt.UserRole), person_id)
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(self, "Hata", f"Küme adlandırılamadı: {e}")
+            return
+        self._list.takeItem(self._list.row(item))
+        self._name_input.clear()
+        self._status.setText(f"✅ {count} yüz '{name}' olarak etiketlendi.")
+        self.cluster_named.emit(name, count)
@@ -91,7 +91,8 @@ class BatchFaceWorker(QtCore.QThread):
     error           = QtCore.Signal(str)
     image_processed = QtCore.Signal(str)        # emits file_path when one image is done
 
-    def __init__(self, file_paths, event_id, face_service, media_service, person_service, parent=None, force=False):
+    def __init__(self, file_paths, event_id, face_service, media_service, person_service, parent=None, force=False,
+                 triage=None):
         super().__init__(parent)
         self._file_paths  = file_paths
         self._event_id    = event_id
@@ -99,92 +100,88 @@ class BatchFaceWorker(QtCore.QThread):
         self._media_svc   = media_service
         self._person_svc  = person_service
         self._force       = force
+        self._triage      = triage  # two-stage detection; None = "face_detect_triage" setting
 
     def run(self):
+        import contextlib
         import time as _time
-        from src.utils.video_util import VIDEO_EXTS, extract_key_frames
+        from src.services.face_batch_pipeline import FaceBatchPipeline
+        from src.utils import config_util
         total = len(self._file_paths)
         _t0 = _time.monotonic()
         logger.info(
             f"BatchFaceWorker: starting on {total} files",
             extra={"event": "FACE_BATCH_START", "event_id": str(self._event_id)},
         )
-        for i, file_path in enumerate(self._file_paths, 1):
-            try:
-                ext = os.path.splitext(file_path)[1].lower()
-                is_video = ext in VIDEO_EXTS
-                
-                from src.utils.document_util import DOCUMENT_EXTS
-                if ext in DOCUMENT_EXTS:
-                    raise ValueError(f"Yüz tanıma doküman dosyaları için desteklenmemektedir: {ext}")
-                
-                image_exts = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".gif", ".webp"}
-                if not is_video and ext not in image_exts:
-                    raise ValueError(f"Yüz tanıma bu dosya türü için desteklenmemektedir: {ext}")
-
-                media_type = "video" if is_video else "photo"
-
-                media_id = self._media_svc.ensure_media_exists(
-                    self._event_id, file_path, media_type
-                )
-                media_row = self._media_svc.get_by_file_path(file_path)
-                if not self._force and media_row and media_row.get("face_detected_at"):
-                    self.progress.emit(i, total)
-                    continue
-
-                if self._force:
-                    self._face_svc.delete_faces_for_media(media_id)
-
-                if is_video:
-                    frames_with_ts = extract_key_frames(file_path, interval_seconds=1.0)
-                    results = []
-                    for frame, tms in frames_with_ts:
-                        frame_results = self._face_svc.detect_faces_from_array(frame)
-                        if frame_results:
-                            for fr in frame_results:
-                                fr.timestamp_ms = tms
-                            results.extend(frame_results)
-                else:
-                    results = self._face_svc.detect_faces(file_path)
-
-                saved_ids = self._face_svc.save_faces(media_id, results) if results else []
-
-                for face_result, face_id in zip(results or [], saved_ids):
-                    if face_result.embedding is not None:
-                        pid, _ = self._face_svc.find_similar_person(face_result.embedding)
-                        if pid:
-                            self._face_svc.assign_person(face_id, pid)
-                            self._person_svc.link_to_media(pid, media_id)
-
-                if not is_video:
-                    # --- Automatic Metadata Extraction (images only) ---
-                    from src.utils import metadata_util
-                    meta = metadata_util.extract_metadata(file_path)
-                    if any(v.strip() for v in meta.values()):
-                        self._media_svc.save_iptc_data(media_id, meta)
-
-                self._media_svc.mark_face_detected(media_id)
-            except Exception as e:
-                logger.warning(f"BatchFaceWorker: error on {file_path}: {e}")
-            self.image_processed.emit(file_path)
-            self.progress.emit(i, total)
+        # Opt-in: run detection in worker processes, each with its own ONNX session
+        processes = int(config_util.get_setting("face_detect_processes", 0) or 0)
+        triage = self._triage
+        if triage is None:
+            triage = bool(config_util.get_setting("face_detect_triage", False))
+        with contextlib.ExitStack() as stack:
+            pool = None
+            if processes > 0 and total > 1:
+                from src.services.face_process_pool import FaceProcessPool
+                pool = stack.enter_context(FaceProcessPool(
+                    workers=processes,
+                    intra_op_threads=int(config_util.get_setting("face_detect_intra_op_threads", 2) or 2),
+                ))
+            # Decoding, detection and DB writes run as overlapping stages so the
+            # model is not idle while files are read or faces are persisted.
+            pipeline = FaceBatchPipeline(
+                self._face_svc, self._media_svc, self._person_svc, self._event_id,
+                force=self._force, process_pool=pool, triage=triage,
+            )
+            stage_ms = pipeline.run(
+                self._file_paths,
+                on_progress=self.progress.emit,
+                on_processed=self.image_processed.emit,
+            )
         elapsed_ms = int((_time.monotonic() - _t0) * 1000)
+        triage_info = (
+            f" triage={stage_ms['triage']}ms, {stage_ms['triage_skipped']} skipped, "
+            f"~{stage_ms['triage_saved']}ms saved"
+            if triage else ""
+        )
         logger.info(
-            f"BatchFaceWorker: finished {total} files in {elapsed_ms}ms",
-            extra={"event": "FACE_BATCH_COMPLETE", "event_id": str(self._event_id), "duration_ms": elapsed_ms},
+            f"BatchFaceWorker: finished {total} files in {elapsed_ms}ms "
+            f"(decode={stage_ms['decode']}ms detect={stage_ms['detect']}ms persist={stage_ms['persist']}ms"
+            f"{triage_info})",
+            extra={
+                "event": "FACE_BATCH_COMPLETE", "event_id": str(self._event_id),
+                "duration_ms": elapsed_ms, "stage_ms": stage_ms,
+            },
         )
+        # Fold the new unassigned faces into the face clusters once enough of them
+        # have piled up (face_cluster_min_new_faces); otherwise this is one count.
+        # Done before `finished` so the next queued job, which starts on that
+        # signal, never clusters concurrently and closeEvent waits for this thread.
+        try:
+            self._face_svc.cluster_unassigned_faces_if_due()
+        except Exception as e:
+            logger.warning(f"BatchFaceWorker: face clustering failed: {e}")
         self.finished.emit()
 
 
 class BackgroundCaptionWorker(QtCore.QThread):
-    """Runs CaptionService on a list of image files in the background, skipping already-captioned ones."""
+    """Runs CaptionService on a list of image files in the background, skipping already-captioned ones.
+
+    Files are captioned batch_size at a time with one analyse_batch() call
+    ("caption_batch_size" setting by default); signals are still emitted per image.
+    Backends with submit() (Ollama) are fed continuously instead: up to twice
+    their `parallel` images are queued ahead, so the next images are resized
+    and sent while earlier ones are saved; results are still handled in order.
+    Their streamed captions are emitted through result_ready as partial
+    results (CaptionResult.partial) before the final result of each image.
+    """
 
     progress        = QtCore.Signal(int, int)   # (current, total)
     finished        = QtCore.Signal()
     image_captioned = QtCore.Signal(str)        # file_path when one image is done
     result_ready    = QtCore.Signal(object)     # CaptionResult after each image
 
-    def __init__(self, file_paths, event_id, caption_service, media_service, person_service=None, parent=None, event_name=""):
+    def __init__(self, file_paths, event_id, caption_service, media_service, person_service=None, parent=None, event_name="",
+                 batch_size=None):
         super().__init__(parent)
         self._file_paths  = file_paths
         self._event_id    = event_id
@@ -192,32 +189,25 @@ class BackgroundCaptionWorker(QtCore.QThread):
         self._caption_svc = caption_service
         self._media_svc   = media_service
         self._person_svc  = person_service
+        if batch_size is None:
+            from src.utils import config_util
+            batch_size = config_util.get_setting("caption_batch_size", 4)
+        self._batch_size  = max(1, int(batch_size or 1))
+        self._done        = 0
 
     def run(self):
         import time as _time
         total = len(self._file_paths)
         _t0 = _time.monotonic()
         logger.info(
-            f"BackgroundCaptionWorker: starting on {total} files",
+            f"BackgroundCaptionWorker: starting on {total} files (batch {self._batch_size})",
             extra={"event": "CAPTION_BATCH_START", "event_id": str(self._event_id)},
         )
-        for i, file_path in enumerate(self._file_paths, 1):
-            try:
-                media_id = self._media_svc.ensure_media_exists(self._event_id, file_path, "photo")
-                person_names = None
-                if self._person_svc:
-                    person_names = self._person_svc.get_persons_for_media(media_id)
-                result = self._caption_svc.analyse(file_path, person_names=person_names)
-                if result.has_data and not result.error:
-                    self._media_svc.save_captions(media_id, result)
-            except Exception as e:
-                logger.warning(f"BackgroundCaptionWorker: error on {file_path}: {e}")
-                from src.domain.entities.caption_result import CaptionResult
-                result = CaptionResult(img_path=file_path, error=str(e))
-            result.event_name = self._event_name
-            self.result_ready.emit(result)
-            self.image_captioned.emit(file_path)
-            self.progress.emit(i, total)
+        self._done = 0
+        if hasattr(self._caption_svc, "submit"):
+            self._run_pipelined()
+        else:
+            self._run_batched()
         elapsed_ms = int((_time.monotonic() - _t0) * 1000)
         logger.info(
             f"BackgroundCaptionWorker: finished {total} files in {elapsed_ms}ms",
@@ -225,6 +215,90 @@ class BackgroundCaptionWorker(QtCore.QThread):
         )
         self.finished.emit()
 
+    def _lookup(self, file_path):
+        """(media_id, person names) of a file; creates the media row if needed."""
+        media_id = self._media_svc.ensure_media_exists(self._event_id, file_path, "photo")
+        names = self._person_svc.get_persons_for_media(media_id) if self._person_svc else None
+        return media_id, names
+
+    def _save(self, file_path, media_id, result):
+        """Store a successful result; returns the result to report."""
+        from src.domain.entities.caption_result import CaptionResult
+        try:
+            if result.has_data and not result.error:
+                self._media_svc.save_captions(media_id, result)
+        except Exception as e:
+            logger.warning(f"BackgroundCaptionWorker: error on {file_path}: {e}")
+            result = CaptionResult(img_path=file_path, error=str(e))
+        return result
+
+    def _report(self, file_path, result):
+        self._done += 1
+        result.event_name = self._event_name
+        self.result_ready.emit(result)
+        self.image_captioned.emit(file_path)
+        self.progress.emit(self._done, len(self._file_paths))
+
+    def _report_partial(self, file_path, caption_tr):
+        """Called from the backend's request threads; the signal is queued to the UI thread."""
+        from src.domain.entities.caption_result import CaptionResult
+        self.result_ready.emit(
+            CaptionResult(img_path=file_path, caption_tr=caption_tr, event_name=self._event_name, partial=True)
+        )
+
+    def _run_batched(self):
+        from src.domain.entities.caption_result import CaptionResult
+        for start in range(0, len(self._file_paths), self._batch_size):
+            chunk = self._file_paths[start:start + self._batch_size]
+            results = {}
+            media_ids, names = {}, {}
+            for file_path in chunk:
+                try:
+                    media_ids[file_path], names[file_path] = self._lookup(file_path)
+                except Exception as e:
+                    logger.warning(f"BackgroundCaptionWorker: error on {file_path}: {e}")
+                    results[file_path] = CaptionResult(img_path=file_path, error=str(e))
+
+            ready = [p for p in chunk if p not in results]
+            try:
+                batch = self._caption_svc.analyse_batch(ready, [names[p] for p in ready]) if ready else []
+            except Exception as e:
+                logger.warning(f"BackgroundCaptionWorker: error on batch of {len(ready)} files: {e}")
+                batch = [CaptionResult(img_path=p, error=str(e)) for p in ready]
+            for file_path, result in zip(ready, batch):
+                results[file_path] = self._save(file_path, media_ids[file_path], result)
+
+            for file_path in chunk:
+                self._report(file_path, results[file_path])
+
+    def _run_pipelined(self):
+        from collections import deque
+        from concurrent.futures import Future
+        from src.domain.entities.caption_result import CaptionResult
+        window = 2 * max(1, getattr(self._caption_svc, "parallel", 1))
+        pending = deque()  # (file_path, media_id, Future[CaptionResult]) in file order
+
+        def deliver():
+            file_path, media_id, future = pending.popleft()
+            result = future.result()
+            if media_id is not None:
+                result = self._save(file_path, media_id, result)
+            self._report(file_path, result)
+
+        for file_path in self._file_paths:
+            try:
+                media_id, names = self._lookup(file_path)
+                future = self._caption_svc.submit(file_path, names, on_partial=self._report_partial)
+            except Exception as e:
+                logger.warning(f"BackgroundCaptionWorker: error on {file_path}: {e}")
+                media_id, future = None, Future()
+                future.set_result(CaptionResult(img_path=file_path, error=str(e)))
+            pending.append((file_path, media_id, future))
+            while len(pending) > window:
+                deliver()
+        while pending:
+            deliver()
+
 
 class SearchWorker(QtCore.QThread):
     """Runs the FTS DB query in the background to avoid freezing the UI."""
@@ -298,7 +372,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self._current_ai_caption_orig = ""
         self._current_ai_tags_orig = ""
         self.app_service = ApplicationService()
-        self._face_detection_queue: list = []   # list of (file_paths, event)
+        self._face_detection_queue: list = []   # list of (file_paths, event, force, triage)
         self._batch_face_worker = None
         self._caption_queue: list = []          # list of (file_paths, event)
         self._caption_worker = None
@@ -866,7 +940,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 return True
         return any(item[1].id == event_id for item in self._face_detection_queue)
 
-    def _resume_batch_face_detection(self, event, force=False):
+    def _resume_batch_face_detection(self, event, force=False, triage=None):
         """Start batch detection for any images not yet processed in this event.
 
         Called each time an event is opened so interrupted runs are automatically
@@ -916,11 +990,11 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.statusBar().showMessage(f"✅ '{event.name}' için işlenecek yeni medya bulunamadı.", 4000)
             return  # everything already done
 
-        self._start_batch_face_detection_for_files(unprocessed, event, force=force)
+        self._start_batch_face_detection_for_files(unprocessed, event, force=force, triage=triage)
 
-    def _start_batch_face_detection_for_files(self, file_paths, event, force=False):
+    def _start_batch_face_detection_for_files(self, file_paths, event, force=False, triage=None):
         """Enqueue a batch job; start immediately only if no worker is running."""
-        self._face_detection_queue.append((list(file_paths), event, force))
+        self._face_detection_queue.append((list(file_paths), event, force, triage))
         total_queued = sum(len(item[0]) for item in self._face_detection_queue)
         if self._batch_face_worker is None or not self._batch_face_worker.isRunning():
             self._process_next_face_detection()
@@ -935,11 +1009,14 @@ class MainWindow(QtWidgets.QMainWindow):
             return
             
         item = self._face_detection_queue.pop(0)
-        if len(item) == 3:
+        if len(item) == 4:
+            file_paths, event, force, triage = item
+        elif len(item) == 3:
             file_paths, event, force = item
+            triage = None
         else:
             file_paths, event = item
-            force = False
+            force, triage = False, None
             
         svc = self.app_service
         self._batch_face_worker = BatchFaceWorker(
@@ -949,7 +1026,8 @@ class MainWindow(QtWidgets.QMainWindow):
             svc.get_media_service(),
             svc.get_person_service(),
             parent=self,
-            force=force
+            force=force,
+            triage=triage,
         )
         self._batch_face_worker.progress.connect(self._on_batch_face_progress)
         self._batch_face_worker.finished.connect(self._on_batch_face_finished)
@@ -1243,6 +1321,7 @@ class MainWindow(QtWidgets.QMainWindow):
         menu = QtWidgets.QMenu(self)
         details_action = menu.addAction("🔍 Detaylar")
         process_action = menu.addAction("🔍 Yüz Tanıma Başlat")
+        triage_action = menu.addAction("⚡ Hızlı Yüz Tanıma (Ön Tarama)")
         caption_action = menu.addAction("✨ AI Altyazı Başlat")
         persons_action = menu.addAction("👥 Kişileri Görüntüle")
         menu.addSeparator()
@@ -1257,6 +1336,9 @@ class MainWindow(QtWidgets.QMainWindow):
         elif action == process_action:
             self._resume_batch_face_detection(event, force=True)
             self.statusBar().showMessage(f"🚀 '{event.name}' için yüz tanıma başlatıldı...", 4000)
+        elif action == triage_action:
+            self._resume_batch_face_detection(event, force=True, triage=True)
+            self.statusBar().showMessage(f"⚡ '{event.name}' için ön taramalı yüz tanıma başlatıldı...", 4000)
         elif action == caption_action:
             self._resume_batch_captioning(event, force=True)
             self.statusBar().showMessage(f"✨ '{event.name}' için altyazı işlemi başlatıldı...", 4000)
@@ -62,6 +62,7 @@ class PersonScanWorker(QtCore.QThread):
     """Scans all existing face_detections and assigns matching ones to a newly created person."""
     progress = QtCore.Signal(int, int)  # (current, total)
     finished = QtCore.Signal(int)       # total matches assigned
+    error = QtCore.Signal(int, str)     # (faces already assigned by committed chunks, message)
 
     def __init__(self, person_id, reference_embedding, face_service, person_service, parent=None):
         super().__init__(parent)
@@ -73,22 +74,53 @@ class PersonScanWorker(QtCore.QThread):
     def run(self):
         try:
             matches = self._face_svc.find_unassigned_faces_matching(self._embedding)
+            # Only claim faces whose nearest person (via the match index) is this one
+            nearest = self._face_svc.find_similar_persons([m.get("embedding") for m in matches])
+            matches = [
+                m for m, (pid, _) in zip(matches, nearest)
+                if m.get("embedding") is None or pid is None or pid == self._person_id
+            ]
         except Exception:
             matches = []
 
-        total = len(matches)
-        assigned = 0
-        for i, face in enumerate(matches):
-            self.progress.emit(i + 1, total)
-            try:
-                self._face_svc.assign_person(face["face_id"], self._person_id)
-                self._person_svc.link_to_media(self._person_id, face["media_id"])
-                assigned += 1
-            except Exception:
-                pass
+        # One UPDATE + one media_persons INSERT per chunk; progress is reported per committed chunk,
+        # so on failure the last reported count is what stays assigned
+        done = 0
+
+        def on_progress(current, total):
+            nonlocal done
+            done = current
+            self.progress.emit(current, total)
+
+        try:
+            assigned = self._face_svc.assign_person_bulk(
+                [m["face_id"] for m in matches], self._person_id, on_progress=on_progress, auto=True
+            )
+        except Exception as e:
+            self.error.emit(done, str(e))
+            return
         self.finished.emit(assigned)
 
 
+class RematchWorker(QtCore.QThread):
+    """Runs the archive-wide re-matching job (FaceService.rematch_faces) off the UI thread."""
+    progress = QtCore.Signal(int, int)  # (current, total)
+    finished = QtCore.Signal(dict)      # rematch_faces stats
+    error = QtCore.Signal(str)
+
+    def __init__(self, face_service, parent=None):
+        super().__init__(parent)
+        self._face_svc = face_service
+
+    def run(self):
+        try:
+            stats = self._face_svc.rematch_faces(on_progress=self.progress.emit)
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        self.finished.emit(stats)
+
+
 class PersonsTabWidget(QtWidgets.QWidget):
     # Emitted when user double-clicks a person row; carries (person_name, gallery_items)
     person_gallery_requested = QtCore.Signal(str, list)
@@ -104,6 +136,7 @@ class PersonsTabWidget(QtWidgets.QWidget):
         self._face_service = face_service
         self._rename_worker = None
         self._scan_worker = None
+        self._rematch_worker = None
         self._init_ui()
 
     def _init_ui(self):
@@ -129,6 +162,18 @@ class PersonsTabWidget(QtWidgets.QWidget):
         self._persons_search.textChanged.connect(self._filter_persons_table)
         top_bar.addWidget(self._persons_search)
 
+        clusters_btn = QtWidgets.QPushButton("Yüz Kümeleri")
+        clusters_btn.setFixedHeight(30)
+        clusters_btn.setToolTip("Benzer etiketlenmemiş yüzleri gruplar halinde adlandırın")
+        clusters_btn.clicked.connect(self._open_face_clusters)
+        top_bar.addWidget(clusters_btn)
+
+        rematch_btn = QtWidgets.QPushButton("Yeniden Eşleştir")
+        rematch_btn.setFixedHeight(30)
+        rematch_btn.setToolTip("Otomatik eşleşmeleri güncel eşik ve modelle tüm arşivde yeniden hesaplar")
+        rematch_btn.clicked.connect(self._rematch_faces)
+        top_bar.addWidget(rematch_btn)
+
         refresh_btn = QtWidgets.QPushButton("Yenile")
         refresh_btn.setFixedHeight(30)
         refresh_btn.clicked.connect(self.load_persons)
@@ -396,8 +441,64 @@ class PersonsTabWidget(QtWidgets.QWidget):
             lambda cur, tot: self.status_message.emit(f"🔍 '{name}' taranıyor… {cur}/{tot} yüz")
         )
         self._scan_worker.finished.connect(lambda n: self._on_scan_finished(n, name))
+        self._scan_worker.error.connect(lambda n, msg: self._on_scan_failed(n, msg, name))
         self._scan_worker.start()
 
+    def _open_face_clusters(self):
+        if self._face_service is None:
+            QtWidgets.QMessageBox.warning(self, "Uyarı", "Yüz tanıma servisi mevcut değil.")
+            return
+
+        from src.ui.dialogs.face_clusters_dialog import FaceClustersDialog
+        dlg = FaceClustersDialog(self._face_service, self._person_service, parent=self)
+        dlg.cluster_named.connect(
+            lambda name, n: self.status_message.emit(f"✅ {n} yüz '{name}' olarak etiketlendi.")
+        )
+        dlg.exec()
+        self.load_persons()
+
+    def _rematch_faces(self):
+        if self._face_service is None:
+            QtWidgets.QMessageBox.warning(self, "Uyarı", "Yüz tanıma servisi mevcut değil.")
+            return
+        if self._rematch_worker is not None and self._rematch_worker.isRunning():
+            return
+
+        reply = QtWidgets.QMessageBox.question(
+            self,
+            "Yeniden Eşleştir",
+            "Otomatik atanmış ve etiketlenmemiş tüm yüzler kişilerle yeniden eşleştirilecek.\n"
+            "Elle yapılan atamalar ve temizlenen yüzler değişmez. Devam edilsin mi?",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+            QtWidgets.QMessageBox.No,
+        )
+        if reply != QtWidgets.QMessageBox.Yes:
+            return
+
+        self._rematch_worker = RematchWorker(self._face_service)
+        self._rematch_worker.progress.connect(
+            lambda cur, tot: self.status_message.emit(f"🔍 Yüzler yeniden eşleştiriliyor… {cur}/{tot}")
+        )
+        self._rematch_worker.finished.connect(self._on_rematch_finished)
+        self._rematch_worker.error.connect(
+            lambda msg: QtWidgets.QMessageBox.critical(self, "Hata", f"Yeniden eşleştirme başarısız: {msg}")
+        )
+        self._rematch_worker.start()
+
+    def _on_rematch_finished(self, stats: dict):
+        self.load_persons()
+        self.status_message.emit(
+            f"✅ Yeniden eşleştirme tamamlandı — {stats['assigned']} yeni atama, "
+            f"{stats['moved']} değişiklik, {stats['unassigned']} atama kaldırıldı."
+        )
+
+    def _on_scan_failed(self, assigned: int, message: str, name: str):
+        self.load_persons()
+        self.status_message.emit(f"⚠️ '{name}' taraması yarıda kaldı — {assigned} yüz atandı.")
+        QtWidgets.QMessageBox.critical(
+            self, "Hata", f"'{name}' taraması yarıda kaldı ({assigned} yüz atandı): {message}"
+        )
+
     def _on_scan_finished(self, matched: int, name: str):
         self.load_persons()
         if matched > 0:
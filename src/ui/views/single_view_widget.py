@@ -106,7 +106,7 @@ class ImageLoaderWorker(QtCore.QThread):
 
 
 class FaceDetectionWorker(QtCore.QThread):
-    """Runs FaceAnalysisService.detect() in a worker thread."""
+    """Runs FaceService.detect_faces() (interactive, through the detection broker) in a worker thread."""
 
     detected = QtCore.Signal(list)   # list[FaceResult]
     error    = QtCore.Signal(str)
@@ -167,6 +167,11 @@ class _VideoFaceThumb(QtWidgets.QFrame):
         time_lbl = QtWidgets.QLabel(time_str)
         time_lbl.setAlignment(QtCore.Qt.AlignCenter)
         time_lbl.setStyleSheet("color: #888; font-size: 9px;")
+        if face.get("track_start_ms") is not None and face.get("track_end_ms") is not None:
+            # One row per face track: show the span it stands for
+            span = [face["track_start_ms"] / 1000.0, face["track_end_ms"] / 1000.0]
+            start_str, end_str = (f"{int(t // 60):02d}:{t % 60:05.2f}" for t in span)
+            self.setToolTip(f"Görüldüğü aralık: {start_str} – {end_str}")
         layout.addWidget(time_lbl)
         
         self.face_data = face
@@ -230,6 +235,7 @@ class SingleViewWidget(QtWidgets.QWidget):
         self._is_batch_pending  = False
         self._detection_worker: FaceDetectionWorker | None = None
         self._detection_img_path: str | None = None   # path sent to current worker
+        self._detection_preview = False                # batch pending: show results, don't save
         self._image_loader: ImageLoaderWorker | None = None
         self._source_pixmap: QtGui.QPixmap | None = None
         # Raw FaceResult list from last detection (needed to save to DB)
@@ -466,10 +472,12 @@ class SingleViewWidget(QtWidgets.QWidget):
                 except Exception as e:
                     logger.warning(f"Could not get faces from DB: {e}")
 
-            # Batch worker is still running for this image → wait, don't duplicate detection
+            # Batch worker is still running for this image → detect for display only; the
+            # detection broker shares the run with the batch, which stores the faces
             if self._is_batch_pending and not self._face_detected_at:
-                self._status_label.setText("⏳ Yüz tanıma bekleniyor…")
-                logger.info("Face detection deferred: batch worker still running", extra={"event": "FACE_BATCH_WAIT"})
+                self._status_label.setText("⏳ Yüzler algılanıyor (toplu işlem kaydedecek)…")
+                logger.info("Face detection preview: batch worker still running", extra={"event": "FACE_BATCH_WAIT"})
+                self._start_detection(path, preview=True)
                 return
 
             # Fallback: check for named detections (older records without face_detected_at)
@@ -509,13 +517,14 @@ class SingleViewWidget(QtWidgets.QWidget):
     # Detection pipeline
     # ------------------------------------------------------------------
 
-    def _start_detection(self, img_path: str):
+    def _start_detection(self, img_path: str, preview: bool = False):
         if self._detection_worker and self._detection_worker.isRunning():
             self._detection_worker.quit()
             self._detection_worker.wait(500)
 
         self._detection_start = time.monotonic()
         self._detection_img_path = img_path
+        self._detection_preview = preview
         self._detection_worker = FaceDetectionWorker(self._face_service, img_path, self)
         self._detection_worker.detected.connect(self._on_detection_finished)
         self._detection_worker.error.connect(self._on_detection_error)
@@ -536,18 +545,44 @@ class SingleViewWidget(QtWidgets.QWidget):
             )
             return
 
-        self._pending_results = results
         n = len(results)
+        if self._detection_preview:
+            # The batch worker saves and matches these faces; refresh_faces_from_db shows its rows
+            face_dicts = [{
+                "bbox"        : {"x1": face.x1, "y1": face.y1, "x2": face.x2, "y2": face.y2},
+                "face_id"     : None,
+                "person_name" : None,
+                "face_index"  : i,
+                "person_id"   : None,
+                "note"        : None,
+            } for i, face in enumerate(results)]
+            self._status_label.setText(f"⏳ {n} yüz algılandı — toplu işlem kaydedince isimlendirilebilir")
+            logger.info(
+                f"Face detection preview: {n} faces in {_detect_ms}ms",
+                extra={"event": "FACE_DETECT", "duration_ms": _detect_ms, "media_id": str(self._current_media_id) if self._current_media_id else None},
+            )
+            img_rect = self._get_image_display_rect()
+            self.face_overlay.set_faces(face_dicts, img_rect)
+            self.face_overlay.setGeometry(self._image_container.rect())
+            self.face_overlay.show()
+            self.face_overlay.raise_()
+            return
+
+        self._pending_results = results
         self._status_label.setText(f"✅ {n} yüz algılandı — isimleri girin ve Enter'a basın")
 
         # Try auto-matching via similarity search (unless reset was triggered)
         face_dicts = []
         skip_sim = self._skip_similarity
         self._skip_similarity = False  # reset flag
+        matches = [(None, None)] * len(results)
+        if not skip_sim and self._face_service:
+            try:
+                matches = self._face_service.find_similar_persons([face.embedding for face in results])
+            except Exception as e:
+                logger.warning(f"Similarity search failed: {e}")
         for i, face in enumerate(results):
-            person_id, person_name = None, None
-            if not skip_sim and self._face_service and face.embedding is not None:
-                person_id, person_name = self._face_service.find_similar_person(face.embedding)
+            person_id, person_name = matches[i]
             pid_str = str(person_id) if person_id else None
             face_dicts.append({
                 "bbox"        : {"x1": face.x1, "y1": face.y1, "x2": face.x2, "y2": face.y2},
@@ -576,9 +611,9 @@ class SingleViewWidget(QtWidgets.QWidget):
                     face_dicts[i]["face_id"] = str(fid)
                     # If auto-matched, assign immediately
                     if not skip_sim and face_dicts[i]["person_name"] and self._person_service:
-                        pid, _ = self._face_service.find_similar_person(results[i].embedding)
+                        pid = matches[i][0]
                         if pid:
-                            self._face_service.assign_person(fid, pid)
+                            self._face_service.assign_person(fid, pid, auto=True)
                             self._person_service.link_to_media(pid, self._current_media_id)
             except Exception as e:
                 logger.warning(f"Failed to save faces: {e}")
@@ -627,7 +662,7 @@ class SingleViewWidget(QtWidgets.QWidget):
             return
         import numpy as np
         import json as _json
-        matched = 0
+        candidates, embeddings = [], []
         for face in db_faces:
             if face.get("person_name") or face.get("person_id"):
                 continue  # already assigned
@@ -637,16 +672,29 @@ class SingleViewWidget(QtWidgets.QWidget):
             if not raw_emb:
                 continue
             try:
-                arr = np.array(_json.loads(str(raw_emb)), dtype=np.float32)
-                pid, pname = self._face_service.find_similar_person(arr)
-                if pid and pname:
-                    face["person_name"] = pname
-                    face_id = face.get("id")
-                    if face_id:
-                        self._face_service.assign_person(UUID(str(face_id)), pid)
-                    if self._current_media_id and self._person_service:
-                        self._person_service.link_to_media(pid, self._current_media_id)
-                    matched += 1
+                embeddings.append(np.array(_json.loads(str(raw_emb)), dtype=np.float32))
+                candidates.append(face)
+            except Exception as e:
+                logger.warning(f"_auto_match_db_faces: failed for face {face.get('id')}: {e}")
+        if not candidates:
+            return
+        try:
+            matches = self._face_service.find_similar_persons(embeddings)
+        except Exception as e:
+            logger.warning(f"_auto_match_db_faces: similarity search failed: {e}")
+            return
+        matched = 0
+        for face, (pid, pname) in zip(candidates, matches):
+            if not (pid and pname):
+                continue
+            try:
+                face["person_name"] = pname
+                face_id = face.get("id")
+                if face_id:
+                    self._face_service.assign_person(UUID(str(face_id)), pid, auto=True)
+                if self._current_media_id and self._person_service:
+                    self._person_service.link_to_media(pid, self._current_media_id)
+                matched += 1
             except Exception as e:
                 logger.warning(f"_auto_match_db_faces: failed for face {face.get('id')}: {e}")
         if matched:
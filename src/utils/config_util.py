@@ -9,9 +9,59 @@ CONFIG_FILE = os.path.join(PROJECT_ROOT, "settings.json")
 # Default settings
 DEFAULT_CONFIG = {
     "auto_captioning_enabled": False,
+    # Images per generate() call in background captioning (CaptionService.analyse_batch)
+    "caption_batch_size": 4,
+    # Reuse the KV cache of the constant caption instructions across generate() calls
+    "caption_prefix_cache": True,
+    # Captioning without a GPU: "fp32" or "int8" (dynamically quantized decoder), torch threads (0 = half the cores)
+    "caption_cpu_precision": "fp32",
+    "caption_cpu_threads": 0,
+    # Ollama backend: /api/generate requests in flight (match the server's OLLAMA_NUM_PARALLEL)
+    "caption_ollama_parallel": 2,
+    # Ollama backend: stream responses and stop as soon as the caption JSON is complete
+    "caption_ollama_stream": True,
     "language": "tr",
     "grammar_correction_enabled": True,
     "grammar_correction_model": "gemma3:1b",
+    # Face embedding ANN indexes: "hnsw", "ivfflat" or "none"
+    "face_ann_index": "hnsw",
+    "face_ann_ef_search": 100,
+    "face_ann_probes": 10,
+    # Long side for DCT-scaled JPEG decoding before face detection (0 = full resolution)
+    "face_decode_max_side": 1280,
+    # Face detection worker processes for batch runs (0 = in-process) and ONNX threads per worker
+    "face_detect_processes": 0,
+    "face_detect_intra_op_threads": 2,
+    # ONNX Runtime session options for the face models (0 threads = ORT default)
+    "face_ort_graph_optimization": "all",
+    "face_ort_intra_op_threads": 0,
+    "face_ort_inter_op_threads": 0,
+    "face_ort_execution_mode": "sequential",
+    "face_ort_mem_arena": True,
+    # "fp32" or "int8" (quantized copy made by `python face_model.py quantize`)
+    "face_model_precision": "fp32",
+    # Cosine distance limit for matching a face to a person (automatic matching and re-matching); lower is stricter
+    "face_match_threshold": 0.5,
+    # Cluster unassigned faces after a detection job only once this many new faces are waiting
+    # (the clusters dialog can always update them on demand)
+    "face_cluster_min_new_faces": 200,
+    # Store the aligned chip of every face (face_chips) for re-embedding without re-detection
+    "face_store_chips": True,
+    # Two-stage (triage) detection for automatic batch runs; can also be chosen per event
+    "face_detect_triage": False,
+    # Reuse detection results of files with identical content (face_detection_cache)
+    "face_detection_cache": True,
+    # Tiled detection for panoramas / very large photos (FaceAnalysisService.TILE_*); 0 = trigger off.
+    # The size trigger is off by default: set it well above camera resolutions (e.g. 12000) for huge scans
+    "face_tile_max_aspect": 2.0,
+    "face_tile_min_side": 0,
+    "face_tile_size": 1280,
+    # Query-time face quality gate (face_quality_util.QualityGate); 0 / 90 = off
+    "face_min_blur_score": 5.0,
+    "face_min_size_px": 0,
+    "face_min_det_score": 0.0,
+    "face_max_yaw": 90.0,
+    "face_max_pitch": 90.0,
 }
 
 def load_config() -> dict:
@@ -0,0 +1,147 @@
+"""
+Face quality attributes and the query-time quality gate.
+
+measure_faces() scores every detection of an image in one pass:
+- blur_score: variance of the Laplacian of the face crop (the metric
+  BLUR_THRESHOLD was tuned on)
+- face_px:    short side of the bbox in pixels of the analysed image (always
+              full resolution for faces below SMALL_FACE_PX)
+- yaw / pitch / roll: head pose in degrees, estimated from the five SCRFD
+  landmarks against the ArcFace template — rough, but enough to drop profiles
+
+The values are stored on face_detections; QualityGate turns the face_min_* /
+face_max_* settings into an SQL filter (and the same test in Python), so a
+threshold change applies to every row on the next query. Rows without quality
+values (detected before these columns existed) always pass.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+
+import numpy as np
+
+# Nose height between the eye line and the mouth line in the ArcFace 112×112
+# template (eyes y≈51.6, nose y≈71.7, mouth y≈92.3): the frontal-pose reference.
+_FRONTAL_NOSE_RATIO = 0.494
+
+
+def measure_faces(img: np.ndarray, bboxes: np.ndarray, kpss: np.ndarray | None) -> dict[str, np.ndarray]:
+    """
+    Quality attributes for the detections of one BGR image.
+
+    Args:
+        bboxes: (n, 4+) pixel boxes, already clamped to non-empty crops.
+        kpss:   (n, 5, 2) landmarks (left eye, right eye, nose, mouth left,
+                mouth right) or None.
+
+    Returns:
+        Arrays of length n: blur_score, face_px, yaw, pitch, roll (pose NaN
+        without landmarks).
+    """
+    import cv2
+
+    n = len(bboxes)
+    h, w = img.shape[:2]
+    boxes = np.asarray(bboxes, dtype=np.float64)[:, :4].reshape(n, 4)
+    x1 = np.clip(boxes[:, 0].astype(np.int64), 0, w)
+    y1 = np.clip(boxes[:, 1].astype(np.int64), 0, h)
+    x2 = np.clip(boxes[:, 2].astype(np.int64), 0, w)
+    y2 = np.clip(boxes[:, 3].astype(np.int64), 0, h)
+
+    blur = np.zeros(n, dtype=np.float64)
+    for j in range(n):
+        crop = img[y1[j]:y2[j], x1[j]:x2[j]]
+        if crop.size:
+            blur[j] = cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var()
+
+    face_px = np.minimum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    yaw = pitch = roll = np.full(n, np.nan)
+    if kpss is not None and n:
+        yaw, pitch, roll = _pose(np.asarray(kpss, dtype=np.float64).reshape(n, 5, 2))
+    return {"blur_score": blur, "face_px": face_px, "yaw": yaw, "pitch": pitch, "roll": roll}
+
+
+def _pose(kps: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(yaw, pitch, roll) in degrees for (n, 5, 2) landmarks, vectorised."""
+    left_eye, right_eye, nose = kps[:, 0], kps[:, 1], kps[:, 2]
+    mouth = (kps[:, 3] + kps[:, 4]) / 2
+    eye_vec = right_eye - left_eye
+    roll = np.degrees(np.arctan2(eye_vec[:, 1], eye_vec[:, 0]))
+
+    # Undo roll around the eye midpoint so yaw/pitch are measured upright
+    eye_mid = (left_eye + right_eye) / 2
+    c, s = np.cos(np.radians(-roll)), np.sin(np.radians(-roll))
+
+    def upright(p):
+        d = p - eye_mid
+        return np.stack([c * d[:, 0] - s * d[:, 1], s * d[:, 0] + c * d[:, 1]], axis=1)
+
+    nose_u, mouth_u = upright(nose), upright(mouth)
+    half_eye = np.maximum(np.linalg.norm(eye_vec, axis=1) / 2, 1e-6)
+    yaw = np.degrees(np.arcsin(np.clip(nose_u[:, 0] / half_eye, -1.0, 1.0)))
+    mouth_y = np.maximum(mouth_u[:, 1], 1e-6)
+    ratio = nose_u[:, 1] / mouth_y
+    pitch = np.degrees(np.arcsin(np.clip((ratio - _FRONTAL_NOSE_RATIO) / _FRONTAL_NOSE_RATIO, -1.0, 1.0)))
+    return yaw, pitch, roll
+
+
+@dataclass(frozen=True)
+class QualityGate:
+    """Thresholds a stored face must meet to take part in matching, clustering and display."""
+    min_blur_score: float = 5.0
+    min_face_px: float = 0.0
+    min_det_score: float = 0.0
+    max_yaw: float = 90.0
+    max_pitch: float = 90.0
+
+    @classmethod
+    def from_settings(cls) -> "QualityGate":
+        from src.utils.config_util import get_setting
+        return cls(
+            min_blur_score=float(get_setting("face_min_blur_score", cls.min_blur_score)),
+            min_face_px=float(get_setting("face_min_size_px", cls.min_face_px)),
+            min_det_score=float(get_setting("face_min_det_score", cls.min_det_score)),
+            max_yaw=float(get_setting("face_max_yaw", cls.max_yaw)),
+            max_pitch=float(get_setting("face_max_pitch", cls.max_pitch)),
+        )
+
+    def _checks(self) -> list[tuple[str, str, str, float]]:
+        """(column / attribute, comparison, parameter name, threshold) of every active limit."""
+        checks = []
+        if self.min_blur_score > 0:
+            checks.append(("blur_score", ">=", "q_min_blur", self.min_blur_score))
+        if self.min_face_px > 0:
+            checks.append(("face_px", ">=", "q_min_px", self.min_face_px))
+        if self.min_det_score > 0:
+            checks.append(("det_score", ">=", "q_min_score", self.min_det_score))
+        if self.max_yaw < 90:
+            checks.append(("yaw", "abs<=", "q_max_yaw", self.max_yaw))
+        if self.max_pitch < 90:
+            checks.append(("pitch", "abs<=", "q_max_pitch", self.max_pitch))
+        return checks
+
+    def sql(self, alias: str = "fd", pyformat: bool = False) -> tuple[str, dict]:
+        """
+        WHERE fragment over face_detections columns plus its bind parameters.
+
+        Parameters are :name style for text(), or %(name)s with pyformat=True
+        (raw DB-API cursors, e.g. pg_copy_util.copy_out).
+        """
+        prefix = f"{alias}." if alias else ""
+        clauses, params = [], {}
+        for column, op, param, value in self._checks():
+            col = f"{prefix}{column}"
+            bind = f"%({param})s" if pyformat else f":{param}"
+            expr = f"abs({col}) <= {bind}" if op == "abs<=" else f"{col} >= {bind}"
+            clauses.append(f"({col} IS NULL OR {expr})")
+            params[param] = value
+        return (" AND ".join(clauses) or "TRUE"), params
+
+    def passes(self, face) -> bool:
+        """Same test for a FaceResult (FaceResult.score is det_score)."""
+        for column, op, _, value in self._checks():
+            attr = getattr(face, "score" if column == "det_score" else column, None)
+            if attr is None or np.isnan(attr):
+                continue
+            if (abs(attr) > value) if op == "abs<=" else (attr < value):
+                return False
+        return True
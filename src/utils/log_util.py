@@ -15,7 +15,8 @@ class _JsonFormatter(logging.Formatter):
             "logger": record.name,
             "msg": record.getMessage(),
         }
-        for key in ("event", "duration_ms", "event_id", "media_id", "person_id", "face_id"):
+        for key in ("event", "duration_ms", "stage_ms", "prefill_ms", "prefix_tokens", "prefill_saved_ms",
+                    "event_id", "media_id", "person_id", "face_id"):
             val = getattr(record, key, None)
             if val is not None:
                 obj[key] = val
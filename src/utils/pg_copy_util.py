@@ -0,0 +1,97 @@
+"""
+pg_copy_util — PostgreSQL COPY ... FORMAT binary encoding for bulk inserts.
+
+Rows are built field by field (each field is already-encoded bytes or None for
+NULL) and streamed through the psycopg2 cursor underneath a SQLAlchemy session,
+so a bulk load shares the caller's transaction. Vectors use pgvector's own
+binary wire format (pgvector.Vector.to_binary) — no text formatting of floats.
+copy_out()/read_rows() go the other way for fixed-width rows, decoding straight
+into a numpy structured array.
+"""
+import io
+import json
+import struct
+from uuid import UUID
+
+import numpy as np
+
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+
+
+def encode_uuid(value) -> bytes:
+    return (value if isinstance(value, UUID) else UUID(str(value))).bytes
+
+
+def encode_bool(value) -> bytes:
+    return b"\x01" if value else b"\x00"
+
+
+def encode_float8(value) -> bytes:
+    return struct.pack(">d", float(value))
+
+
+def encode_json(value) -> bytes:
+    """json binary format is the UTF-8 JSON text itself (jsonb would need a version byte 1 prefix)."""
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def encode_vector(value) -> bytes:
+    from pgvector import Vector
+    return Vector(np.asarray(value, dtype=np.float32)).to_binary()
+
+
+def encode_row(fields) -> bytes:
+    """One tuple: field count, then (length, bytes) per field; length -1 is NULL."""
+    parts = [struct.pack(">h", len(fields))]
+    for field in fields:
+        if field is None:
+            parts.append(struct.pack(">i", -1))
+        else:
+            parts.append(struct.pack(">i", len(field)))
+            parts.append(field)
+    return b"".join(parts)
+
+
+def copy_out(db, query: str, params: dict | None = None) -> bytes:
+    """
+    Run COPY (query) TO STDOUT in binary format inside the session's transaction.
+
+    Returns:
+        The tuple data only (header and trailer stripped), ready for read_rows().
+    """
+    raw_conn = db.connection().connection
+    buf = io.BytesIO()
+    with raw_conn.cursor() as cur:
+        sql = cur.mogrify(query, params).decode("utf-8") if params else query
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT binary)", buf)
+    data = buf.getvalue()
+    ext_len = struct.unpack(">i", data[15:19])[0]
+    return data[19 + ext_len:-len(COPY_TRAILER)]
+
+
+def read_rows(data: bytes, dtype: np.dtype) -> np.ndarray:
+    """Decode fixed-size binary COPY tuples (no NULLs, fixed-width fields) into a structured array."""
+    return np.frombuffer(data, dtype=dtype)
+
+
+def copy_rows(db, table: str, columns: list[str], rows) -> None:
+    """
+    COPY encoded rows into table inside the SQLAlchemy session's transaction (no commit).
+
+    Args:
+        db: SQLAlchemy session from get_db().
+        table: Target table name.
+        columns: Column names, in field order.
+        rows: Iterable of bytes from encode_row() (or several rows already
+              packed together, e.g. a structured numpy array's tobytes()).
+    """
+    buf = io.BytesIO()
+    buf.write(COPY_HEADER)
+    for row in rows:
+        buf.write(row)
+    buf.write(COPY_TRAILER)
+    buf.seek(0)
+    raw_conn = db.connection().connection  # DBAPI (psycopg2) connection of this transaction
+    with raw_conn.cursor() as cur:
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)", buf)
@@ -2,6 +2,7 @@
 from __future__ import annotations
 import os
 import logging
+from typing import Iterator
 
 logger = logging.getLogger(__name__)
 
@@ -81,53 +82,67 @@ def generate_video_thumbnail(video_path: str, thumb_path: str) -> bool:
     return False
 
 
-def extract_key_frames(video_path: str, interval_seconds: float = 1.0) -> list[tuple]:
-    """Return (frame_array, timestamp_ms) sampled every `interval_seconds` for face detection."""
-    frames = []
+def _stream_rotation(video_stream) -> int:
+    """Clockwise display rotation in degrees from the stream's metadata (0 if none)."""
+    if video_stream.metadata:
+        return int(video_stream.metadata.get("rotate") or video_stream.metadata.get("rotation") or 0)
+    return 0
+
+
+def extract_key_frames(
+    video_path: str, interval_seconds: float = 1.0, max_side: int = 0
+) -> Iterator[tuple["np.ndarray", float]]:
+    """
+    Yield (BGR frame_array, timestamp_ms) for face detection, at most one frame per
+    `interval_seconds`, one frame at a time.
+
+    Only key frames are decoded (skip_frame=NONKEY, threaded decoding); a seek
+    lands on the preceding key frame anyway, so this samples the same frames the
+    old seek-per-interval loop did, without re-decoding a GOP per seek. With
+    max_side > 0 the frame is scaled down in libswscale's BGR conversion so its
+    longer side is at most max_side pixels. Memory use is a single frame,
+    whatever the length of the video.
+    """
     try:
         import av
         import numpy as np
         with av.open(video_path) as container:
             video_stream = next((s for s in container.streams if s.type == "video"), None)
             if video_stream is None:
-                return frames
-            
-            # Check for rotation metadata
-            rotation = 0
-            if video_stream.metadata:
-                rotation = int(video_stream.metadata.get("rotate") or video_stream.metadata.get("rotation") or 0)
-            
-            duration = container.duration
-            if not duration or duration <= 0:
-                for frame in container.decode(video=0):
-                    img = frame.to_image()
-                    if rotation != 0:
-                        img = img.rotate(-rotation, expand=True)
-                    frames.append((np.array(img)[:, :, ::-1].copy(), 0.0))
-                    break
-                return frames
-            
-            interval_us = int(interval_seconds * 1_000_000)
-            ts = 0
-            while ts < duration:
-                try:
-                    container.seek(ts)
-                    for frame in container.decode(video=0):
-                        img = frame.to_image()
-                        if rotation != 0:
-                            img = img.rotate(-rotation, expand=True)
-                        
-                        # frame.time is in seconds; convert to ms
-                        t_ms = float(frame.time * 1000.0) if frame.time is not None else float(ts / 1000.0)
-                        # Convert PIL RGB to BGR ndarray for insightface
-                        frames.append((np.array(img)[:, :, ::-1].copy(), t_ms))
-                        break
-                except Exception as e:
-                    logger.debug(f"Seek/decode error at {ts}us: {e}")
-                ts += interval_us
+                return
+            rotation = _stream_rotation(video_stream)
+            video_stream.thread_type = "AUTO"
+            video_stream.codec_context.skip_frame = "NONKEY"
+
+            interval_ms = interval_seconds * 1000.0
+            next_ms = None
+            for frame in container.decode(video_stream):
+                if frame.time is not None:
+                    t_ms = float(frame.time * 1000.0)
+                elif frame.dts is not None and frame.time_base is not None:
+                    t_ms = float(frame.dts * frame.time_base * 1000.0)
+                else:
+                    # No timestamp at all (some raw / broken streams): take every key frame,
+                    # one interval after the previous one, rather than stamping them all 0
+                    t_ms = next_ms if next_ms is not None else 0.0
+                if next_ms is not None and t_ms < next_ms:
+                    continue
+                next_ms = t_ms + interval_ms
+
+                width, height = frame.width, frame.height
+                scale = max_side / max(width, height) if max_side and max(width, height) > max_side else 1.0
+                arr = frame.to_ndarray(
+                    format="bgr24",
+                    width=max(1, round(width * scale)),
+                    height=max(1, round(height * scale)),
+                    interpolation="AREA",
+                )
+                if rotation % 360:
+                    # Same orientation as PIL's img.rotate(-rotation) in get_video_frame
+                    arr = np.ascontiguousarray(np.rot90(arr, k=(-rotation // 90) % 4))
+                yield arr, t_ms
     except Exception as e:
         logger.warning(f"Could not extract key frames from {video_path}: {e}")
-    return frames
 
 
 def get_video_frame(video_path: str, t_ms: float) -> "PIL.Image" | None:
@@ -0,0 +1,92 @@
+"""
+tests/test_caption_batch.py — Tests for CaptionService.analyse_batch: unreadable
+images are left out of the batch, and a failed batched call is retried one
+image at a time (model calls stubbed).
+"""
+
+import json
+import unittest
+from unittest import mock
+
+from src.services import grammar_service
+from src.services.caption_service import CaptionService
+
+
+def _answer(image) -> str:
+    return json.dumps({
+        "caption_tr": f"{image} numaralı fotoğrafta kürsüde konuşma yapan bir kişi görülüyor.",
+        "tags_tr": f"konuşma, kürsü, {image}",
+    }, ensure_ascii=False)
+
+
+def _prepare(img_path, max_side):
+    if img_path.startswith("bad"):
+        raise OSError("cannot identify image file")
+    return img_path.split(".")[0]  # stands in for the resized PIL image
+
+
+class TestCaptionBatch(unittest.TestCase):
+    def setUp(self):
+        # CaptionService is a singleton: every stub is patched on the instance and undone afterwards
+        self.service = CaptionService()
+        self.single_calls = []
+        for target, name, value in [
+            (grammar_service, "correct_grammar_if_enabled", lambda text: text),
+            (self.service, "_model", object()),
+            (self.service, "_processor", object()),
+            (self.service, "_load_model", lambda: None),
+            (self.service, "_prepare_image", _prepare),
+            (self.service, "_run_prompt", self._run_prompt),
+        ]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _stub_batch(self, run_prompts):
+        patcher = mock.patch.object(self.service, "_run_prompts", run_prompts)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run_prompt(self, image, prompt):
+        self.single_calls.append(image)
+        if image == "p3":
+            raise RuntimeError("generation failed")
+        return _answer(image)
+
+    def test_failed_batch_is_retried_per_image(self):
+        self._stub_batch(mock.Mock(side_effect=RuntimeError("CUDA out of memory")))
+        paths = ["p1.jpg", "bad.jpg", "p3.jpg", "p4.jpg"]
+
+        results = self.service.analyse_batch(paths, [["Ali"], None, None, None])
+
+        self.assertEqual([r.img_path for r in results], paths)
+        batch_images = self.service._run_prompts.call_args.args[0]
+        self.assertEqual(batch_images, ["p1", "p3", "p4"])
+        self.assertEqual(self.single_calls, ["p1", "p3", "p4"])
+        self.assertIn("kürsüde", results[0].caption_tr)
+        self.assertIn("p4", results[3].tags_tr)
+        self.assertIn("Resim hazırlanamadı", results[1].error)
+        self.assertEqual(results[2].error, "generation failed")
+        self.assertFalse(results[2].caption_tr)
+        self.assertFalse(results[0].error or results[3].error)
+
+    def test_batch_success_makes_no_single_calls(self):
+        self._stub_batch(lambda images, prompts: [_answer(image) for image in images])
+
+        results = self.service.analyse_batch(["p1.jpg", "p2.jpg"])
+
+        self.assertEqual(self.single_calls, [])
+        self.assertEqual([r.tags_tr for r in results], ["konuşma, kürsü, p1", "konuşma, kürsü, p2"])
+        self.assertEqual(results[0].duration, results[1].duration)
+
+    def test_single_image_failure_is_not_retried(self):
+        self._stub_batch(mock.Mock(side_effect=RuntimeError("CUDA out of memory")))
+
+        results = self.service.analyse_batch(["p1.jpg"])
+
+        self.assertEqual(self.single_calls, [])
+        self.assertEqual(results[0].error, "CUDA out of memory")
+
+
+if __name__ == "__main__":
+    unittest.main()
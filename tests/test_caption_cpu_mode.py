@@ -0,0 +1,54 @@
+"""
+tests/test_caption_cpu_mode.py — Tests for the int8 CPU captioning mode.
+"""
+
+import unittest
+from unittest import mock
+
+import torch
+
+from src.services.caption_service import CaptionService
+from src.utils import config_util
+
+
+class _VisionLanguageStub(torch.nn.Module):
+    """Layout of Qwen2.5-VL reduced to its linear layers."""
+
+    def __init__(self):
+        super().__init__()
+        self.visual = torch.nn.Sequential(torch.nn.Linear(16, 16))
+        self.language_model = torch.nn.Sequential(torch.nn.Linear(16, 32), torch.nn.ReLU(), torch.nn.Linear(32, 16))
+        self.lm_head = torch.nn.Linear(16, 50)
+
+    def forward(self, x):
+        return self.lm_head(self.language_model(self.visual(x)))
+
+
+class TestCaptionCpuMode(unittest.TestCase):
+    def tearDown(self):
+        CaptionService.configure_cpu()
+
+    def test_quantizes_decoder_linears_only(self):
+        torch.manual_seed(0)
+        model = _VisionLanguageStub().eval()
+        x = torch.randn(4, 16)
+        with torch.no_grad():
+            expected = model(x)
+            CaptionService.quantize_for_cpu(model)
+            actual = model(x)
+        self.assertIs(type(model.visual[0]), torch.nn.Linear)
+        self.assertIsNot(type(model.language_model[0]), torch.nn.Linear)
+        self.assertIsNot(type(model.lm_head), torch.nn.Linear)
+        self.assertEqual(expected.argmax(-1).tolist(), actual.argmax(-1).tolist())
+
+    def test_cpu_settings(self):
+        values = {"caption_cpu_precision": "INT8", "caption_cpu_threads": 0}
+        with mock.patch.object(config_util, "get_setting", lambda key, default=None: values.get(key, default)), \
+                mock.patch("os.cpu_count", return_value=12):
+            self.assertEqual((CaptionService.cpu_precision(), CaptionService.cpu_threads()), ("int8", 6))
+            CaptionService.configure_cpu("fp32", 3)
+            self.assertEqual((CaptionService.cpu_precision(), CaptionService.cpu_threads()), ("fp32", 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
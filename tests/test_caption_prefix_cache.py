@@ -0,0 +1,120 @@
+"""
+tests/test_caption_prefix_cache.py — The prompt prefix KV cache must not change
+what the captioning model generates.
+
+Runs a tiny randomly initialised Qwen2.5-VL (no download) with a character-level
+stand-in tokenizer; skipped when transformers is not installed.
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import torch
+
+from src.services.caption_service import CaptionService
+
+try:
+    from transformers import Qwen2_5_VLConfig, Qwen2_5_VLForConditionalGeneration
+except ImportError:
+    Qwen2_5_VLConfig = None
+
+IMAGE_TOKEN, VIDEO_TOKEN, VISION_START, VISION_END = 251, 252, 253, 254
+SPECIAL = {"<|vision_start|>": VISION_START, "<|image_pad|>": IMAGE_TOKEN, "<|vision_end|>": VISION_END}
+PAD = 0
+IMAGE = "<|vision_start|>" + "<|image_pad|>" * 4 + "<|vision_end|>"  # 4×4 patch grid after 2×2 merge
+PREFIX = "system: you are a helpful assistant. user: describe the photo as Turkish json "
+
+
+def _encode(text: str) -> list[int]:
+    ids, i = [], 0
+    while i < len(text):
+        for token, token_id in SPECIAL.items():
+            if text.startswith(token, i):
+                ids.append(token_id)
+                i += len(token)
+                break
+        else:
+            ids.append(10 + ord(text[i]) % 200)
+            i += 1
+    return ids
+
+
+class _CharTokenizer:
+    pad_token_id = PAD
+
+    def __call__(self, text, add_special_tokens=False, return_tensors="pt"):
+        return SimpleNamespace(input_ids=torch.tensor([_encode(text)]))
+
+
+def _tiny_model():
+    torch.manual_seed(0)
+    config = Qwen2_5_VLConfig(
+        text_config=dict(
+            initializer_range=0.3, vocab_size=300, hidden_size=64, intermediate_size=128,
+            num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=2,
+            rope_scaling={"type": "mrope", "mrope_section": [2, 3, 3]}, max_position_embeddings=4096,
+        ),
+        vision_config=dict(
+            depth=2, hidden_size=32, out_hidden_size=64, num_heads=2, intermediate_size=64,
+            patch_size=14, spatial_merge_size=2, temporal_patch_size=2, window_size=112,
+            fullatt_block_indexes=[1], in_channels=3,
+        ),
+        initializer_range=0.3, image_token_id=IMAGE_TOKEN, video_token_id=VIDEO_TOKEN,
+        vision_start_token_id=VISION_START, vision_end_token_id=VISION_END,
+    )
+    return Qwen2_5_VLForConditionalGeneration(config).eval()
+
+
+@unittest.skipIf(Qwen2_5_VLConfig is None, "transformers with Qwen2.5-VL is not installed")
+class TestCaptionPrefixCache(unittest.TestCase):
+    def setUp(self):
+        CaptionService._prefix_cache = None
+        CaptionService._prefix_cache_broken = False
+        patcher = mock.patch.object(
+            CaptionService, "GENERATE_KWARGS", dict(CaptionService.GENERATE_KWARGS, max_new_tokens=12)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        CaptionService._prefix_cache = None
+        CaptionService._prefix_cache_broken = False
+
+    def test_matches_plain_generate_for_prompts_of_different_lengths(self):
+        model = _tiny_model()
+        service = CaptionService()  # singleton: the stand-ins are patched in and undone afterwards
+        for name, value in [
+            ("_model", model), ("_processor", SimpleNamespace(tokenizer=_CharTokenizer())), ("_device", "cpu"),
+        ]:
+            patcher = mock.patch.object(service, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # Two images, one prompt with a names hint: rows of different lengths, left-padded as the processor does
+        texts = [PREFIX + IMAGE + " names: Ali Veli.\nassistant:", PREFIX + IMAGE + "\nassistant:"]
+        rows = [_encode(t) for t in texts]
+        width = max(map(len, rows))
+        input_ids = torch.tensor([[PAD] * (width - len(r)) + r for r in rows])
+        attention_mask = torch.tensor([[0] * (width - len(r)) + [1] * len(r) for r in rows])
+        inputs = SimpleNamespace(
+            input_ids=input_ids, attention_mask=attention_mask,
+            pixel_values=torch.randn(32, 1176), image_grid_thw=torch.tensor([[1, 4, 4], [1, 4, 4]]),
+        )
+
+        with torch.no_grad():
+            plain = model.generate(
+                input_ids=input_ids, attention_mask=attention_mask, pixel_values=inputs.pixel_values,
+                image_grid_thw=inputs.image_grid_thw, pad_token_id=PAD, **CaptionService.GENERATE_KWARGS,
+            )
+        expected = [row[width:].tolist() for row in plain]
+
+        # First call fills the prefix cache, the second one reuses it
+        for _ in range(2):
+            generated, prompt_ids = service._generate_with_prefix_cache(texts[0], inputs)
+            self.assertEqual([row[prompt_ids.shape[1]:].tolist() for row in generated], expected)
+        self.assertIsNotNone(CaptionService._prefix_cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+tests/test_face_batch_pipeline.py — FaceBatchPipeline keeps input order through
+its decode / detect / persist stages (stub services, no model or database).
+"""
+
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from src.services.face_analysis_service import FaceAnalysisService
+from src.services.face_batch_pipeline import FaceBatchPipeline
+
+
+class _MediaService:
+    def __init__(self, processed: set[str]):
+        self.ids: dict[str, uuid.UUID] = {}
+        self.marked: list[uuid.UUID] = []
+        self._processed = processed
+        self._lock = threading.Lock()
+
+    def ensure_media_exists(self, event_id, file_path, media_type):
+        with self._lock:
+            return self.ids.setdefault(file_path, uuid.uuid4())
+
+    def get_by_file_path(self, file_path):
+        return {"face_detected_at": "2024-01-01" if file_path in self._processed else None}
+
+    def save_iptc_data(self, media_id, meta):
+        pass
+
+    def mark_face_detected_many(self, media_ids):
+        self.marked.extend(media_ids)
+
+
+class _FaceService:
+    """One fake face per photo, tagged with the path it was detected in."""
+
+    def __init__(self):
+        self.batches: list[list[str]] = []
+        self.saved: list[tuple[uuid.UUID, list]] = []
+
+    def detect_faces_from_arrays(self, images, paths=None):
+        self.batches.append(list(paths))
+        return [[SimpleNamespace(embedding=np.ones(4, np.float32), path=p)] for p in paths]
+
+    def find_similar_persons(self, embeddings):
+        return [(None, 0.0)] * len(embeddings)
+
+    def save_faces_batch(self, items, assignments=None):
+        self.saved.extend(items)
+
+    def delete_faces_for_media(self, media_id):
+        pass
+
+
+class _BrokenPool:
+    workers = 1
+
+    def submit_arrays(self, imgs, sources=None, triage=False):
+        raise BrokenProcessPool("a worker died")
+
+    def submit_paths(self, paths, max_side=0):
+        raise BrokenProcessPool("a worker died")
+
+
+class TestFaceBatchPipeline(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.paths = []
+        for i in range(12):
+            path = os.path.join(self._tmp.name, f"photo_{i:02d}.jpg")
+            Image.new("RGB", (64, 48), (i * 20, 0, 0)).save(path)
+            self.paths.append(path)
+        self.paths.insert(4, os.path.join(self._tmp.name, "notes.txt"))  # unsupported type: an error item
+        self.processed = {self.paths[7]}                                # already done: skipped
+
+    def test_items_keep_input_order(self):
+        media_svc, face_svc = _MediaService(self.processed), _FaceService()
+        decode = FaceAnalysisService.decode_image
+        rng = random.Random(0)
+
+        def slow_decode(path, max_side=0, tile=False):
+            # Finish decodes out of order
+            time.sleep(rng.random() * 0.02)
+            return decode(path, max_side, tile)
+
+        progress, processed = [], []
+        with mock.patch.object(FaceAnalysisService, "decode_image", staticmethod(slow_decode)):
+            pipeline = FaceBatchPipeline(
+                face_svc, media_svc, None, uuid.uuid4(), decode_workers=4, batch_size=3,
+                write_batch_size=2, queue_size=4, decode_max_side=0, use_cache=False,
+            )
+            pipeline.run(self.paths, on_progress=lambda cur, tot: progress.append(cur), on_processed=processed.append)
+
+        total = len(self.paths)
+        photos = [p for p in self.paths if p.endswith(".jpg") and p not in self.processed]
+        self.assertEqual(progress, list(range(1, total + 1)))
+        self.assertEqual(processed, [p for p in self.paths if p not in self.processed])
+        self.assertEqual([p for batch in face_svc.batches for p in batch], photos)
+        self.assertTrue(all(len(batch) <= 3 for batch in face_svc.batches))
+        # Every media id is stored with the faces of its own file, in input order
+        self.assertEqual([media_id for media_id, _ in face_svc.saved], [media_svc.ids[p] for p in photos])
+        self.assertEqual([results[0].path for _, results in face_svc.saved], photos)
+        self.assertEqual(media_svc.marked, [media_svc.ids[p] for p in photos])
+
+
+    def _run_in_thread(self, pipeline) -> list:
+        """Run the pipeline with a deadline; returns [stage_ms] or [exception]."""
+        outcome = []
+
+        def target():
+            try:
+                outcome.append(pipeline.run(self.paths))
+            except Exception as e:
+                outcome.append(e)
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(timeout=20)
+        self.assertFalse(thread.is_alive(), "pipeline.run() hung")
+        return outcome
+
+    def test_broken_process_pool_fails_files_instead_of_hanging(self):
+        media_svc = _MediaService(self.processed)
+        with self.assertLogs("src.services.face_batch_pipeline", level="WARNING"):
+            outcome = self._run_in_thread(FaceBatchPipeline(
+                _FaceService(), media_svc, None, uuid.uuid4(), decode_workers=2, batch_size=2,
+                queue_size=1, decode_max_side=0, use_cache=False, process_pool=_BrokenPool(),
+            ))
+        self.assertIsInstance(outcome[0], dict)
+        self.assertEqual(media_svc.marked, [])  # every photo failed, none is marked as done
+
+    def test_detect_error_does_not_block_the_feeder(self):
+        pipeline = FaceBatchPipeline(
+            _FaceService(), _MediaService(self.processed), None, uuid.uuid4(), decode_workers=2,
+            batch_size=2, queue_size=1, decode_max_side=0, use_cache=False,
+        )
+        with mock.patch.object(pipeline, "_flush_photos", side_effect=RuntimeError("detector crashed")):
+            outcome = self._run_in_thread(pipeline)
+        self.assertIsInstance(outcome[0], RuntimeError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+tests/test_face_clustering.py — Tests for clustering of unassigned face embeddings.
+"""
+
+import unittest
+import uuid
+from unittest import mock
+
+import numpy as np
+
+from src.services import face_clustering
+from src.services.face_service import FaceService
+
+
+def _identities(n_ids, per_id, noise=0.03, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = face_clustering.normalise(rng.standard_normal((n_ids, 512)).astype(np.float32))
+    labels = np.repeat(np.arange(n_ids), per_id)
+    rng.shuffle(labels)
+    vectors = centres[labels] + noise * rng.standard_normal((len(labels), 512)).astype(np.float32)
+    return face_clustering.normalise(vectors), labels, centres
+
+
+class _ClusterRepository:
+    """In-memory stand-in for the clustering part of FaceRepository."""
+
+    def __init__(self):
+        self.faces = {}  # id bytes -> [unit vector, cluster id bytes or None, seen by a run]
+        self.saved = []   # face ids written by each save_face_clusters call
+        self.stored = None
+
+    def add(self, vectors, cluster=None, seen=None):
+        for v in vectors:
+            self.faces[uuid.uuid4().bytes] = [v, cluster, cluster is not None if seen is None else seen]
+
+    def count_unseen_unassigned_faces(self):
+        return sum(1 for _, _, seen in self.faces.values() if not seen)
+
+    def load_unassigned_embeddings(self, scope="all"):
+        keep = {
+            "all": lambda cid, seen: True,
+            "unseen": lambda cid, seen: not seen,
+            "leftovers": lambda cid, seen: cid is None and seen,
+        }[scope]
+        return self._rows([fid for fid, (_, cid, seen) in self.faces.items() if keep(cid, seen)])
+
+    def unassigned_ann_index_ready(self):
+        return True
+
+    def find_leftover_neighbours(self, face_ids, k, max_distance):
+        ids = list(self.faces)
+        matrix = np.array([self.faces[fid][0] for fid in ids], np.float32)
+        near = set()
+        for fid in face_ids:
+            dist = 1 - matrix @ self.faces[bytes(fid)][0]
+            for j in np.argsort(dist)[:k]:
+                _, cid, seen = self.faces[ids[j]]
+                if cid is None and seen and dist[j] < max_distance:
+                    near.add(ids[j])
+        return self._rows(sorted(near))
+
+    def _rows(self, ids):
+        vectors = np.array([self.faces[fid][0] for fid in ids], np.float32).reshape(-1, 512)
+        return np.array(ids, dtype="V16"), vectors
+
+    def get_cluster_centroids(self):
+        groups = {}
+        for v, cid, _ in self.faces.values():
+            if cid is not None:
+                groups.setdefault(cid, []).append(v)
+        ids = list(groups)
+        return (np.array(ids, dtype="V16"), np.array([len(groups[c]) for c in ids], np.int64),
+                np.array([np.sum(groups[c], axis=0) for c in ids], np.float32).reshape(-1, 512))
+
+    def save_face_clusters(self, face_ids, cluster_ids, reset=False, centroids=None):
+        self.saved.append({bytes(fid) for fid in face_ids})
+        if reset:
+            for face in self.faces.values():
+                face[1] = None
+            self.stored = centroids
+        for fid, cid in zip(face_ids, cluster_ids):
+            fid = bytes(fid)
+            self.faces[fid][1] = None if bytes(cid) == bytes(16) else bytes(cid)
+            self.faces[fid][2] = True
+
+
+class TestFaceClustering(unittest.TestCase):
+    def test_clusters_match_identities(self):
+        vectors, labels, _ = _identities(30, 12)
+        clusters = face_clustering.cluster_embeddings(vectors)
+        self.assertTrue((clusters >= 0).all())
+        for c in np.unique(clusters):
+            self.assertEqual(len(np.unique(labels[clusters == c])), 1)  # pure
+        for ident in range(30):
+            self.assertEqual(len(np.unique(clusters[labels == ident])), 1)  # complete
+
+    def test_small_groups_stay_unclustered(self):
+        vectors, labels, _ = _identities(5, 10)
+        rng = np.random.default_rng(1)
+        loners = face_clustering.normalise(rng.standard_normal((4, 512)).astype(np.float32))
+        clusters = face_clustering.cluster_embeddings(np.vstack([vectors, loners]))
+        self.assertTrue((clusters[-4:] == -1).all())
+        self.assertEqual(len(np.unique(clusters[:-4])), 5)
+
+    def test_attach_to_centroids(self):
+        vectors, labels, centres = _identities(4, 5, seed=2)
+        far = face_clustering.normalise(np.random.default_rng(3).standard_normal((1, 512)).astype(np.float32))
+        attached = face_clustering.attach_to_centroids(np.vstack([vectors, far]), centres)
+        np.testing.assert_array_equal(attached[:-1], labels)
+        self.assertEqual(attached[-1], -1)
+
+    def test_leftovers_from_earlier_batches_form_a_cluster(self):
+        vectors, labels, _ = _identities(2, 12, seed=4)
+        repo = _ClusterRepository()
+        repo.add(vectors[labels == 0], cluster=uuid.uuid4().bytes)  # an existing cluster
+        newcomer = vectors[labels == 1]
+        service = FaceService(repo, mock.Mock())
+
+        repo.add(newcomer[:2])  # below MIN_CLUSTER_SIZE on its own
+        self.assertEqual(service.cluster_unassigned_faces()["mode"], "incremental")
+        self.assertEqual(len(repo.get_cluster_centroids()[0]), 1)
+
+        repo.add(newcomer[2:3])  # a later batch brings the third face
+        self.assertEqual(service.cluster_unassigned_faces()["mode"], "incremental")
+        cluster_ids, counts, _ = repo.get_cluster_centroids()
+        self.assertEqual(sorted(counts.tolist()), [3, 12])
+
+    def test_leftovers_far_from_new_faces_are_not_read(self):
+        vectors, labels, _ = _identities(3, 12, seed=5)
+        repo = _ClusterRepository()
+        repo.add(vectors[labels == 0], cluster=uuid.uuid4().bytes)
+        repo.add(vectors[labels == 1][:2], seen=True)  # leftovers of an earlier run
+        repo.add(vectors[labels == 2][:1])             # an unrelated new face
+
+        self.assertEqual(FaceService(repo, mock.Mock()).cluster_unassigned_faces()["mode"], "incremental")
+        self.assertEqual(len(repo.saved[-1]), 1)  # only the new face, not the leftover pair
+        self.assertEqual(len(repo.get_cluster_centroids()[0]), 1)
+
+    def test_full_run_stores_centroids(self):
+        vectors, labels, _ = _identities(3, 5, seed=6)
+        repo = _ClusterRepository()
+        repo.add(vectors)
+        self.assertEqual(FaceService(repo, mock.Mock()).cluster_unassigned_faces()["mode"], "full")
+        ids, counts, sums = repo.get_cluster_centroids()
+        order = np.argsort(ids)
+        stored_ids, stored_counts, stored_sums = repo.stored
+        stored_order = np.argsort(stored_ids)
+        np.testing.assert_array_equal(stored_ids[stored_order], ids[order])
+        np.testing.assert_array_equal(stored_counts[stored_order], counts[order])
+        np.testing.assert_allclose(stored_sums[stored_order], sums[order], atol=1e-5)
+
+    def test_clustering_waits_for_enough_new_faces(self):
+        vectors, labels, _ = _identities(2, 20, seed=7)
+        repo = _ClusterRepository()
+        repo.add(vectors[labels == 0], cluster=uuid.uuid4().bytes)
+        repo.add(vectors[labels == 1][:3])
+        service = FaceService(repo, mock.Mock())
+        with mock.patch("src.utils.config_util.get_setting", return_value=5):
+            self.assertIsNone(service.cluster_unassigned_faces_if_due())
+            self.assertEqual(repo.saved, [])
+        with mock.patch("src.utils.config_util.get_setting", return_value=3):
+            self.assertEqual(service.cluster_unassigned_faces_if_due()["mode"], "incremental")
+        self.assertEqual(sorted(repo.get_cluster_centroids()[1].tolist()), [3, 20])
+
+
+if __name__ == "__main__":
+    unittest.main()
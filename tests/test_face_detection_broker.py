@@ -0,0 +1,95 @@
+"""
+tests/test_face_detection_broker.py — Tests for coalescing face detection requests per file.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from src.services.face_detection_broker import FaceDetectionBroker, ModelLock
+
+
+class TestFaceDetectionBroker(unittest.TestCase):
+    def setUp(self):
+        self.broker = FaceDetectionBroker()
+        self.broker.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.paths = []
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            path = os.path.join(self.dir.name, name)
+            with open(path, "wb") as f:
+                f.write(name.encode())
+            self.paths.append(path)
+        self.calls = []
+
+    def _run(self, paths, gate=None):
+        def run(idx):
+            self.calls.append([os.path.basename(paths[i]) for i in idx])
+            if gate is not None:
+                gate.wait(5)
+            return [[os.path.basename(paths[i])] for i in idx]
+        return run
+
+    def test_in_flight_request_is_shared(self):
+        gate = threading.Event()
+        batch_out = {}
+        batch = threading.Thread(target=lambda: batch_out.update(
+            r=self.broker.detect(self.paths[:2], "sig", self._run(self.paths[:2], gate))
+        ))
+        batch.start()
+        while not self.calls:
+            time.sleep(0.01)
+        # The single view opens b.jpg while the batch is detecting it
+        waiting = threading.Thread(target=lambda: batch_out.update(
+            ui=self.broker.detect([self.paths[1]], "sig", self._run([self.paths[1]]), interactive=True)
+        ))
+        waiting.start()
+        time.sleep(0.05)
+        gate.set()
+        batch.join(5)
+        waiting.join(5)
+        self.assertEqual(self.calls, [["a.jpg", "b.jpg"]])
+        self.assertEqual(batch_out["ui"], [["b.jpg"]])
+        self.assertEqual(batch_out["r"], [["a.jpg"], ["b.jpg"]])
+
+    def test_recent_result_reused_until_file_changes(self):
+        self.broker.detect([self.paths[0]], "sig", self._run([self.paths[0]]), interactive=True)
+        results = self.broker.detect(self.paths, "sig", self._run(self.paths))
+        self.assertEqual(results, [["a.jpg"], ["b.jpg"], ["c.jpg"]])
+        self.assertEqual(self.calls, [["a.jpg"], ["b.jpg", "c.jpg"]])
+
+        self.broker.detect([self.paths[0]], "other-model", self._run([self.paths[0]]))
+        st = os.stat(self.paths[1])
+        os.utime(self.paths[1], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        self.broker.detect(self.paths[:2], "sig", self._run(self.paths[:2]))
+        self.assertEqual(self.calls[2:], [["a.jpg"], ["b.jpg"]])
+
+    def test_interactive_thread_acquires_model_lock_first(self):
+        lock, order = ModelLock(), []
+        lock.acquire()
+
+        def take(name, interactive):
+            if interactive:
+                with lock.interactive(), lock:
+                    order.append(name)
+            else:
+                with lock:
+                    order.append(name)
+
+        batch = threading.Thread(target=take, args=("batch", False))
+        batch.start()
+        time.sleep(0.05)
+        ui = threading.Thread(target=take, args=("ui", True))
+        ui.start()
+        time.sleep(0.05)
+        lock.release()
+        batch.join(5)
+        ui.join(5)
+        self.assertEqual(order, ["ui", "batch"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+tests/test_face_process_pool.py — FaceProcessPool hands decoded arrays to spawned
+workers through shared memory intact and in order, and releases the blocks
+(stub detector in the workers, no model).
+"""
+
+import time
+import unittest
+from multiprocessing import resource_tracker, shared_memory
+from unittest import mock
+
+import numpy as np
+
+from src.services import face_process_pool
+from src.services.face_analysis_service import FaceAnalysisService
+from src.services.face_process_pool import FaceProcessPool
+
+
+def _describe(self, imgs, sources=None):
+    """Stub detect_from_arrays: what the worker saw, per array."""
+    sources = sources or [None] * len(imgs)
+    return [[(src, img.shape, img.dtype.str, img.tobytes())] for img, src in zip(imgs, sources)]
+
+
+def _bright(self, imgs):
+    """Stub triage_from_arrays."""
+    return [bool(img.max() > 128) for img in imgs]
+
+
+def _init_stub_worker(intra_op_threads):
+    FaceAnalysisService.detect_from_arrays = _describe
+    FaceAnalysisService.triage_from_arrays = _bright
+
+
+def _exists(name: str) -> bool:
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    resource_tracker.unregister(shm._name, "shared_memory")
+    shm.close()
+    return True
+
+
+class TestFaceProcessPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with mock.patch.object(face_process_pool, "_init_worker", _init_stub_worker):
+            cls.pool = FaceProcessPool(workers=2, intra_op_threads=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def _live_blocks(self) -> list[str]:
+        with self.pool._shm_lock:
+            return list(self.pool._live_shm)
+
+    def test_arrays_round_trip(self):
+        rng = np.random.default_rng(0)
+        imgs = [
+            rng.integers(0, 256, (48, 64, 3), dtype=np.uint8),
+            rng.integers(0, 256, (7, 5, 3), dtype=np.uint8),
+            rng.standard_normal((3, 4)).astype(np.float32),
+            np.asfortranarray(rng.integers(0, 256, (16, 9, 3), dtype=np.uint8)),
+        ]
+        sources = ["a.jpg", None, "c.jpg", "d.jpg"]
+        names, create = [], shared_memory.SharedMemory
+
+        def recording(*args, **kwargs):
+            shm = create(*args, **kwargs)
+            names.append(shm.name)
+            return shm
+
+        with mock.patch.object(shared_memory, "SharedMemory", recording):
+            futures = [self.pool.submit_arrays(imgs, sources), self.pool.submit_arrays(imgs[::-1])]
+        results = [f.result() for f in futures]
+
+        self.assertEqual(len(results[0]), len(imgs))
+        for (src, shape, dtype, data), img, expected_src in zip((r[0] for r in results[0]), imgs, sources):
+            self.assertEqual((src, shape, dtype), (expected_src, img.shape, img.dtype.str))
+            np.testing.assert_array_equal(np.frombuffer(data, dtype=dtype).reshape(shape), img)
+        self.assertEqual([r[0][1] for r in results[1]], [img.shape for img in imgs[::-1]])
+
+        # Both blocks are unlinked by the futures' done callbacks
+        self.assertEqual(len(names), 2)
+        deadline = time.monotonic() + 5
+        while any(_exists(name) for name in names) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(any(_exists(name) for name in names))
+        self.assertEqual(self._live_blocks(), [])
+
+    def test_triage(self):
+        imgs = [np.zeros((8, 8, 3), np.uint8), np.full((6, 4, 3), 255, np.uint8)]
+        self.assertEqual(self.pool.submit_arrays(imgs, triage=True).result(), [False, True])
+
+    def test_empty_batch(self):
+        self.assertEqual(self.pool.detect_arrays([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
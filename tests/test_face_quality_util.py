@@ -0,0 +1,61 @@
+"""
+tests/test_face_quality_util.py — Tests for face quality measurement and the query-time quality gate.
+"""
+
+import unittest
+
+import numpy as np
+
+from src.services.face_analysis_service import FaceResult
+from src.utils.face_quality_util import QualityGate, measure_faces
+
+# ArcFace 112×112 reference landmarks: a frontal, upright face
+_TEMPLATE = np.array([[38.29, 51.70], [73.53, 51.50], [56.03, 71.74], [41.55, 92.37], [70.73, 92.20]])
+
+
+def _rotate(kps, degrees):
+    centre = kps.mean(axis=0)
+    a = np.radians(degrees)
+    rot = np.array([[np.cos(a), -np.sin(a)], [np.sin(a), np.cos(a)]])
+    return (kps - centre) @ rot.T + centre
+
+
+class TestFaceQuality(unittest.TestCase):
+    def test_measure_faces(self):
+        rng = np.random.default_rng(0)
+        img = np.full((200, 300, 3), 128, dtype=np.uint8)
+        img[20:132, 20:132] = rng.integers(0, 255, (112, 112, 3), dtype=np.uint8)  # sharp texture
+        bboxes = np.array([[20, 20, 132, 132, 0.9], [160, 40, 240, 180, 0.8]], dtype=np.float32)
+        turned = _TEMPLATE.copy()
+        turned[2, 0] += 12  # nose shifted right: head turned
+        kpss = np.stack([_rotate(_TEMPLATE, 20) + 20, turned + 160])
+        q = measure_faces(img, bboxes, kpss)
+        self.assertGreater(q["blur_score"][0], 1000)
+        self.assertEqual(q["blur_score"][1], 0.0)  # flat grey crop
+        np.testing.assert_allclose(q["face_px"], [112, 80])
+        self.assertAlmostEqual(q["roll"][0], 20, delta=1)
+        self.assertLess(abs(q["yaw"][0]), 3)
+        self.assertLess(abs(q["pitch"][0]), 3)
+        self.assertGreater(q["yaw"][1], 30)
+        self.assertTrue(np.isnan(measure_faces(img, bboxes, None)["yaw"]).all())
+
+    def test_gate(self):
+        face = FaceResult(0, 0, 1, 1, np.zeros(512, np.float32), 0.9, blur_score=3.0, yaw=50.0)
+        legacy = FaceResult(0, 0, 1, 1, np.zeros(512, np.float32), 0.9)
+        self.assertFalse(QualityGate().passes(face))
+        self.assertTrue(QualityGate().passes(legacy))
+        self.assertTrue(QualityGate(min_blur_score=2.0).passes(face))
+        self.assertFalse(QualityGate(min_blur_score=2.0, max_yaw=45).passes(face))
+
+        sql, params = QualityGate(min_blur_score=2.0, max_yaw=45).sql("fd")
+        self.assertEqual(
+            sql, "(fd.blur_score IS NULL OR fd.blur_score >= :q_min_blur) AND "
+                 "(fd.yaw IS NULL OR abs(fd.yaw) <= :q_max_yaw)"
+        )
+        self.assertEqual(params, {"q_min_blur": 2.0, "q_max_yaw": 45})
+        self.assertIn("%(q_min_blur)s", QualityGate().sql("", pyformat=True)[0])
+        self.assertEqual(QualityGate(min_blur_score=0).sql(), ("TRUE", {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
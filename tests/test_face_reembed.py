@@ -0,0 +1,78 @@
+"""
+tests/test_face_reembed.py — Tests for re-embedding stored faces from their chips.
+"""
+
+import unittest
+import uuid
+from unittest import mock
+
+import numpy as np
+
+from src.services.face_analysis_service import FaceAnalysisService
+from src.services.face_service import FaceService
+
+
+class _ChipRepository:
+    """In-memory stand-in for the face_chips / job_checkpoints part of FaceRepository."""
+
+    def __init__(self, chips):
+        self.chips = dict(chips)
+        self.embeddings = {}
+        self.checkpoint = None
+
+    def count_face_chips(self, after=None):
+        return sum(1 for fid in self.chips if after is None or fid > after)
+
+    def load_face_chips(self, after, limit):
+        return [(fid, self.chips[fid]) for fid in sorted(self.chips) if after is None or fid > after][:limit]
+
+    def save_reembedded(self, job, face_ids, embeddings, position, processed):
+        self.embeddings.update(zip(face_ids, embeddings))
+        self.checkpoint = {"position": str(position), "processed": processed}
+
+    def get_job_checkpoint(self, job):
+        return self.checkpoint
+
+    def delete_job_checkpoint(self, job):
+        self.checkpoint = None
+
+
+class TestFaceReembed(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.chips = {}
+        for shade in range(5):
+            chip = np.full((112, 112, 3), shade * 40, np.uint8) + rng.integers(0, 5, (112, 112, 3), dtype=np.uint8)
+            self.chips[uuid.uuid4()] = FaceAnalysisService.encode_chip(chip)
+        self.repo = _ChipRepository(self.chips)
+        self.service = FaceService(self.repo, mock.Mock())
+        # Recognizer stand-in: the chip's mean brightness as a 1-d "embedding"
+        patcher = mock.patch.object(
+            FaceAnalysisService, "embed_chips", lambda _self, chips: [np.array([c.mean()]) for c in chips]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_resumes_from_checkpoint(self):
+        calls = iter([False, True])  # stop after the first batch
+        stats = self.service.reembed_faces(batch_size=2, should_stop=lambda: next(calls))
+        self.assertEqual((stats["faces"], stats["finished"]), (2, False))
+        self.assertEqual(self.repo.checkpoint["processed"], 2)
+
+        stats = self.service.reembed_faces(batch_size=2)
+        self.assertEqual((stats["faces"], stats["total"], stats["resumed"], stats["finished"]), (3, 5, True, True))
+        self.assertIsNone(self.repo.checkpoint)
+        self.assertEqual(set(self.repo.embeddings), set(self.chips))
+        brightness = [float(self.repo.embeddings[fid][0]) for fid in self.chips]
+        np.testing.assert_allclose(brightness, [2 + 40 * i for i in range(5)], atol=1.5)  # JPEG round trip
+
+    def test_unreadable_chip_is_skipped(self):
+        bad = max(self.chips)
+        self.repo.chips[bad] = b"not a jpeg"
+        stats = self.service.reembed_faces()
+        self.assertEqual((stats["faces"], stats["finished"]), (4, True))
+        self.assertNotIn(bad, self.repo.embeddings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+tests/test_face_result_cache.py — Tests for content-addressed face detection cache keys and storage.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src.services import face_result_cache
+from src.services.face_analysis_service import FaceResult
+
+
+class TestFaceResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_pack_roundtrip(self):
+        emb = np.random.default_rng(0).standard_normal(512).astype(np.float32)
+        faces = [
+            FaceResult(0.1, 0.2, 0.3, 0.4, emb, 0.9),
+            FaceResult(0.5, 0.5, 0.7, 0.8, -emb, 0.8, timestamp_ms=2000.0,
+                       track_start_ms=1000.0, track_end_ms=5000.0,
+                       blur_score=42.0, face_px=96.0, yaw=-12.5, pitch=3.0, roll=1.5,
+                       chip=b"\xff\xd8jpeg\xff\xd9"),
+        ]
+        restored = face_result_cache.unpack_results(face_result_cache.pack_results(faces))
+        self.assertEqual(len(restored), 2)
+        for a, b in zip(faces, restored):
+            self.assertEqual((a.x1, a.y1, a.x2, a.y2, a.score), (b.x1, b.y1, b.x2, b.y2, b.score))
+            for name in ("timestamp_ms", "track_start_ms", "track_end_ms", "blur_score", "yaw", "chip"):
+                self.assertEqual(getattr(a, name), getattr(b, name))
+            np.testing.assert_array_equal(a.embedding, b.embedding)
+        self.assertEqual(face_result_cache.unpack_results(face_result_cache.pack_results([])), [])
+
+    def test_content_hash_ignores_path(self):
+        data = os.urandom(300_000)
+        a = self._write("a.jpg", data)
+        b = self._write("copy_of_a.jpg", data)
+        c = self._write("c.jpg", data[:-1] + b"\x00")
+        self.assertEqual(face_result_cache.content_hash(a), face_result_cache.content_hash(b))
+        self.assertNotEqual(face_result_cache.content_hash(a), face_result_cache.content_hash(c))
+        with mock.patch.object(face_result_cache, "FULL_HASH_LIMIT", 1024):
+            sampled = face_result_cache.content_hash(a)
+        self.assertTrue(sampled.startswith("s:"))
+        self.assertNotEqual(sampled, face_result_cache.content_hash(a))
+
+    def test_signature_tracks_parameters(self):
+        base = face_result_cache.detection_signature(1280)
+        self.assertNotEqual(base, face_result_cache.detection_signature(0))
+        self.assertNotEqual(base, face_result_cache.detection_signature(1280, video=True))
+        with mock.patch.object(face_result_cache, "DET_SIZE", (320, 320)):
+            self.assertNotEqual(base, face_result_cache.detection_signature(1280))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+tests/test_face_session_options.py — Tests for ONNX Runtime session settings and model pack selection.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import onnxruntime as ort
+
+from src.services.face_analysis_service import INT8_SUFFIX, MODEL_NAME, FaceAnalysisService
+from src.utils import config_util
+
+
+def _settings(**values):
+    return mock.patch.object(config_util, "get_setting", lambda key, default=None: values.get(key, default))
+
+
+class TestFaceSessionOptions(unittest.TestCase):
+    def tearDown(self):
+        FaceAnalysisService.configure_session()
+
+    def test_session_options_from_settings(self):
+        with _settings(face_ort_graph_optimization="basic", face_ort_intra_op_threads=3,
+                       face_ort_execution_mode="parallel", face_ort_mem_arena=False):
+            options = FaceAnalysisService.session_options()
+        self.assertEqual(options.graph_optimization_level, ort.GraphOptimizationLevel.ORT_ENABLE_BASIC)
+        self.assertEqual(options.intra_op_num_threads, 3)
+        self.assertEqual(options.execution_mode, ort.ExecutionMode.ORT_PARALLEL)
+        self.assertFalse(options.enable_cpu_mem_arena)
+
+        FaceAnalysisService.configure_session(2)  # process-pool worker override
+        with _settings(face_ort_intra_op_threads=3):
+            options = FaceAnalysisService.session_options()
+        self.assertEqual((options.intra_op_num_threads, options.inter_op_num_threads), (2, 1))
+
+    def test_int8_pack_falls_back_to_fp32(self):
+        with tempfile.TemporaryDirectory() as home, mock.patch.dict(os.environ, {"INSIGHTFACE_HOME": home}):
+            fp32_dir = os.path.join(home, "models", MODEL_NAME)
+            with _settings(face_model_precision="int8"):
+                self.assertEqual(FaceAnalysisService.model_dir(), fp32_dir)
+                os.makedirs(fp32_dir + INT8_SUFFIX)
+                open(os.path.join(fp32_dir + INT8_SUFFIX, "det_10g.onnx"), "wb").close()
+                self.assertEqual(FaceAnalysisService.model_dir(), fp32_dir + INT8_SUFFIX)
+            self.assertEqual(FaceAnalysisService.model_dir(), fp32_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+tests/test_face_tiling.py — Tests for adaptive tiled face detection.
+"""
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from src.services.face_analysis_service import FaceAnalysisService
+
+TILING = (2.0, 5000, 1280)
+
+
+class _BrightSpotDetector:
+    """Stand-in SCRFD: one 'face' per image at the bounding box of its white pixels."""
+    nms_thresh = 0.4
+
+    def detect(self, img, input_size=None, max_num=0, metric="default"):
+        ys, xs = np.nonzero(img[:, :, 0] == 255)
+        if len(xs) == 0 or max(img.shape[:2]) > 4000:  # "too small" in the whole-image pass
+            return np.zeros((0, 5), np.float32), np.zeros((0, 5, 2), np.float32)
+        box = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9]], np.float32)
+        return box, np.repeat(box[:, None, :2], 5, axis=1)
+
+    def nms(self, dets):
+        keep, order = [], list(range(len(dets)))
+        while order:
+            i = order.pop(0)
+            keep.append(i)
+            order = [j for j in order if not np.allclose(dets[i, :4], dets[j, :4], atol=1)]
+        return keep
+
+
+class TestFaceTiling(unittest.TestCase):
+    def test_tiling_limits(self):
+        self.assertEqual(FaceAnalysisService._tile_side(1280, 960, TILING), 0)
+        self.assertEqual(FaceAnalysisService._tile_side(4000, 3000, TILING), 0)
+        self.assertEqual(FaceAnalysisService._tile_side(6000, 4000, TILING), 5000)
+        self.assertEqual(FaceAnalysisService._tile_side(6000, 1500, TILING), 5120)
+        self.assertEqual(FaceAnalysisService._tile_side(6000, 1500, (0, 0, 1280)), 0)
+
+    def test_tiles_cover_image(self):
+        boxes = FaceAnalysisService._tile_boxes(6000, 1500, 1280)
+        self.assertEqual(len(boxes), 12)
+        covered = np.zeros((1500, 6000), bool)
+        for x0, y0, x1, y1 in boxes:
+            self.assertLessEqual(max(x1 - x0, y1 - y0), 1280)
+            covered[y0:y1, x0:x1] = True
+        self.assertTrue(covered.all())
+
+    def test_tiles_merge_into_image_coordinates(self):
+        img = np.zeros((1500, 6000, 3), np.uint8)
+        img[700:740, 1000:1040] = 255  # inside two overlapping tiles
+        service = FaceAnalysisService()
+        app = SimpleNamespace(det_model=_BrightSpotDetector())
+        with mock.patch.object(FaceAnalysisService, "_app", app), \
+                mock.patch.object(FaceAnalysisService, "_det_batching", False), \
+                mock.patch.object(FaceAnalysisService, "tiling_settings", staticmethod(lambda: TILING)):
+            (bboxes, kpss), = service._run_detector_tiled([img])
+        self.assertEqual(len(bboxes), 1)
+        np.testing.assert_allclose(bboxes[0, :4], [1000, 700, 1040, 740])
+        np.testing.assert_allclose(kpss[0, 0], [1000, 700])
+
+    def test_only_full_detection_decodes_are_enlarged_for_tiling(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "panorama.jpg")
+            Image.new("RGB", (3200, 800), (90, 90, 90)).save(path)
+            with mock.patch.object(FaceAnalysisService, "tiling_settings", staticmethod(lambda: TILING)):
+                small = FaceAnalysisService.decode_image(path, 640)
+                full = FaceAnalysisService.decode_image(path, 640, tile=True)
+        self.assertEqual(small.shape[:2], (200, 800))  # 1/4 DCT scale
+        self.assertEqual(full.shape[:2], (800, 3200))  # aspect 4 needs 4 × 1280 px
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+tests/test_face_tracker.py — Tests for collapsing video key-frame detections into face tracks.
+"""
+
+import unittest
+
+import numpy as np
+
+from src.services.face_analysis_service import FaceResult
+from src.services.face_tracker import track_faces
+
+
+def _identities(n, seed=0):
+    vecs = np.random.default_rng(seed).standard_normal((n, 512)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _face(x, identity, rng, score=0.9, size=0.2):
+    emb = identity + 0.02 * rng.standard_normal(512).astype(np.float32)
+    return FaceResult(x1=x, y1=0.2, x2=x + size, y2=0.2 + size, embedding=emb, score=score)
+
+
+class TestFaceTracker(unittest.TestCase):
+    def test_two_speakers_collapse_to_two_tracks(self):
+        rng = np.random.default_rng(1)
+        a, b = _identities(2)
+        frames = [(t * 1000.0, [_face(0.1 + 0.005 * t, a, rng), _face(0.6, b, rng)]) for t in range(30)]
+        tracks = track_faces(frames)
+        self.assertEqual(len(tracks), 2)
+        for track in tracks:
+            self.assertEqual((track.track_start_ms, track.track_end_ms), (0.0, 29000.0))
+        # Each track keeps the embedding of one of its own speaker's detections
+        for speaker, track in enumerate(tracks):
+            self.assertTrue(any(track.embedding is faces[speaker].embedding for _, faces in frames))
+
+    def test_representative_is_best_detection(self):
+        rng = np.random.default_rng(2)
+        (a,) = _identities(1)
+        best = _face(0.1, a, rng, size=0.25)
+        frames = [(0.0, [_face(0.1, a, rng, size=0.1)]),
+                  (1000.0, [best]),
+                  (2000.0, [_face(0.1, a, rng, size=0.12)])]
+        (track,) = track_faces(frames)
+        self.assertEqual(track.timestamp_ms, 1000.0)
+        self.assertAlmostEqual(track.x2 - track.x1, 0.25)
+        # The stored embedding belongs to the stored bbox / chip, so re-embedding the chip reproduces it
+        np.testing.assert_array_equal(track.embedding, best.embedding)
+
+    def test_gap_and_new_identity_split_tracks(self):
+        rng = np.random.default_rng(3)
+        a, b = _identities(2, seed=4)
+        frames = [(0.0, [_face(0.1, a, rng)]),
+                  (1000.0, [_face(0.1, b, rng)]),    # cut to another person at the same spot
+                  (60_000.0, [_face(0.1, b, rng)])]  # same person after a long gap
+        tracks = track_faces(frames)
+        self.assertEqual([(t.track_start_ms, t.track_end_ms) for t in tracks],
+                         [(0.0, 0.0), (1000.0, 1000.0), (60_000.0, 60_000.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
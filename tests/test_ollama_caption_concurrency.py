@@ -0,0 +1,136 @@
+"""
+tests/test_ollama_caption_concurrency.py — Tests for concurrent and streamed Ollama captioning against a stub server.
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from PIL import Image
+
+from src.services import grammar_service
+from src.services.ollama_caption_service import OllamaCaptionService
+
+
+class _StubOllama(BaseHTTPRequestHandler):
+    """/api/generate echoing the person named in the prompt; later images answer faster."""
+
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        index = int(re.search(r"Kişi (\d+)", payload["prompt"]).group(1))
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(0.05 * (6 - index))
+        with cls.lock:
+            cls.active -= 1
+        if index == 4:
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps({"response": json.dumps({
+            "caption_tr": f"Kişi {index} kürsüde konuşma yapıyor, arkasında bayrak ve perdeler bulunuyor.",
+            "tags_tr": f"konuşma, kürsü, {index}",
+        }, ensure_ascii=False)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubOllamaStream(BaseHTTPRequestHandler):
+    """Streamed /api/generate: the caption JSON in small pieces, then a long ramble."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        answer = json.dumps({
+            "caption_tr": "Bir konuşmacı {kürsüde} konuşma yapıyor, arkasında bayrak var.",
+            "tags_tr": "konuşma, kürsü",
+        }, ensure_ascii=False)
+        pieces = [answer[i:i + 7] for i in range(0, len(answer), 7)] + [" ve devamı"] * 50
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for piece in pieces:
+                self.wfile.write(json.dumps({"response": piece, "done": False}).encode() + b"\n")
+                self.wfile.flush()
+                time.sleep(0.02)
+            self.wfile.write(json.dumps({"response": "", "done": True}).encode() + b"\n")
+        except OSError:
+            pass  # client closed the stream
+
+    def log_message(self, *args):
+        pass
+
+
+class TestOllamaCaptionConcurrency(unittest.TestCase):
+    def _serve(self, handler):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def setUp(self):
+        _StubOllama.peak = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch.object(grammar_service, "correct_grammar_if_enabled", lambda text: text)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parallel_requests_keep_input_order(self):
+        paths = []
+        for i in range(6):
+            path = os.path.join(self.tmp.name, f"{i}.jpg")
+            if i != 2:
+                Image.new("RGB", (64, 48), (40 * i, 0, 0)).save(path)
+            paths.append(path)  # 2.jpg is missing
+
+        service = OllamaCaptionService(url=self._serve(_StubOllama), parallel=3)
+        results = service.analyse_batch(paths, [[f"Kişi {i}"] for i in range(6)])
+
+        self.assertEqual([r.img_path for r in results], paths)
+        for i in (0, 1, 3, 5):
+            self.assertFalse(results[i].error)
+            self.assertTrue(results[i].caption_tr.startswith(f"Kişi {i} "))
+        self.assertTrue(results[2].error.startswith("Resim hazırlanamadı"))
+        self.assertTrue(results[4].error.startswith("Ollama hatası"))
+        self.assertEqual(_StubOllama.peak, 3)
+
+    def test_stream_stops_after_the_json_object(self):
+        path = os.path.join(self.tmp.name, "a.jpg")
+        Image.new("RGB", (64, 48)).save(path)
+        service = OllamaCaptionService(url=self._serve(_StubOllamaStream), stream=True)
+        service.PARTIAL_INTERVAL = 0.0
+        partials = []
+
+        t0 = time.monotonic()
+        result = service.submit(path, on_partial=lambda p, caption: partials.append(caption)).result()
+
+        self.assertLess(time.monotonic() - t0, 0.8)  # the ramble alone takes 1 s
+        self.assertFalse(result.error)
+        self.assertEqual(result.caption_tr, "Bir konuşmacı {kürsüde} konuşma yapıyor, arkasında bayrak var.")
+        self.assertEqual(result.tags_tr, "konuşma, kürsü")
+        self.assertGreater(len(partials), 3)
+        self.assertTrue(all(result.caption_tr.startswith(p) for p in partials))
+
+
+if __name__ == "__main__":
+    unittest.main()
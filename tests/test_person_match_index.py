@@ -0,0 +1,119 @@
+"""
+tests/test_person_match_index.py — Tests for the in-memory person prototype matching index.
+"""
+
+import unittest
+import uuid
+
+import numpy as np
+
+from src.services.person_match_index import PersonMatchIndex, EMBEDDING_DIM
+
+
+def _unit(seed):
+    v = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def _near(seed, noise_seed, scale=0.05):
+    v = _unit(seed) + scale * _unit(noise_seed)
+    return v / np.linalg.norm(v)
+
+
+class TestPersonMatchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PersonMatchIndex()
+        self.index.invalidate()
+        self.alice, self.bob = uuid.uuid4(), uuid.uuid4()
+        self.media = uuid.uuid4()
+        self.index.load(
+            [
+                {"person_id": self.alice, "idx": 0, "name": "Alice",
+                 "embedding_sum": _unit(1) * 3, "face_count": 3},
+                {"person_id": self.bob, "idx": 0, "name": "Bob",
+                 "embedding_sum": _unit(2), "face_count": 1},
+            ],
+            [self.media],
+        )
+
+    def tearDown(self):
+        self.index.invalidate()
+
+    def test_singleton(self):
+        self.assertIs(PersonMatchIndex(), self.index)
+
+    def test_batch_best_matches(self):
+        matches = self.index.best_matches([_near(1, 10), _unit(2), _unit(3), None])
+        self.assertEqual(matches[0], (self.alice, "Alice"))
+        self.assertEqual(matches[1], (self.bob, "Bob"))
+        self.assertEqual(matches[2], (None, None))
+        self.assertEqual(matches[3], (None, None))
+
+    def test_top_k_returns_distinct_persons(self):
+        self.index.add_face(self.alice, 1, "Alice", _unit(4))
+        hits = self.index.search([_unit(1)], k=2, threshold=2.0)[0]
+        self.assertEqual([h[0] for h in hits], [self.alice, self.bob])
+        self.assertAlmostEqual(hits[0][2], 0.0, places=5)
+
+    def test_running_sums_follow_assign_and_clear(self):
+        # A second mode for Bob: a face far from his first prototype
+        self.index.add_face(self.bob, 1, None, _unit(5))
+        self.assertEqual(self.index.best_matches([_near(5, 11)]), [(self.bob, "Bob")])
+        self.assertEqual(len(self.index), 3)
+
+        # Clearing the only member drops the prototype
+        self.index.remove_face(self.bob, 1, _unit(5))
+        self.assertEqual(self.index.best_matches([_near(5, 11)]), [(None, None)])
+        self.assertEqual(len(self.index), 2)
+
+        self.index.rename_person(self.bob, "Robert")
+        self.assertEqual(self.index.best_matches([_unit(2)]), [(self.bob, "Robert")])
+
+        self.index.remove_person(self.bob)
+        self.assertEqual(self.index.best_matches([_unit(2)]), [(None, None)])
+
+    def test_outlier_radius_rejects_far_faces_of_tight_prototypes(self):
+        carol = uuid.uuid4()
+        for noise in range(20, 30):
+            self.index.add_face(carol, 0, "Carol", _near(7, noise, scale=0.1))
+        inside = _near(7, 40, scale=0.1)
+        outside = _near(7, 41, scale=0.9)  # within the global threshold, far beyond Carol's spread
+        self.assertEqual(self.index.best_matches([inside]), [(carol, "Carol")])
+        self.assertLess(1.0 - float(outside @ _unit(7)), 0.5)
+        self.assertEqual(self.index.best_matches([outside]), [(None, None)])
+
+    def test_remove_media_invalidates_only_labelled_media(self):
+        self.index.remove_media(uuid.uuid4())
+        self.assertTrue(self.index.loaded)
+        self.index.remove_media(self.media)
+        self.assertFalse(self.index.loaded)
+
+    def test_lazy_load_through_loader(self):
+        self.index.invalidate()
+        self.index.add_face(self.alice, 0, "Alice", _unit(1))  # ignored while unloaded
+        self.assertEqual(len(self.index), 0)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return [{"person_id": self.alice, "idx": 0, "name": "Alice",
+                     "embedding_sum": _unit(1), "face_count": 1}], []
+
+        self.index.ensure_loaded(loader)
+        self.index.ensure_loaded(loader)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.index.best_matches([_unit(1)]), [(self.alice, "Alice")])
+
+    def test_rematch_leaves_the_face_out_of_its_own_prototype(self):
+        # An Alice look-alike automatically assigned to a new Bob prototype of its own
+        wrong = _near(1, 11)
+        self.index.add_face(self.bob, 1, "Bob", wrong)
+        faces = [wrong, _unit(2), _unit(1), _unit(3)]
+        own = [(self.bob, 1), (self.bob, 0), (self.alice, 0), None]
+        self.assertEqual(self.index.rematch(faces, own), [self.alice, None, self.alice, None])
+        # Without the leave-one-out the faces keep their current persons
+        self.assertEqual(self.index.rematch(faces, [None] * 4), [self.bob, self.bob, self.alice, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
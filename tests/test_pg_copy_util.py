@@ -0,0 +1,111 @@
+"""
+tests/test_pg_copy_util.py — Binary COPY encoding round trip: encode_row() /
+copy_rows() output read back through copy_out() and read_rows() with the
+repository's fixed-width row layouts (fake DB-API cursor, no database).
+"""
+
+import struct
+import unittest
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.repositories.face_repository import _CLUSTER_UPDATE_ROW, _FACE_EMBEDDING_ROW, _REMATCH_FACE_ROW
+from src.utils.pg_copy_util import (
+    COPY_HEADER,
+    COPY_TRAILER,
+    copy_out,
+    copy_rows,
+    encode_row,
+    encode_uuid,
+    encode_vector,
+    read_rows,
+)
+
+
+class _Cursor:
+    """Keeps what COPY FROM STDIN received; COPY TO STDOUT replays it."""
+
+    def __init__(self, server):
+        self._server = server
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, buf):
+        if "FROM STDIN" in sql:
+            self._server.stream = buf.read()
+        else:
+            buf.write(self._server.stream)
+
+    def mogrify(self, query, params):
+        return query.encode("utf-8")
+
+
+class _Session:
+    def __init__(self):
+        self.stream = b""
+        raw = SimpleNamespace(cursor=lambda: _Cursor(self))
+        self._conn = SimpleNamespace(connection=raw)
+
+    def connection(self):
+        return self._conn
+
+
+def _round_trip(rows, dtype) -> np.ndarray:
+    db = _Session()
+    copy_rows(db, "t", ["a"], rows)
+    return read_rows(copy_out(db, "SELECT a FROM t"), dtype)
+
+
+class TestPgCopyUtil(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.ids = [uuid.uuid4() for _ in range(5)]
+        self.vecs = rng.standard_normal((5, 512)).astype(np.float32)
+
+    def test_stream_framing(self):
+        db = _Session()
+        copy_rows(db, "t", ["id"], [encode_row([encode_uuid(self.ids[0])])])
+        self.assertTrue(db.stream.startswith(COPY_HEADER))
+        self.assertTrue(db.stream.endswith(COPY_TRAILER))
+        self.assertEqual(len(db.stream), len(COPY_HEADER) + 2 + 4 + 16 + len(COPY_TRAILER))
+
+    def test_face_embedding_rows(self):
+        rows = [encode_row([encode_uuid(i), encode_vector(v)]) for i, v in zip(self.ids, self.vecs)]
+        out = _round_trip(rows, _FACE_EMBEDDING_ROW)
+        self.assertEqual([uuid.UUID(bytes=bytes(r)) for r in out["id"]], self.ids)
+        np.testing.assert_array_equal(out["vec"].astype(np.float32), self.vecs)
+        self.assertTrue((out["nfields"] == 2).all())
+        self.assertTrue((out["dim"] == 512).all())
+
+    def test_rematch_rows_with_int2(self):
+        idx = [0, -1, 3, 7, -1]
+        rows = [
+            encode_row([encode_uuid(i), encode_uuid(uuid.UUID(int=0)), struct.pack(">h", k), encode_vector(v)])
+            for i, k, v in zip(self.ids, idx, self.vecs)
+        ]
+        out = _round_trip(rows, _REMATCH_FACE_ROW)
+        self.assertEqual(out["idx"].tolist(), idx)
+        self.assertTrue((out["pid"] == np.void(bytes(16))).all())
+        np.testing.assert_array_equal(out["vec"].astype(np.float32), self.vecs)
+
+    def test_structured_array_rows(self):
+        # copy_rows also takes several rows packed at once, as the clustering writer does
+        rows = np.empty(len(self.ids), dtype=_CLUSTER_UPDATE_ROW)
+        rows["nfields"], rows["id_len"], rows["cid_len"] = 2, 16, 16
+        rows["id"] = [i.bytes for i in self.ids]
+        rows["cid"] = [i.bytes for i in reversed(self.ids)]
+        out = _round_trip([rows.tobytes()], _CLUSTER_UPDATE_ROW)
+        self.assertEqual(out.tobytes(), rows.tobytes())
+        self.assertEqual(out.tobytes(), b"".join(
+            encode_row([encode_uuid(a), encode_uuid(b)]) for a, b in zip(self.ids, reversed(self.ids))
+        ))
+
+
+if __name__ == "__main__":
+    unittest.main()
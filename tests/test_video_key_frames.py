@@ -0,0 +1,62 @@
+"""
+tests/test_video_key_frames.py — Tests for key frame sampling in extract_key_frames.
+"""
+
+import sys
+import unittest
+from fractions import Fraction
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from src.utils.video_util import extract_key_frames
+
+
+class _Frame:
+    width, height = 8, 6
+
+    def __init__(self, time, dts=None, time_base=None):
+        self.time, self.dts, self.time_base = time, dts, time_base
+
+    def to_ndarray(self, format, width, height, interpolation):
+        return np.zeros((height, width, 3), np.uint8)
+
+
+class _Container:
+    def __init__(self, frames):
+        self.streams = [SimpleNamespace(type="video", metadata={}, codec_context=SimpleNamespace())]
+        self._frames = frames
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def decode(self, stream):
+        return iter(self._frames)
+
+
+def _timestamps(frames, interval_seconds=1.0):
+    av = SimpleNamespace(open=lambda path: _Container(frames))
+    with mock.patch.dict(sys.modules, {"av": av}):
+        return [t for _, t in extract_key_frames("clip.mp4", interval_seconds)]
+
+
+class TestExtractKeyFrames(unittest.TestCase):
+    def test_samples_one_frame_per_interval(self):
+        frames = [_Frame(t) for t in (0.0, 0.5, 1.0, 1.4, 2.5)]
+        self.assertEqual(_timestamps(frames), [0.0, 1000.0, 2500.0])
+
+    def test_falls_back_to_dts(self):
+        frames = [_Frame(None, dts, Fraction(1, 1000)) for dts in (0, 500, 1000, 2000)]
+        self.assertEqual(_timestamps(frames), [0.0, 1000.0, 2000.0])
+
+    def test_frames_without_timestamps_are_not_dropped(self):
+        frames = [_Frame(None) for _ in range(4)]
+        self.assertEqual(_timestamps(frames, interval_seconds=2.0), [0.0, 2000.0, 4000.0, 6000.0])
+
+
+if __name__ == "__main__":
+    unittest.main()